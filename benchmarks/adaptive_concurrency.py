@@ -0,0 +1,149 @@
+"""Benchmarks the adaptive (AIMD) per-key concurrency control against a fixed concurrency, on the mock LLM server
+configured to rate limit (429) the requests above a per-key capacity and to inject latency spikes.
+
+For each strategy, it reports the time, the number of requests answered with a 429, the failed requests
+and the final concurrency limit per key.
+
+Usage:
+    python -m benchmarks.adaptive_concurrency --num_requests 400 --num_workers 64 --capacity_per_key 8
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mock_llm_server import create_server
+from src.launchers.adaptive_concurrency import AdaptiveRequestController
+
+
+class RequestError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"Request failed with status code {status_code}")
+        self.status_code = status_code
+
+
+def send_request(api_base, api_key):
+    request = urllib.request.Request(
+        f"{api_base}/chat/completions",
+        data=json.dumps({"model": "mock", "messages": [{"role": "user", "content": "Solve it."}]}).encode("utf-8"),
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise RequestError(e.code)
+
+
+def run_fixed(api_base, api_keys, num_requests, num_workers, max_retries, wait_time_between_retries):
+    """Sends the requests with a fixed concurrency, retrying after a fixed wait time."""
+    num_failed = 0
+    lock = threading.Lock()
+
+    def _task(request_idx):
+        nonlocal num_failed
+        for attempt in range(max_retries + 1):
+            try:
+                return send_request(api_base, api_keys[request_idx % len(api_keys)])
+            except RequestError:
+                time.sleep(wait_time_between_retries)
+        with lock:
+            num_failed += 1
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        list(executor.map(_task, range(num_requests)))
+
+    return {"num_failed": num_failed}
+
+
+def run_adaptive(api_base, api_keys, num_requests, num_workers, max_retries, controller_kwargs):
+    controller = AdaptiveRequestController(max_retries=max_retries, max_limit=num_workers, seed=0, **controller_kwargs)
+    num_failed = 0
+    lock = threading.Lock()
+
+    def _task(request_idx):
+        nonlocal num_failed
+        api_key = api_keys[request_idx % len(api_keys)]
+        try:
+            return controller.call(send_request, api_key, api_base, api_key)
+        except RequestError:
+            with lock:
+                num_failed += 1
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        list(executor.map(_task, range(num_requests)))
+
+    stats = controller.get_stats()
+    return {
+        "num_failed": num_failed,
+        "final_concurrency_limits": {key: round(key_stats["concurrency_limit"], 1) for key, key_stats in stats.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num_requests", type=int, default=400)
+    parser.add_argument("--num_workers", type=int, default=64, help="The number of flow runs in flight.")
+    parser.add_argument("--num_keys", type=int, default=2)
+    parser.add_argument("--capacity_per_key", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--latency_spike_probability", type=float, default=0.02)
+    parser.add_argument("--latency_spike", type=float, default=1.0)
+    parser.add_argument("--max_retries", type=int, default=8)
+    parser.add_argument("--wait_time_between_retries", type=float, default=1.0, help="For the fixed strategy.")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    api_base = f"http://127.0.0.1:{args.port}/v1"
+    api_keys = [f"key_{idx}" for idx in range(args.num_keys)]
+
+    strategies = {
+        "fixed": lambda: run_fixed(
+            api_base, api_keys, args.num_requests, args.num_workers, args.max_retries, args.wait_time_between_retries
+        ),
+        "adaptive": lambda: run_adaptive(
+            api_base,
+            api_keys,
+            args.num_requests,
+            args.num_workers,
+            args.max_retries,
+            {"initial_limit": 4, "base_delay": 0.1, "max_delay": 2.0},
+        ),
+    }
+
+    for strategy_name, run_strategy in strategies.items():
+        server = create_server(
+            port=args.port,
+            latency=args.latency,
+            latency_jitter=args.latency / 2,
+            capacity_per_key=args.capacity_per_key,
+            latency_spike_probability=args.latency_spike_probability,
+            latency_spike=args.latency_spike,
+            seed=0,
+        )
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+
+        start_time = time.perf_counter()
+        results = run_strategy()
+        elapsed_time = time.perf_counter() - start_time
+
+        server.shutdown()
+        server.server_close()
+
+        server_stats = server.state.get_stats()
+        print(
+            f"[{strategy_name}] time: {elapsed_time:.2f}s, "
+            f"requests sent: {sum(server_stats['num_requests'].values())}, "
+            f"rate limited (429): {sum(server_stats['num_rate_limited'].values())}, "
+            f"max concurrency per key: {server_stats['max_in_flight']}, "
+            + ", ".join(f"{key}: {value}" for key, value in results.items())
+        )
+
+
+if __name__ == "__main__":
+    main()
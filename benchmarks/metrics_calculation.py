@@ -0,0 +1,233 @@
+"""Benchmarks the metrics calculation and the bootstrap on synthetic evaluation outputs.
+
+For each configuration, it reports the time and the peak (Python) memory of each benchmark and checks that the
+scores are identical (bit-for-bit) to the ones of a reference implementation of the original algorithm, which
+resamples and filters the evaluation output's data before scoring every problem.
+
+Usage:
+    python -m benchmarks.metrics_calculation --configurations small temporal --bootstrap_n 100
+"""
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from omegaconf import OmegaConf
+
+from benchmarks.synthetic_data import generate_bucketing, generate_evaluation_output, write_bucketing
+from src.metrics import PassAtK, SolveRate, TemporalMetric
+from src.utils.evaluation_helpers import EvaluationOutput
+
+CODE_EVALUATOR_ID = "local_evaluator"
+BUCKETING_ID = "synthetic_bucketing"
+
+CONFIGURATIONS = {
+    "small": dict(num_problems=100, num_candidates=1, num_tests=10, num_buckets=2, window_width=None),
+    "medium": dict(num_problems=800, num_candidates=5, num_tests=30, num_buckets=2, window_width=None),
+    "temporal": dict(num_problems=800, num_candidates=1, num_tests=30, num_buckets=40, window_width=61),
+    "large": dict(num_problems=5000, num_candidates=5, num_tests=50, num_buckets=10, window_width=None),
+}
+
+METRICS = {
+    "pass_at_1": (PassAtK, {"k": 1}),
+    "pass_at_5": (PassAtK, {"k": 5}),
+    "problem_solve_rate": (SolveRate, {"test_level": False}),
+    "test_pass_rate": (SolveRate, {"test_level": True}),
+}
+
+
+# ~~~ Reference implementation (the original algorithm) ~~~
+def _reference_pass_at_k(data, tests_key, k):
+    result = []
+    for problem_eval_output in data:
+        total_sol_num = 0
+        pass_sol_num = 0
+        for candidate_sol_eval_output in problem_eval_output[CODE_EVALUATOR_ID]:
+            if candidate_sol_eval_output.get("evaluation_status", "completed") != "completed":
+                continue
+            test_statuses = [test["status"] for test in candidate_sol_eval_output[tests_key]]
+            if len(test_statuses) == 0:
+                continue
+            pass_sol_num += np.all(test_statuses)
+            total_sol_num += 1
+
+        if total_sol_num == 0:
+            continue
+        result.append(PassAtK._estimator(n=total_sol_num, c=pass_sol_num, k=k))
+
+    return np.mean(result)
+
+
+def _reference_solve_rate(data, tests_key, test_level):
+    result_solve_rate = []
+    result_test_pass_rate = []
+    for problem_eval_output in data:
+        psr = []
+        tpr = []
+        for candidate_sol_eval_output in problem_eval_output[CODE_EVALUATOR_ID]:
+            if candidate_sol_eval_output.get("evaluation_status", "completed") != "completed":
+                continue
+            test_statuses = [test["status"] for test in candidate_sol_eval_output[tests_key]]
+            psr.append(int(np.all(test_statuses)))
+            tpr.append(float(sum(test_statuses)) / len(test_statuses))
+
+        if len(psr) == 0:
+            continue
+        result_solve_rate.append(np.mean(psr))
+        result_test_pass_rate.append(np.mean(tpr))
+
+    if test_level:
+        return np.mean(result_test_pass_rate)
+    return np.mean(result_solve_rate)
+
+
+def reference_compute(metric_name, data, bucket_id2datapoint_ids=None, seed=None, tests_key="hidden_tests_results"):
+    metric_cls, metric_params = METRICS[metric_name]
+
+    def _score(_data):
+        if seed is not None:
+            random_state = np.random.RandomState(seed)
+            _data = [_data[i] for i in random_state.choice(len(_data), len(_data), replace=True)]
+
+        if metric_cls is PassAtK:
+            return _reference_pass_at_k(_data, tests_key, metric_params["k"])
+        return _reference_solve_rate(_data, tests_key, metric_params["test_level"])
+
+    if bucket_id2datapoint_ids is None:
+        return _score(data)
+
+    bucket_id2score = {}
+    for bucket_id, datapoint_ids in bucket_id2datapoint_ids.items():
+        datapoint_ids = set(datapoint_ids)
+        bucket_id2score[bucket_id] = _score([dp for dp in data if dp["id"] in datapoint_ids])
+    return bucket_id2score
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+
+def instantiate_metric(metric_name, evaluation_buckets_dir=None, temporal=False):
+    metric_cls, metric_params = METRICS[metric_name]
+    metric = metric_cls(
+        code_evaluator_id=CODE_EVALUATOR_ID,
+        hidden_test_cases=True,
+        bucketing_id=BUCKETING_ID if evaluation_buckets_dir is not None else None,
+        evaluation_buckets_dir=evaluation_buckets_dir,
+        **metric_params,
+    )
+
+    if temporal:
+        return TemporalMetric(metric=metric)
+    return metric
+
+
+def measure(make_callable):
+    """Returns the output, the time (in seconds) and the peak traced memory (in bytes) of the callable.
+
+    The time and the memory are measured in two separate calls, as tracing the memory allocations slows down
+    the execution. `make_callable` is used to construct a fresh callable (e.g., without warm caches) for each call.
+    """
+    fn = make_callable()
+    start_time = time.perf_counter()
+    output = fn()
+    elapsed_time = time.perf_counter() - start_time
+
+    fn = make_callable()
+    tracemalloc.start()
+    fn()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return output, elapsed_time, peak_memory
+
+
+def run_benchmarks(configuration_name, bootstrap_n, num_workers, starting_seed=150):
+    # imported here, as it also imports the (heavier) dependencies of the entry point
+    from run_metrics_calculation import get_bootstrap_run_scores
+
+    configuration = CONFIGURATIONS[configuration_name]
+    data = generate_evaluation_output(
+        num_problems=configuration["num_problems"],
+        num_candidates=configuration["num_candidates"],
+        num_tests=configuration["num_tests"],
+    )
+    bucket_id2datapoint_ids = generate_bucketing(
+        [dp["id"] for dp in data], configuration["num_buckets"], configuration["window_width"]
+    )
+    evaluation_buckets_dir = tempfile.mkdtemp()
+    write_bucketing(evaluation_buckets_dir, BUCKETING_ID, bucket_id2datapoint_ids)
+
+    bootstrap_cfg = OmegaConf.create({"bootstrap_n": bootstrap_n, "silent": True, "debug": False})
+    seeds = [starting_seed + i for i in range(bootstrap_n)]
+
+    rows = []
+    for metric_name in METRICS:
+        benchmarks = {
+            "overall": (None, False, None),
+            "bucketed": (evaluation_buckets_dir, False, bucket_id2datapoint_ids),
+            "temporal": (evaluation_buckets_dir, True, bucket_id2datapoint_ids),
+        }
+
+        for benchmark_name, (buckets_dir, temporal, reference_buckets) in benchmarks.items():
+
+            def _make_compute():
+                metric = instantiate_metric(metric_name, buckets_dir, temporal)
+                evaluation_output = EvaluationOutput(data=data)
+                return lambda: metric.compute(evaluation_output)
+
+            score, elapsed_time, peak_memory = measure(_make_compute)
+            matches = score == reference_compute(metric_name, data, reference_buckets)
+            rows.append([configuration_name, benchmark_name, metric_name, elapsed_time, peak_memory, matches])
+
+            def _make_bootstrap():
+                metric = instantiate_metric(metric_name, buckets_dir, temporal)
+                evaluation_output = EvaluationOutput(data=data)
+                return lambda: get_bootstrap_run_scores(
+                    bootstrap_cfg, metric, evaluation_output, {}, starting_seed, num_workers=num_workers
+                )
+
+            scores, elapsed_time, peak_memory = measure(_make_bootstrap)
+            matches = all(
+                score == reference_compute(metric_name, data, reference_buckets, seed)
+                for score, seed in zip(scores, seeds)
+            )
+            rows.append(
+                [configuration_name, f"{benchmark_name}_bootstrap", metric_name, elapsed_time, peak_memory, matches]
+            )
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configurations", nargs="+", default=["small", "medium", "temporal"], choices=CONFIGURATIONS)
+    parser.add_argument("--bootstrap_n", type=int, default=100)
+    parser.add_argument("--num_workers", type=int, default=1)
+    parser.add_argument("--output_file", type=str, default=None, help="If given, the results are written as JSON.")
+    args = parser.parse_args()
+
+    header = ["configuration", "benchmark", "metric", "time [s]", "peak memory [MiB]", "matches reference"]
+    rows = []
+    for configuration_name in args.configurations:
+        rows.extend(run_benchmarks(configuration_name, args.bootstrap_n, args.num_workers))
+
+    print(" | ".join(f"{column:>20}" for column in header))
+    for configuration_name, benchmark_name, metric_name, elapsed_time, peak_memory, matches in rows:
+        print(
+            f"{configuration_name:>20} | {benchmark_name:>20} | {metric_name:>20} | "
+            f"{elapsed_time:>20.3f} | {peak_memory / 2**20:>20.2f} | {str(matches):>20}"
+        )
+
+    if args.output_file is not None:
+        with open(args.output_file, "w") as f:
+            json.dump([dict(zip(header, row)) for row in rows], f, indent=2)
+
+    if not all(row[-1] for row in rows):
+        raise SystemExit("Some of the scores do not match the reference implementation.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""A local mock of an OpenAI-compatible chat completion endpoint, for testing and benchmarking the inference.
+
+Every request is answered with a (trivial) Python solution after a random latency. To emulate a rate-limited API,
+the server answers with a 429 when more than `capacity_per_key` requests of the same key are in flight (and with a
+probability of `rate_limit_probability` otherwise), and it injects latency spikes. The number of (concurrent and
+rate-limited) requests per API key can be read from `GET /stats`.
+
+Usage:
+    python -m benchmarks.mock_llm_server --port 8000 --latency 2.0 --capacity_per_key 8 --latency_spike_probability 0.05
+
+and point the flows to it, e.g. with
+    'api_information=[{backend_used: openai, api_key: key_0, api_base: "http://127.0.0.1:8000/v1"}]'
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_COMPLETION = "```python\nn = int(input())\nprint(n)\n```"
+
+
+class MockLLMState:
+    def __init__(
+        self,
+        latency,
+        latency_jitter,
+        completion,
+        capacity_per_key=None,
+        rate_limit_probability=0.0,
+        latency_spike_probability=0.0,
+        latency_spike=10.0,
+        seed=None,
+    ):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.completion = completion
+        self.capacity_per_key = capacity_per_key
+        self.rate_limit_probability = rate_limit_probability
+        self.latency_spike_probability = latency_spike_probability
+        self.latency_spike = latency_spike
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.num_requests = defaultdict(int)
+        self.num_rate_limited = defaultdict(int)
+        self.in_flight = defaultdict(int)
+        self.max_in_flight = defaultdict(int)
+
+    def sample_latency(self):
+        with self.lock:
+            latency = max(0.0, self.latency + self.random.uniform(-self.latency_jitter, self.latency_jitter))
+            if self.random.random() < self.latency_spike_probability:
+                latency += self.latency_spike
+            return latency
+
+    def start_request(self, api_key):
+        """Returns False if the request is rate limited (in which case it shouldn't be ended)."""
+        with self.lock:
+            self.num_requests[api_key] += 1
+            over_capacity = self.capacity_per_key is not None and self.in_flight[api_key] >= self.capacity_per_key
+            if over_capacity or self.random.random() < self.rate_limit_probability:
+                self.num_rate_limited[api_key] += 1
+                return False
+
+            self.in_flight[api_key] += 1
+            self.max_in_flight[api_key] = max(self.max_in_flight[api_key], self.in_flight[api_key])
+            return True
+
+    def end_request(self, api_key):
+        with self.lock:
+            self.in_flight[api_key] -= 1
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "num_requests": dict(self.num_requests),
+                "num_rate_limited": dict(self.num_rate_limited),
+                "in_flight": dict(self.in_flight),
+                "max_in_flight": dict(self.max_in_flight),
+            }
+
+
+class MockLLMRequestHandler(BaseHTTPRequestHandler):
+    state: MockLLMState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status_code, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.state.get_stats())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        api_key = self.headers.get("Authorization", "").replace("Bearer ", "") or self.headers.get("api-key", "")
+
+        if not self.state.start_request(api_key):
+            self._send_json(429, {"error": {"message": "Rate limit reached.", "type": "rate_limit_error"}})
+            return
+
+        try:
+            time.sleep(self.state.sample_latency())
+            self._send_json(200, self._get_completion_response(request))
+        finally:
+            self.state.end_request(api_key)
+
+    def _get_completion_response(self, request):
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in request.get("messages", []))
+        completion_tokens = len(self.state.completion.split())
+        n = request.get("n", 1)
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [
+                {
+                    "index": idx,
+                    "message": {"role": "assistant", "content": self.state.completion},
+                    "finish_reason": "stop",
+                }
+                for idx in range(n)
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": n * completion_tokens,
+                "total_tokens": prompt_tokens + n * completion_tokens,
+            },
+        }
+
+
+def create_server(
+    host="127.0.0.1", port=8000, latency=1.0, latency_jitter=0.0, completion=DEFAULT_COMPLETION, **kwargs
+):
+    """Returns a (not yet started) mock server; `server.serve_forever()` can be run in a background thread.
+    The keyword arguments (e.g., `capacity_per_key`) are passed to `MockLLMState`."""
+    state = MockLLMState(latency, latency_jitter, completion, **kwargs)
+    handler = type("BoundMockLLMRequestHandler", (MockLLMRequestHandler,), {"state": state})
+
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=1.0, help="The mean latency of a request (in seconds).")
+    parser.add_argument("--latency_jitter", type=float, default=0.0, help="The latency is uniform in mean ± jitter.")
+    parser.add_argument("--capacity_per_key", type=int, default=None, help="Concurrent requests above it get a 429.")
+    parser.add_argument("--rate_limit_probability", type=float, default=0.0)
+    parser.add_argument("--latency_spike_probability", type=float, default=0.0)
+    parser.add_argument("--latency_spike", type=float, default=10.0, help="The latency added by a spike (in seconds).")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = create_server(
+        args.host,
+        args.port,
+        args.latency,
+        args.latency_jitter,
+        capacity_per_key=args.capacity_per_key,
+        rate_limit_probability=args.rate_limit_probability,
+        latency_spike_probability=args.latency_spike_probability,
+        latency_spike=args.latency_spike,
+        seed=args.seed,
+    )
+    print(f"Serving a mock LLM at http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.state.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmarks the startup (i.e., import) time of the evaluation and metrics entry points.
+
+Each entry point is imported in a fresh interpreter (`--repeats` times); the script reports the median and the
+minimum import time, and which of the heavy dependencies (torch, Lightning, wandb, aiflows, rich) were imported.
+None of them should be imported before they are actually used.
+
+Usage:
+    python -m benchmarks.startup_time --repeats 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = ["run_evaluation", "run_metrics_calculation", "run_paired_metrics_calculation"]
+HEAVY_MODULES = ["torch", "pytorch_lightning", "lightning_fabric", "wandb", "aiflows", "rich"]
+
+_IMPORT_SNIPPET = """
+import json, sys, time
+start_time = time.perf_counter()
+import {module}
+elapsed_time = time.perf_counter() - start_time
+print(json.dumps({{"time": elapsed_time, "loaded": [m for m in {heavy_modules} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module, cwd):
+    snippet = _IMPORT_SNIPPET.format(module=module, heavy_modules=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", snippet], cwd=cwd, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--entry_points", nargs="+", default=ENTRY_POINTS)
+    parser.add_argument("--output_file", type=str, default=None, help="If given, the results are written as JSON.")
+    args = parser.parse_args()
+
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    results = {}
+    print(f"{'entry point':<34}{'median (s)':>12}{'min (s)':>10}  heavy modules imported")
+    for entry_point in args.entry_points:
+        measurements = [measure_import(entry_point, root_dir) for _ in range(args.repeats)]
+        times = [measurement["time"] for measurement in measurements]
+        results[entry_point] = {
+            "median_time": statistics.median(times),
+            "min_time": min(times),
+            "heavy_modules_imported": measurements[-1]["loaded"],
+        }
+        print(
+            f"{entry_point:<34}{results[entry_point]['median_time']:>12.3f}{results[entry_point]['min_time']:>10.3f}  "
+            f"{', '.join(results[entry_point]['heavy_modules_imported']) or '-'}"
+        )
+
+    if args.output_file is not None:
+        with open(args.output_file, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import json
+import os
+
+import numpy as np
+
+
+def generate_evaluation_output(
+    num_problems,
+    num_candidates,
+    num_tests,
+    num_public_tests=2,
+    pass_probability=0.5,
+    code_evaluator_id="local_evaluator",
+    include_tests_io=False,
+    seed=123,
+):
+    """Generates a synthetic evaluation output following the schema described in the README.
+
+    Each problem has a latent difficulty, so the candidate solutions for a problem are correlated.
+    If `include_tests_io` is True, the (dummy) inputs and outputs of the tests are included as well.
+    """
+    random_state = np.random.RandomState(seed)
+    problem_pass_probabilities = random_state.beta(2 * pass_probability, 2 * (1 - pass_probability), num_problems)
+
+    def _generate_tests_results(num, pass_prob):
+        statuses = random_state.rand(num) < pass_prob
+        tests_results = []
+        for status in statuses:
+            test_result = {"status": bool(status)}
+            if include_tests_io:
+                test_result.update(
+                    {
+                        "input": ["1 2 3", "4 5 6"],
+                        "expected_output": "21",
+                        "generated_output": "21" if status else "20",
+                        "error_message": None,
+                    }
+                )
+            tests_results.append(test_result)
+        return tests_results
+
+    evaluation_output = []
+    for problem_idx in range(num_problems):
+        candidates = []
+        for _ in range(num_candidates):
+            # per-test pass probability such that the candidate passes all tests with the problem's probability
+            pass_prob = problem_pass_probabilities[problem_idx] ** (1 / max(num_tests, 1))
+            candidates.append(
+                {
+                    "evaluation_status": "completed",
+                    "compilation_status": True,
+                    "compilation_error_message": None,
+                    "timeout_error": False,
+                    "hidden_tests_results": _generate_tests_results(num_tests, pass_prob),
+                    "public_tests_results": _generate_tests_results(num_public_tests, pass_prob),
+                }
+            )
+
+        evaluation_output.append({"id": get_problem_id(problem_idx), code_evaluator_id: candidates})
+
+    return evaluation_output
+
+
+def get_problem_id(problem_idx):
+    return f"{1000 + problem_idx}_A"
+
+
+def generate_bucketing(problem_ids, num_buckets, window_width=None):
+    """Generates a bucketing of the problem ids.
+
+    If `window_width` is None, the ids are split into `num_buckets` disjoint buckets.
+    Otherwise, the buckets are (temporal-style) overlapping windows of `window_width` consecutive ids.
+    """
+    problem_ids = sorted(problem_ids)
+
+    if window_width is None:
+        return {
+            f"bucket_{bucket_idx}": [str(_id) for _id in bucket_ids]
+            for bucket_idx, bucket_ids in enumerate(np.array_split(problem_ids, num_buckets))
+        }
+
+    window_width = min(window_width, len(problem_ids))
+    starts = np.linspace(0, len(problem_ids) - window_width, num_buckets).astype(int)
+    return {f"window_{start}": problem_ids[start : start + window_width] for start in starts}
+
+
+def write_bucketing(evaluation_buckets_dir, bucketing_id, bucket_id2datapoint_ids):
+    with open(os.path.join(evaluation_buckets_dir, f"{bucketing_id}.json"), "w") as f:
+        json.dump(bucket_id2datapoint_ids, f)
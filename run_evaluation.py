@@ -1,61 +1,42 @@
 from src.utils import hydra_custom_resolvers
-from typing import List
-
-from pytorch_lightning.loggers import Logger
+from typing import TYPE_CHECKING, List
 
 from src import utils
-from src.utils import general_helpers, evaluation_helpers
+from src.utils import general_helpers, evaluation_helpers, evaluation_sharding
+from src.evaluation.stage_profiling import StageProfiler, active_profiler, profile_stage
 
 import hydra
 import os
 
 from omegaconf import DictConfig
 
-import pytorch_lightning as pl
-import wandb
+if TYPE_CHECKING:
+    from pytorch_lightning.loggers import Logger
 
 
 log = utils.get_pylogger(__name__)
 
 
-def run_evaluation(cfg: DictConfig):
-    # Set seed for random number generators in PyTorch, Numpy and Python (random)
-    if cfg.get("seed"):
-        pl.seed_everything(cfg.seed, workers=True)
-
-    # Initialize the loggers
-    log.info("Instantiating loggers...")
-    loggers: List[Logger] = general_helpers.instantiate_loggers(cfg.get("logger"))
-    if loggers:
-        log.info("Logging hyperparameters!")
-        utils.log_hyperparameters(cfg, None, loggers)
-
-    assert cfg.output_dir is not None, "Path to the directory in which the predictions will be written must be given"
-    cfg.output_dir = os.path.relpath(cfg.output_dir)
-    log.info(f"Output directory: {cfg.output_dir}")
-
-    # Get the inference run's config &
-    # Sync the predictions and the results from WandB in the exp_dir (downloads the data if is not found locally)
-    api = wandb.Api()
-    run = api.run(cfg.wandb_run_path)
-    ir_wandb_config, ir_hydra_config, exp_dir = evaluation_helpers.sync_experiment_data(
-        cfg.wandb_run_path, work_dir=cfg.work_dir
-    )
-
+def evaluate_predictions(cfg: DictConfig, ir_hydra_config, exp_dir, predictions_dataset):
     # Get the problem dataset (containing the metadata for the problems in the predictions dataset)
-    problems_dataset = evaluation_helpers.get_dataset_used_in_run(ir_hydra_config, cfg.split_to_evaluate, cfg.data_dir)
-
-    # Initialize the predictions dataset
-    cfg.predictions_dataset.data_dir = general_helpers.get_predictions_dir_path(exp_dir)
-    predictions_dataset = hydra.utils.instantiate(cfg.predictions_dataset, _recursive_=False)
+    with profile_stage("load_problems"):
+        problems_dataset = evaluation_helpers.get_dataset_used_in_run(
+            ir_hydra_config, cfg.split_to_evaluate, cfg.data_dir
+        )
 
     # Read the (potentially) existing evaluation output
-    if cfg.local_results_cache_dir is not None:
-        log.info(f"Loading evaluation output from local cache directory: {cfg.local_results_cache_dir}")
-        evaluation_output = evaluation_helpers.read_evaluation_output(cfg.local_results_cache_dir)
-    else:
-        log.info("reading eval output from exp dir")
-        evaluation_output = evaluation_helpers.read_evaluation_output(exp_dir)
+    with profile_stage("read_evaluation_output"):
+        if cfg.local_results_cache_dir is not None:
+            log.info(f"Loading evaluation output from local cache directory: {cfg.local_results_cache_dir}")
+            evaluation_output = evaluation_helpers.read_evaluation_output(cfg.local_results_cache_dir)
+        else:
+            log.info("reading eval output from exp dir")
+            evaluation_output = evaluation_helpers.read_evaluation_output(exp_dir)
+
+    if cfg.sharding.num_shards > 1:
+        evaluation_output = evaluation_sharding.filter_to_shard(
+            evaluation_output, cfg.sharding.shard_index, cfg.sharding.num_shards
+        )
 
     if cfg.complete_override:
         log.info("Complete override is set to True. The (potentially) existing evaluation output will be overwritten.")
@@ -80,17 +61,100 @@ def run_evaluation(cfg: DictConfig):
     # Evaluate the predictions
     for _, ce in code_evaluators.items():
         log.info(f"Evaluating {len(predictions_dataset)} predictions with {ce.name}.")
-        evaluation_output = ce.evaluate_dataset(problems_dataset, predictions_dataset, evaluation_output, cfg.override)
+        with profile_stage(f"evaluate_dataset/{ce.name}"):
+            evaluation_output = ce.evaluate_dataset(
+                problems_dataset, predictions_dataset, evaluation_output, cfg.override
+            )
+
+    return evaluation_output
+
+
+def run_evaluation(cfg: DictConfig):
+    # Set seed for random number generators in PyTorch, Numpy and Python (random)
+    if cfg.get("seed"):
+        general_helpers.seed_everything(cfg.seed)
+
+    # Initialize the loggers
+    log.info("Instantiating loggers...")
+    loggers: List["Logger"] = general_helpers.instantiate_loggers(cfg.get("logger"))
+    if loggers:
+        log.info("Logging hyperparameters!")
+        utils.log_hyperparameters(cfg, None, loggers)
+
+    assert cfg.output_dir is not None, "Path to the directory in which the predictions will be written must be given"
+    cfg.output_dir = os.path.relpath(cfg.output_dir)
+    log.info(f"Output directory: {cfg.output_dir}")
+
+    # Time the stages of the evaluation (if enabled)
+    profiler = None
+    if cfg.profiling.enabled:
+        profiler = StageProfiler(cfg.output_dir, num_slowest_problems=cfg.profiling.num_slowest_problems)
+
+    with active_profiler(profiler):
+        sync_evaluate_and_upload(cfg)
+
+    if profiler is not None:
+        profiler.write()
+
+
+def sync_evaluate_and_upload(cfg: DictConfig):
+    # Get the inference run's config &
+    # Sync the predictions and the results from the artifact store (WandB by default) in the exp_dir
+    # (downloads the data if is not found locally)
+    artifact_store = evaluation_helpers.instantiate_artifact_store(cfg.get("artifact_store"))
+    run = artifact_store.run(cfg.wandb_run_path)
+    with profile_stage("sync_experiment_data"):
+        ir_wandb_config, ir_hydra_config, exp_dir = evaluation_helpers.sync_experiment_data(
+            cfg.wandb_run_path, work_dir=cfg.work_dir, artifact_store=artifact_store
+        )
+
+    # Initialize the predictions dataset
+    cfg.predictions_dataset.data_dir = general_helpers.get_predictions_dir_path(exp_dir)
+    with profile_stage("load_predictions"):
+        predictions_dataset = hydra.utils.instantiate(cfg.predictions_dataset, _recursive_=False)
+
+    sharding = cfg.sharding
+    is_shard = sharding.num_shards > 1 and not sharding.merge
+    if is_shard:
+        # only the problems of the shard are evaluated; the shards are then merged by a run with `sharding.merge`
+        predictions_dataset.data = evaluation_sharding.filter_to_shard(
+            predictions_dataset.data, sharding.shard_index, sharding.num_shards
+        )
+        log.info(f"[shard {sharding.shard_index}/{sharding.num_shards}] {len(predictions_dataset)} predictions")
+
+    if sharding.merge:
+        # every prediction must have been evaluated by one of the shards
+        evaluation_output = evaluation_sharding.merge_shards(
+            sharding.shards_dir, sharding.num_shards, expected_ids=[pred["id"] for pred in predictions_dataset]
+        )
+    else:
+        evaluation_output = evaluate_predictions(cfg, ir_hydra_config, exp_dir, predictions_dataset)
+
+    if is_shard:
+        path_to_shard_file = evaluation_sharding.write_shard(
+            sharding.shards_dir,
+            sharding.shard_index,
+            sharding.num_shards,
+            assigned_ids=[pred["id"] for pred in predictions_dataset],
+            evaluation_output=evaluation_output,
+            compression=cfg.output_compression,
+        )
+        # the original run only gets the merged evaluation output
+        general_helpers.upload_file_to_wandb(sharding.shards_dir, path_to_shard_file)  # current run
+        return
 
     log.info(f"Writing the evaluation output to disk...")
-    evaluation_helpers.write_evaluation_output(cfg.output_dir, evaluation_output)
+    with profile_stage("write_evaluation_output"):
+        path_to_evaluation_output_file = evaluation_helpers.write_evaluation_output(
+            cfg.output_dir, evaluation_output, compression=cfg.output_compression
+        )
 
     log.info(f"Output directory: {cfg.output_dir}")
 
     log.info(f"Uploading the evaluation output to WandB...")
-    path_to_evaluation_output_file = os.path.join(cfg.output_dir, "evaluation_output.jsonl")
-    general_helpers.upload_file_to_wandb(cfg.output_dir, path_to_evaluation_output_file)  # current run
-    run.upload_file(path_to_evaluation_output_file, root=cfg.output_dir)  # original run
+    with profile_stage("upload_evaluation_output"):
+        general_helpers.upload_file_to_wandb(cfg.output_dir, path_to_evaluation_output_file)  # current run
+        run.upload_file(path_to_evaluation_output_file, root=cfg.output_dir)  # original run
 
 
 @hydra.main(version_base="1.2", config_path="configs", config_name="evaluation_root")
@@ -7,10 +7,7 @@ dependencies = [{"url": "aiflows/CCFlows", "revision": "main"}]
 
 flow_verse.sync_dependencies(dependencies)
 
-from aiflows.flow_cache import CACHING_PARAMETERS, clear_cache
-
-CACHING_PARAMETERS.do_caching = True
-# clear_cache()
+from aiflows.flow_cache import CACHING_PARAMETERS
 
 from typing import Any, Dict, List
 
@@ -20,41 +17,100 @@ from pytorch_lightning.loggers import Logger
 from src import utils
 
 import hydra
+import copy
+import functools
 import os
 
 from pytorch_lightning import LightningDataModule
 from omegaconf import DictConfig, OmegaConf
 
-from src.utils import general_helpers
+from src.utils import evaluation_helpers, flow_cache, general_helpers, inference_helpers
 from aiflows.flow_launchers import MultiThreadedAPILauncher, FlowLauncher
+from src.launchers import AsyncFlowLauncher, FlowPool, ResumableFlowLauncher
+from src.datasets.cc_outputs import CompetitiveCodingOutputsDataset
+from src.evaluation import PipelinedEvaluation
 
 log = utils.get_pylogger(__name__)
 
 
-def instantiate_flows(cfg: DictConfig) -> List[Dict[str, Any]]:
-    if cfg.model.get("single_threaded", True):
+def instantiate_flow_with_interfaces(cfg: DictConfig) -> Dict[str, Any]:
+    flow = hydra.utils.instantiate(cfg.flow, _recursive_=False, _convert_="partial")
+    if cfg.flow_cache.enabled:
+        cache_params = OmegaConf.to_container(cfg.flow_cache, resolve=True)
+        cache_params.pop("enabled")
+        cached_flows = flow_cache.install_flow_cache(flow, flow_cache.get_flow_cache(**cache_params))
+        if cfg.flow_cache.offline and not cached_flows:
+            log.warning(f"None of the (sub)flows of <{cfg.flow._target_}> has `enable_cache`; nothing can be replayed")
+
+    return {
+        "flow": flow,
+        "input_interface": (
+            None
+            if getattr(cfg, "input_interface", None) is None
+            else hydra.utils.instantiate(cfg.input_interface, _recursive_=False)
+        ),
+        "output_interface": (
+            None
+            if getattr(cfg, "output_interface", None) is None
+            else hydra.utils.instantiate(cfg.output_interface, _recursive_=False)
+        ),
+    }
+
+
+def instantiate_flows(cfg: DictConfig, num_instances: int = None, name: str = "flows") -> FlowPool:
+    """Returns a pool of (at most `num_instances`) flow instances, constructed lazily when the workers need them."""
+    if num_instances is not None:
+        num_threads = num_instances
+    elif cfg.model.get("single_threaded", True):
         num_threads = 1
     else:
         num_threads = cfg.model.n_workers
 
-    flow_instances = []
-    for _ in range(num_threads):
-        flow_with_interfaces = {
-            "flow": hydra.utils.instantiate(cfg.flow, _recursive_=False, _convert_="partial"),
-            "input_interface": (
-                None
-                if getattr(cfg, "input_interface", None) is None
-                else hydra.utils.instantiate(cfg.input_interface, _recursive_=False)
-            ),
-            "output_interface": (
-                None
-                if getattr(cfg, "output_interface", None) is None
-                else hydra.utils.instantiate(cfg.output_interface, _recursive_=False)
-            ),
-        }
-        flow_instances.append(flow_with_interfaces)
-
-    return flow_instances
+    return FlowPool(factory=functools.partial(instantiate_flow_with_interfaces, cfg), max_size=num_threads, name=name)
+
+
+def instantiate_flows_per_api_key(cfg: DictConfig, model: AsyncFlowLauncher) -> Dict[str, FlowPool]:
+    """Creates a flow pool bound to each API key in `cfg.api_information` (or to all of them, if not given)."""
+    api_information = cfg.get("api_information", None)
+    if not api_information:
+        return {"default": instantiate_flows(cfg, num_instances=model.get_num_flows_per_key(num_keys=1))}
+
+    num_flows_per_key = model.get_num_flows_per_key(num_keys=len(api_information))
+    key2flows = {}
+    for key_idx, api_info in enumerate(api_information):
+        key_cfg = copy.deepcopy(cfg)
+        key_cfg.api_information = [api_info]
+
+        key = f"api_key_{key_idx}"
+        key2flows[key] = instantiate_flows(key_cfg, num_instances=num_flows_per_key, name=key)
+
+    log.info(f"Created a pool of up to {num_flows_per_key} flow instances for each of the {len(api_information)} keys.")
+    return key2flows
+
+
+def instantiate_pipelined_evaluation(cfg: DictConfig) -> PipelinedEvaluation:
+    """Sets up the evaluation of each prediction as soon as its flow run finishes."""
+    # the flows don't see the hidden test cases, so the problems are loaded again (only with the fields to evaluate)
+    hydra_config = {
+        "datamodule": {"dataset_parameters": OmegaConf.to_container(cfg.datamodule.dataset_parameters, resolve=True)}
+    }
+    problems_dataset = evaluation_helpers.get_dataset_used_in_run(
+        hydra_config,
+        "test",
+        # the reference solution is used to calibrate the time limits (if enabled)
+        fields_to_keep=["id", "contest", "public_tests_io", "hidden_tests_io", "working_solution"],
+    )
+
+    # the code evaluator is configured as in the local evaluation, as the only entry of `code_evaluator`
+    (code_evaluator_cfg,) = cfg.pipelined_evaluation.code_evaluator.values()
+    return PipelinedEvaluation(
+        code_evaluator=hydra.utils.instantiate(code_evaluator_cfg),
+        id2problem_data={problem["id"]: problem for problem in problems_dataset.data},
+        output_dir=cfg.output_dir,
+        get_prediction=CompetitiveCodingOutputsDataset.get_prediction,
+        num_workers=cfg.pipelined_evaluation.num_workers,
+        compression=cfg.output_compression,
+    )
 
 
 def run_inference(cfg: DictConfig):
@@ -62,9 +118,14 @@ def run_inference(cfg: DictConfig):
     if cfg.get("seed"):
         pl.seed_everything(cfg.seed, workers=True)
 
+    CACHING_PARAMETERS.do_caching = cfg.flow_cache.enabled
+    if cfg.flow_cache.offline:
+        assert cfg.flow_cache.enabled, "The offline mode replays the cached flow runs, so the cache must be enabled"
+        log.warning("Offline mode: only the cached flow runs are replayed; the datapoints missing from the cache fail")
+
     if cfg.experiment_path_to_continue is not None:
         log.warning(
-            f"Predictions from previous run will be loaded and ignored. "
+            f"Predictions from previous run will be carried over and only the missing ones will be run. "
             f"Predictions loaded from: `{cfg.experiment_path_to_continue}`"
         )
 
@@ -76,10 +137,6 @@ def run_inference(cfg: DictConfig):
     cfg.output_dir = os.path.relpath(cfg.output_dir)
     log.info(f"Output directory: `{os.path.join(cfg.work_dir, cfg.output_dir)}`")
 
-    # Initialize flow
-    log.info(f"Instantiating flow <{cfg.flow._target_}>")
-    flows = instantiate_flows(cfg)
-
     # Initialize the model
     log.info(f"Instantiating model <{cfg.model._target_}>")
 
@@ -91,6 +148,13 @@ def run_inference(cfg: DictConfig):
         model = hydra.utils.instantiate(cfg.model, output_dir=cfg.output_dir, _convert_="partial")
         model.loggers = loggers
 
+    # Initialize flow
+    log.info(f"Instantiating flow <{cfg.flow._target_}>")
+    if not launch_prediction and isinstance(model, AsyncFlowLauncher):
+        flows = instantiate_flows_per_api_key(cfg, model)
+    else:
+        flows = instantiate_flows(cfg)
+
     if loggers:
         log.info("Logging hyperparameters!")
         utils.log_hyperparameters(cfg, model, loggers)
@@ -107,17 +171,54 @@ def run_inference(cfg: DictConfig):
 
     # if model is a subclass of APIModel
     if not launch_prediction:
-        datamodule.setup(stage="test")
-        dataloader = datamodule.test_dataloader()
-        flat_dataloader = [sample for batch in dataloader for sample in batch]
+        pipelined_evaluation = None
+        if cfg.get("pipelined_evaluation") is not None:
+            log.info(f"Instantiating the pipelined evaluation <{list(cfg.pipelined_evaluation.code_evaluator)}>")
+            pipelined_evaluation = instantiate_pipelined_evaluation(cfg)
+            model.prediction_callbacks.append(pipelined_evaluation.submit)
 
-        model.predict_dataloader(flat_dataloader, flows)
+        datamodule.setup(stage="test")
+        if cfg.datamodule.get("streaming", False):
+            # the problems are read (and formatted) one at a time, as the launcher consumes them
+            samples = iter(datamodule.data_test)
+        else:
+            dataloader = datamodule.test_dataloader()
+            samples = (sample for batch in dataloader for sample in batch)
+
+        if cfg.experiment_path_to_continue is not None:
+            completed_ids, id2partial_outputs = inference_helpers.resume_predictions(
+                cfg.experiment_path_to_continue, cfg.output_dir, n_independent_samples=model.n_independent_samples
+            )
+            samples = inference_helpers.get_samples_to_run(samples, completed_ids, id2partial_outputs)
+
+            if pipelined_evaluation is not None:
+                path_to_resumed_predictions = os.path.join(
+                    general_helpers.get_predictions_dir_path(cfg.output_dir), inference_helpers.RESUMED_PREDICTIONS_FILE
+                )
+                for prediction in general_helpers.read_jsonlines(path_to_resumed_predictions):
+                    pipelined_evaluation.submit(prediction)
+
+        if not isinstance(model, ResumableFlowLauncher):
+            # the (multi-threaded) FlowLauncher needs the number of samples upfront
+            samples = list(samples)
+
+        try:
+            model.predict_dataloader(samples, flows)
+        finally:
+            if pipelined_evaluation is not None:
+                pipelined_evaluation.close()
+                general_helpers.upload_file_to_wandb(cfg.output_dir, pipelined_evaluation.path_to_output_file)
+            if model.instrumentation is not None:
+                general_helpers.upload_file_to_wandb(cfg.output_dir, model.instrumentation.path_to_output_file)
+            if cfg.output_compression is not None:
+                # the shards are appended to line by line during the inference, so they are compressed at the end
+                inference_helpers.compress_predictions(cfg.output_dir, cfg.output_compression)
     else:
         datamodule.setup(stage="test")
         dataloader = datamodule.test_dataloader()
         flat_dataloader = [sample for batch in dataloader for sample in batch]
 
-        FlowLauncher.launch(data=flat_dataloader, flow_with_interfaces=flows[0])
+        FlowLauncher.launch(data=flat_dataloader, flow_with_interfaces=flows.acquire())
 
 
 @hydra.main(version_base="1.2", config_path="configs", config_name="inference_root")
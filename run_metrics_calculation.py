@@ -1,16 +1,12 @@
 from src.utils import hydra_custom_resolvers
 
-from pytorch_lightning.loggers import LightningLoggerBase
 import hydra
 from omegaconf import DictConfig
-from queue import Queue
 
-import concurrent
+import concurrent.futures
 import os
 
-from typing import List, Dict, Union
-import wandb
-import pytorch_lightning as pl
+from typing import TYPE_CHECKING, List, Dict, Union
 import numpy as np
 from tqdm import tqdm
 
@@ -19,78 +15,56 @@ import src.utils.evaluation_helpers as evaluation_helpers
 from src.utils.evaluation_helpers import Results, EvaluationOutput
 from src import utils
 
-log = utils.get_pylogger(__name__)
-
-
-def get_score_from_metric(cfg, evaluation_output, metric_key, seed=None):
-    metric = hydra.utils.instantiate(cfg.metrics[metric_key], _recursive_=True)
-
-    score = metric.compute(evaluation_output, seed)
+if TYPE_CHECKING:
+    from pytorch_lightning.loggers import Logger
 
-    return score
+log = utils.get_pylogger(__name__)
 
 
 def get_bootstrap_run_scores(
     cfg,
-    evaluation_output_instances_queue,
+    metric,
+    evaluation_output,
     results,
     starting_seed,
     num_workers=1,
 ):
+    """Computes the metric's score for `cfg.bootstrap_n` bootstrap samples of the evaluation output.
+
+    The metrics resample and bucket the data through index arrays and never modify the evaluation output,
+    so a single (read-only) instance is shared by all the workers.
+    """
     seed2score = results.get("bootstrap_runs_scores", {})
 
-    run_scores_for_ci = []
+    seeds = [starting_seed + i for i in range(cfg.bootstrap_n)]
+    seeds_to_compute = [
+        seed for seed in seeds if read_precomputed_bootstrap_run_score(seed2score, seed, cfg.silent) is None
+    ]
 
-    # Use one instance of the metric for each worker
     with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-        for i in tqdm(range(cfg.bootstrap_n)):
-            seed = starting_seed + i
-
-            # ~~~ Read the precomputed result for the seed (if it has already computed) ~~~
-            precomputed_score = read_precomputed_bootstrap_run_score(seed2score, seed, cfg.silent)
-            if precomputed_score is not None:
-                run_scores_for_ci.append(precomputed_score)
-                continue
-
-            # ~~~ Compute the score for the specific seed ~~~
-            evaluation_output = evaluation_output_instances_queue.get()
+        # ~~~ Compute the score for the seeds that haven't been computed ~~~
+        if cfg.debug:
+            seed2future = None
+        else:
+            seed2future = {
+                seed: executor.submit(metric.compute, evaluation_output, seed=seed) for seed in seeds_to_compute
+            }
 
-            if cfg.debug:
-                seed2score[seed] = get_score_from_metric(
-                    cfg=cfg, evaluation_output=evaluation_output, metric_key=results["alias"], seed=seed
-                )
+        for seed in tqdm(seeds_to_compute):
+            if seed2future is None:
+                seed2score[seed] = metric.compute(evaluation_output, seed=seed)
             else:
-                future = executor.submit(
-                    get_score_from_metric,
-                    cfg=cfg,
-                    evaluation_output=evaluation_output,
-                    metric_key=results["alias"],
-                    seed=seed,
-                )
-                seed2score[seed] = future.result()
+                seed2score[seed] = seed2future[seed].result()
 
             # ~~~ Log the score (if not executing silently) ~~~
             if not cfg.get("silent", False):
                 score = seed2score[seed]
                 if isinstance(score, dict):
                     score = np.mean(list(score.values()))
-                # Below supoorts nested dicts, but when would we expect to have buckets of buckets?
-                #     is_subdict = False
-                #     for k, v in score.items():
-                #         if isinstance(v, dict):
-                #             is_subdict = True
-                #     if is_subdict == False:
-                #         score = np.mean(list(score.values()))
-                #     else:
-                #         score_list = []
-                #         for k, v in score.items():
-                #             score_list.append(np.mean(list(v.values())))
-                #         score = np.mean(score_list)
                 log.info(f"Score for seed {seed}: {score * 100:.2f}%.")
 
-            # ~~~ Add the score to the list of score that will be used to compute the confidence interval ~~~
-            run_scores_for_ci.append(seed2score[seed])
-            evaluation_output_instances_queue.put(evaluation_output)
+    # ~~~ Collect the scores that will be used to compute the confidence interval ~~~
+    run_scores_for_ci = [read_precomputed_bootstrap_run_score(seed2score, seed, silent=True) for seed in seeds]
 
     # ~~~ Update the cache of precomputed results if results for more runs were computed ~~~
     if len(results.get("bootstrap_runs_scores", {})) < len(seed2score):
@@ -120,6 +94,46 @@ def read_precomputed_bootstrap_run_score(seed2score, seed, silent=False):
     return None
 
 
+def compute_confidence_intervals(cfg, metric, metric_name, evaluation_output, results):
+    """Computes the closed-form (or vectorized) CIs from the per-problem scores and records them in the results."""
+    confidence_level = cfg.get("ci_confidence_level", 0.95)
+    problem_scores = metric.get_per_problem_scores(evaluation_output)
+
+    for ci_method in cfg.ci_methods:
+        if ci_method == "wilson":
+            scores = problem_scores.values() if isinstance(problem_scores, dict) else [problem_scores]
+            if not all(evaluation_helpers.is_binary(bucket_scores) for bucket_scores in scores):
+                log.warning(
+                    f"[{metric_name}] Skipping the `wilson` confidence interval, which requires binary problem scores."
+                )
+                continue
+
+        def _get_ci(scores):
+            return evaluation_helpers.get_ci(
+                scores,
+                method=ci_method,
+                confidence_level=confidence_level,
+                n_samples=cfg.get("bayesian_bootstrap_n", 10000),
+                seed=cfg.seed,
+            )
+
+        if isinstance(problem_scores, dict):
+            ci = {
+                bucket_id: _get_ci(bucket_problem_scores) for bucket_id, bucket_problem_scores in problem_scores.items()
+            }
+        else:
+            ci = _get_ci(problem_scores)
+
+        results.set_confidence_interval(metric.id, ci_method, ci, confidence_level)
+        bucket2ci = ci if isinstance(ci, dict) else {None: ci}
+        for bucket_id, (lower, mean, upper) in bucket2ci.items():
+            bucket_prefix = "" if bucket_id is None else f"[bucket {bucket_id}] "
+            log.info(
+                f"[{metric_name}] {bucket_prefix}`{ci_method}` confidence interval: "
+                f"[{lower * 100:.2f}, {mean * 100:.2f}, {upper * 100:.2f}]"
+            )
+
+
 def run_calculate_metrics(cfg: DictConfig) -> Dict[str, Dict[str, Union[str, float, List[float]]]]:
     """Contains the code for calculating metrics based on evaluation outputs.
     Args:
@@ -129,11 +143,11 @@ def run_calculate_metrics(cfg: DictConfig) -> Dict[str, Dict[str, Union[str, flo
     """
     # Set seed for random number generators in PyTorch, Numpy and Python (random)
     if cfg.get("seed"):
-        pl.seed_everything(cfg.seed, workers=True)
+        general_helpers.seed_everything(cfg.seed)
 
     # Initialize the loggers
     log.info("Instantiating loggers...")
-    loggers: List[LightningLoggerBase] = general_helpers.instantiate_loggers(cfg.get("logger"))
+    loggers: List["Logger"] = general_helpers.instantiate_loggers(cfg.get("logger"))
     if loggers:
         log.info("Logging hyperparameters!")
         utils.log_hyperparameters(cfg, None, loggers)
@@ -142,8 +156,8 @@ def run_calculate_metrics(cfg: DictConfig) -> Dict[str, Dict[str, Union[str, flo
     cfg.output_dir = os.path.relpath(cfg.output_dir)
     log.info(f"Output directory: {os.path.join(cfg.work_dir, cfg.output_dir)}")
 
-    api = wandb.Api()
-    run = api.run(cfg.wandb_run_path)
+    artifact_store = evaluation_helpers.instantiate_artifact_store(cfg.get("artifact_store"))
+    run = artifact_store.run(cfg.wandb_run_path)
 
     er_wandb_config, er_hydra_config, evaluation_dir = evaluation_helpers.sync_experiment_data(
         cfg.wandb_run_path,
@@ -153,14 +167,21 @@ def run_calculate_metrics(cfg: DictConfig) -> Dict[str, Dict[str, Union[str, flo
         replace_evaluation_output=cfg.replace_evaluation_output,
         sync_results=True,
         replace_results=True,
+        artifact_store=artifact_store,
     )
-    problems_dataset = evaluation_helpers.get_dataset_used_in_run(er_hydra_config, cfg.split_to_evaluate, cfg.data_dir)
-    evaluation_output = EvaluationOutput(evaluation_dir, problems_dataset=problems_dataset)
+    # In lean mode, only the ids, the problems' metadata and the tests' statuses are loaded
+    lean = cfg.get("lean_loading", False)
+    problems_dataset = evaluation_helpers.get_dataset_used_in_run(
+        er_hydra_config,
+        cfg.split_to_evaluate,
+        cfg.data_dir,
+        fields_to_keep=evaluation_helpers.LEAN_PROBLEM_FIELDS if lean else None,
+    )
+    evaluation_output = EvaluationOutput(evaluation_dir, problems_dataset=problems_dataset, lean=lean)
     results = Results(evaluation_dir)
     if cfg.complete_override:
         results.data = {}
 
-    evaluation_outputs_instances_queue = None
     metrics = hydra.utils.instantiate(cfg.metrics, _recursive_=True)
 
     log.info(f"Calculating metrics...")
@@ -172,6 +193,9 @@ def run_calculate_metrics(cfg: DictConfig) -> Dict[str, Dict[str, Union[str, flo
             score = results.get_score(metric.id, reduce_buckets_to_mean=True)
             log.info(f"[{metric.id}] Score: {score * 100:.2f}%")
 
+        if cfg.get("ci_methods", None):
+            compute_confidence_intervals(cfg, metric, metric_name, evaluation_output, results)
+
         if cfg.get("bootstrap_n", None):
             bootstrap_n = cfg.bootstrap_n
             starting_seed = cfg.seed
@@ -186,15 +210,13 @@ def run_calculate_metrics(cfg: DictConfig) -> Dict[str, Dict[str, Union[str, flo
 
             log.info(f"Getting bootstrap samples for {metric_name}")
 
-            if evaluation_outputs_instances_queue is None:
-                evaluation_outputs_instances_queue = Queue(cfg.num_workers)
-                for _ in range(cfg.num_workers):
-                    evaluation_outputs_instances_queue.put(
-                        EvaluationOutput(evaluation_dir, problems_dataset=problems_dataset)
-                    )
-
             bootstrap_run_scores = get_bootstrap_run_scores(
-                cfg, evaluation_outputs_instances_queue, results.data[metric.id], starting_seed, bootstrap_n
+                cfg,
+                metric,
+                evaluation_output,
+                results.data[metric.id],
+                starting_seed,
+                num_workers=cfg.get("num_workers", 1),
             )
             # ~~~ [Sanity check] Construct confidence intervals (CIs) from the bootstrap run scores ~~~
             if isinstance(bootstrap_run_scores[0], dict):
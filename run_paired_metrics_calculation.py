@@ -0,0 +1,144 @@
+from src.utils import hydra_custom_resolvers
+
+import hydra
+from omegaconf import DictConfig
+
+import json
+import os
+
+from typing import TYPE_CHECKING, List, Dict
+import numpy as np
+
+import src.utils.general_helpers as general_helpers
+import src.utils.evaluation_helpers as evaluation_helpers
+from src.utils.evaluation_helpers import EvaluationOutput
+from src import utils
+
+if TYPE_CHECKING:
+    from pytorch_lightning.loggers import Logger
+
+log = utils.get_pylogger(__name__)
+
+
+def load_evaluation_outputs(cfg: DictConfig) -> List[EvaluationOutput]:
+    """Syncs the evaluation output of each run and returns them aligned on the same (sorted) problems."""
+    lean = cfg.get("lean_loading", False)
+
+    artifact_store = evaluation_helpers.instantiate_artifact_store(cfg.get("artifact_store"))
+    evaluation_outputs = []
+    for wandb_run_path in cfg.wandb_run_paths:
+        _, er_hydra_config, evaluation_dir = evaluation_helpers.sync_experiment_data(
+            wandb_run_path,
+            work_dir=cfg.work_dir,
+            sync_predictions=False,
+            sync_evaluation_output=True,
+            replace_evaluation_output=cfg.replace_evaluation_output,
+            sync_results=False,
+            artifact_store=artifact_store,
+        )
+        problems_dataset = evaluation_helpers.get_dataset_used_in_run(
+            er_hydra_config,
+            cfg.split_to_evaluate,
+            cfg.data_dir,
+            fields_to_keep=evaluation_helpers.LEAN_PROBLEM_FIELDS if lean else None,
+        )
+        evaluation_outputs.append(EvaluationOutput(evaluation_dir, problems_dataset=problems_dataset, lean=lean))
+
+    return evaluation_helpers.align_evaluation_outputs(
+        evaluation_outputs, restrict_to_common_problems=cfg.restrict_to_common_problems
+    )
+
+
+def log_comparison(metric_name, comparison):
+    for run_id, run_results in comparison["runs"].items():
+        lower, _, upper = run_results["ci"]
+        log.info(
+            f"[{metric_name}] {run_id}: {run_results['score'] * 100:.2f}% "
+            f"(CI: [{lower * 100:.2f}, {upper * 100:.2f}])"
+        )
+
+    for pair_id, pair_results in comparison["differences"].items():
+        lower, _, upper = pair_results["ci"]
+        log.info(
+            f"[{metric_name}] {pair_id}: {pair_results['difference'] * 100:+.2f}% "
+            f"(CI: [{lower * 100:+.2f}, {upper * 100:+.2f}], p-value: {pair_results['p_value']:.4f})"
+        )
+
+
+def run_paired_metrics_calculation(cfg: DictConfig) -> Dict:
+    """Compares several runs on the same problems with a paired bootstrap: all the runs are scored on the same
+    `cfg.bootstrap_n` resamples of the problems, which are drawn at once for all the metrics and the runs.
+    Args:
+        cfg (DictConfig): Configuration composed by Hydra.
+    Returns:
+        Dict: Dictionary containing the per-run scores and the pairwise differences with their CIs, for each metric.
+    """
+    # Set seed for random number generators in PyTorch, Numpy and Python (random)
+    if cfg.get("seed"):
+        general_helpers.seed_everything(cfg.seed)
+
+    # Initialize the loggers
+    log.info("Instantiating loggers...")
+    loggers: List["Logger"] = general_helpers.instantiate_loggers(cfg.get("logger"))
+    if loggers:
+        log.info("Logging hyperparameters!")
+        utils.log_hyperparameters(cfg, None, loggers)
+
+    assert cfg.output_dir is not None, "Path to the directory in which the results will be written must be given"
+    assert len(cfg.wandb_run_paths) >= 2, "At least two runs are needed for a comparison"
+    cfg.output_dir = os.path.relpath(cfg.output_dir)
+    log.info(f"Output directory: {os.path.join(cfg.work_dir, cfg.output_dir)}")
+
+    evaluation_outputs = load_evaluation_outputs(cfg)
+    run_ids = list(cfg.wandb_run_paths)
+
+    metrics = hydra.utils.instantiate(cfg.metrics, _recursive_=True)
+
+    log.info(f"Calculating metrics...")
+    results = {}
+    for metric_name, metric in metrics.items():
+        run_problem_scores = [
+            metric.get_aligned_problem_scores(evaluation_output) for evaluation_output in evaluation_outputs
+        ]
+
+        def _compare(scores):
+            return evaluation_helpers.get_paired_bootstrap_comparison(
+                run_ids, np.stack(scores), cfg.ci_confidence_level, cfg.bootstrap_n, cfg.seed
+            )
+
+        if isinstance(run_problem_scores[0], dict):
+            comparison = {
+                bucket_id: _compare([scores[bucket_id] for scores in run_problem_scores])
+                for bucket_id in run_problem_scores[0]
+            }
+            for bucket_id, bucket_comparison in comparison.items():
+                log_comparison(f"{metric_name}/{bucket_id}", bucket_comparison)
+        else:
+            comparison = _compare(run_problem_scores)
+            log_comparison(metric_name, comparison)
+
+        results[metric.id] = {
+            "alias": metric_name,
+            "bootstrap_n": cfg.bootstrap_n,
+            "confidence_level": cfg.ci_confidence_level,
+            "comparison": comparison,
+        }
+
+    log.info(f"Writing the results to disk...")
+    path_to_results_file = os.path.join(cfg.output_dir, "paired_results.json")
+    with open(path_to_results_file, "w") as f:
+        json.dump(results, f)
+
+    log.info(f"Uploading the results to wandb...")
+    general_helpers.upload_file_to_wandb(cfg.output_dir, path_to_results_file)
+
+    return results
+
+
+@hydra.main(version_base="1.2", config_path="configs", config_name="paired_metrics_calculation")
+def main(hydra_config: DictConfig):
+    utils.run_task(hydra_config, run_paired_metrics_calculation)
+
+
+if __name__ == "__main__":
+    main()
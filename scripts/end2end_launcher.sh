@@ -22,6 +22,7 @@ COMPUTE_OVERALL_METRICS=true
 LIBRARY_VERSION=false
 
 _cmd_online_judge_single_threaded=""
+_cmd_pipelined_evaluation=""
 
 # Parse arguments
 while [[ $# -gt 0 ]]; do
@@ -116,6 +117,11 @@ while [[ $# -gt 0 ]]; do
       INFERENCE_ONLY=true
       shift 1
       ;;
+    --pipelined-evaluation)
+      # evaluate the predictions locally while the inference is running (the local evaluation then skips them)
+      _cmd_pipelined_evaluation="pipelined_evaluation=codeforces_local_evaluator"
+      shift 1
+      ;;
     *)
       echo "Invalid argument: $1" >&2
       exit 1
@@ -173,6 +179,7 @@ echo "  --inference-overrides: \"$INFERENCE_OVERRIDES\""
 echo "  --inference-only: \"$INFERENCE_ONLY\""
 echo "  --evaluation-overrides: \"$EVALUATION_OVERRIDES\""
 echo "  --compute-overall-metrics: \"$COMPUTE_OVERALL_METRICS\""
+echo "  --pipelined-evaluation: \"$_cmd_pipelined_evaluation\""
 echo ""
 
 export PYTHONPATH="."
@@ -206,7 +213,7 @@ if [ "$SHOW_COMMAND_OUTPUT" = "true" ]; then
     python $inference_script +experiment=$CONFIG_INFERENCE \
                             datamodule.debug=$DEBUG datamodule.debug_k=$DEBUG_K datamodule.bucket_debug_k=$BUCKET_DEBUG_K \
                             model.n_independent_samples=$N_INDEPENDENT_SAMPLES \
-                            $INFERENCE_OVERRIDES logger=$LOGGER prefix=$EXP_PREFIX | tee "$temp_file"
+                            $INFERENCE_OVERRIDES $_cmd_pipelined_evaluation logger=$LOGGER prefix=$EXP_PREFIX | tee "$temp_file"
     # Capture the return code (exit status) of the command
     return_code=${PIPESTATUS[0]}
 else
@@ -218,7 +225,7 @@ else
     python $inference_script +experiment=$CONFIG_INFERENCE \
                             datamodule.debug=$DEBUG datamodule.debug_k=$DEBUG_K datamodule.bucket_debug_k=$BUCKET_DEBUG_K \
                             model.n_independent_samples=$N_INDEPENDENT_SAMPLES \
-                            logger=$LOGGER prefix=$EXP_PREFIX > "$temp_file"
+                            $_cmd_pipelined_evaluation logger=$LOGGER prefix=$EXP_PREFIX > "$temp_file"
     # Capture the return code (exit status) of the command
     return_code=$?
 fi
@@ -0,0 +1,108 @@
+#!/bin/bash
+
+# Evaluates a run in NUM_SHARDS local processes (one per shard of the problems), then merges the shards into the
+# run's evaluation output. To spread the shards across machines that share the filesystem, run each shard's command
+# (printed below) on a different machine, and the merge command once all of them are done.
+
+# Define default values for the optional arguments
+LOGGER_DEFAULT="wandb"
+NUM_SHARDS_DEFAULT=4
+EVALUATION_OVERRIDES_DEFAULT=""
+
+# Parse arguments
+while [[ $# -gt 0 ]]; do
+  case $1 in
+    --wandb-run-path)
+      WANDB_RUN_PATH="$2"
+      shift 2
+      ;;
+    --config-evaluation)
+      CONFIG_EVALUATION="$2"
+      shift 2
+      ;;
+    # Optional arguments
+    --num-shards)
+      NUM_SHARDS="$2"
+      shift 2
+      ;;
+    --logger)
+      LOGGER="$2"
+      shift 2
+      ;;
+    --evaluation-overrides)
+      EVALUATION_OVERRIDES="$2"
+      shift 2
+      ;;
+    *)
+      echo "Invalid argument: $1" >&2
+      exit 1
+      ;;
+  esac
+done
+
+# Check if mandatory arguments have been set
+if [[ -z $WANDB_RUN_PATH || -z $CONFIG_EVALUATION ]]; then
+  echo "Error: Mandatory arguments --wandb-run-path and --config-evaluation must be provided" >&2
+  exit 1
+fi
+
+# Set default values for optional arguments if not provided
+LOGGER="${LOGGER:-$LOGGER_DEFAULT}"
+NUM_SHARDS="${NUM_SHARDS:-$NUM_SHARDS_DEFAULT}"
+EVALUATION_OVERRIDES="${EVALUATION_OVERRIDES:-$EVALUATION_OVERRIDES_DEFAULT}"
+
+# Print arguments
+echo "Arguments:"
+echo "  --wandb-run-path: \"$WANDB_RUN_PATH\""
+echo "  --config-evaluation: \"$CONFIG_EVALUATION\""
+echo "  --num-shards: \"$NUM_SHARDS\""
+echo "  --logger: \"$LOGGER\""
+echo "  --evaluation-overrides: \"$EVALUATION_OVERRIDES\""
+echo ""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+##### Evaluation of the shards
+
+pids=()
+for shard_index in $(seq 0 $((NUM_SHARDS - 1)))
+do
+  echo "Executing: python run_evaluation.py +experiment=$CONFIG_EVALUATION wandb_run_path=$WANDB_RUN_PATH logger=$LOGGER sharding.num_shards=$NUM_SHARDS sharding.shard_index=$shard_index $EVALUATION_OVERRIDES"
+  python run_evaluation.py +experiment=$CONFIG_EVALUATION \
+                           wandb_run_path=$WANDB_RUN_PATH \
+                           logger=$LOGGER \
+                           sharding.num_shards=$NUM_SHARDS \
+                           sharding.shard_index=$shard_index $EVALUATION_OVERRIDES &
+  pids+=($!)
+done
+
+for shard_index in "${!pids[@]}"
+do
+  wait ${pids[$shard_index]}
+
+  # Check if the command execution was successful
+  return_code=$?
+  if [ $return_code -ne 0 ]; then
+      echo
+      echo "[Sharded evaluation -- shard $shard_index] An error with return code '$return_code' occurred."
+      echo
+      exit $return_code
+  fi
+done
+
+##### Merge of the shards
+
+echo "Executing: python run_evaluation.py +experiment=$CONFIG_EVALUATION wandb_run_path=$WANDB_RUN_PATH logger=$LOGGER sharding.num_shards=$NUM_SHARDS sharding.merge=True $EVALUATION_OVERRIDES"
+python run_evaluation.py +experiment=$CONFIG_EVALUATION \
+                         wandb_run_path=$WANDB_RUN_PATH \
+                         logger=$LOGGER \
+                         sharding.num_shards=$NUM_SHARDS \
+                         sharding.merge=True $EVALUATION_OVERRIDES
+
+# Check if the command execution was successful
+return_code=$?
+if [ $return_code -ne 0 ]; then
+    echo
+    echo "[Sharded evaluation -- merge] An error with return code '$return_code' occurred."
+    echo
+    exit $return_code
+fi
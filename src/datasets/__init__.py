@@ -1,3 +1,12 @@
 from .abstract import AbstractDataset
-from .cc_outputs import CompetitiveCodingOutputsDataset
 from .codeforces import CodeforcesDataset
+
+
+def __getattr__(name):
+    # the outputs dataset depends on aiflows, which is only imported when the predictions are loaded
+    if name == "CompetitiveCodingOutputsDataset":
+        from .cc_outputs import CompetitiveCodingOutputsDataset
+
+        return CompetitiveCodingOutputsDataset
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,6 +2,7 @@ from typing import Dict
 
 from aiflows.datasets import OutputsDataset
 import src.utils as utils
+from src.utils.evaluation_helpers import read_predictions
 
 
 if __name__ == "__main__":
@@ -11,6 +12,21 @@ else:
 
 
 class CompetitiveCodingOutputsDataset(OutputsDataset):
+    def _load_data(self):
+        # same as `OutputsDataset._load_data`, but the prediction shards can also be compressed
+        self.data = read_predictions(self.params["data_dir"])
+
+        if self.filter_failed:
+            log.info("[Output DS] Filtering out the datapoints for which the prediction failed")
+            self.data = [sample for sample in self.data if sample["error"] is None]
+
+        if len(self.data) == 0:
+            log.warning("[Output DS] No predictions were loaded from %s", self.params["data_dir"])
+        else:
+            log.info(
+                "[Output DS] Loaded the predictions for %d datapoints from %s", len(self.data), self.params["data_dir"]
+            )
+
     @staticmethod
     def get_prediction(inference_output: Dict):
         output_data = inference_output["data"]["output_data"]
@@ -36,20 +36,26 @@ class CodeforcesDataset(AbstractDataset):
         self._setup_potential_filtering()
 
         self.data = None
-        self._load_data()
-
         self.plans = None
-        self._load_plans()
+        if not self.params.get("streaming", False):
+            # in streaming mode, the datapoints are read (lazily) when iterating over the dataset
+            self._load_data()
+            self._load_plans()
 
-    def _load_plans(self):
+    def _read_plans(self):
         plans_id = self.params.get("plans_id", None)
         if plans_id is None:
-            return
+            return None
 
         plans_path = os.path.join(self.params["plans_dir"], f"{plans_id}.jsonl")
         plans_data = utils.general_helpers.read_jsonlines(plans_path)
         log.info(f"Loaded plans for {len(plans_data)} from {plans_path}")
-        plans_data = {plan["id"]: plan for plan in plans_data}
+        return {plan["id"]: plan for plan in plans_data}
+
+    def _load_plans(self):
+        plans_data = self._read_plans()
+        if plans_data is None:
+            return
 
         data_with_plans = []
         for dp in self.data:
@@ -124,24 +130,37 @@ class CodeforcesDataset(AbstractDataset):
         if len(kwargs_to_filter_on) > 0:
             self.kwargs_to_filter_on = kwargs_to_filter_on
 
-    def _load_data(self):
-        path = os.path.join(
+    def _get_data_path(self):
+        return os.path.join(
             self.params["load_dataset_params"]["data_dir"], f"{self.params['load_dataset_params']['split']}.jsonl.gz"
         )
 
+    def _load_data(self):
+        path = self._get_data_path()
+
         with gzip.open(path, "r") as f:
             num_datapoints = sum(1 for line in f)
 
-        stream = gzip.open(path, "r")
-        json_reader = jsonlines.Reader(stream)
+        self.data = list(self._read_data(total=num_datapoints))
+        log.info(f"Loaded {len(self.data)} datapoints from {path}")
+        self.data = sorted(self.data, key=lambda x: x["contest"])
 
-        self.data = []
+    def _read_data(self, total=None):
+        """Reads (lazily) the datapoints that should be kept, in the order in which they are stored."""
+        path = self._get_data_path()
 
         num_problems_without_public_individual_tests = 0
         num_problems_with_non_unique_outputs = 0
+        num_datapoints_read = 0
+        if self.params["bucket_debug_k"]:
+            # the counters are consumed by `_to_keep`
+            self.bucket_counter = {bucket_id: self.params["bucket_debug_k"] for bucket_id in self.bucket_counter}
+
+        stream = gzip.open(path, "r")
+        json_reader = jsonlines.Reader(stream)
 
         idx = -1
-        for obj in tqdm(json_reader, total=num_datapoints, desc=f"Loading the data from: {path}"):
+        for obj in tqdm(json_reader, total=total, desc=f"Loading the data from: {path}"):
             idx += 1
 
             if obj["note"] == "":
@@ -170,8 +189,18 @@ class CodeforcesDataset(AbstractDataset):
             if not self._to_keep(obj):
                 continue
 
-            self.data.append(obj)
-            if self.params.get("debug", False) and len(self.data) >= self.params["debug_k"]:
+            if self.params.get("fields_to_keep", None) is not None:
+                # e.g., the metrics calculation doesn't need the (heavy) test cases and problem descriptions
+                obj = {key: obj[key] for key in self.params["fields_to_keep"] if key in obj}
+
+            if self.params.get("fields_to_drop", None) is not None:
+                # e.g., the flows shouldn't receive the hidden test cases
+                for key in self.params["fields_to_drop"]:
+                    obj.pop(key, None)
+
+            yield obj
+            num_datapoints_read += 1
+            if self.params.get("debug", False) and num_datapoints_read >= self.params["debug_k"]:
                 break
 
         stream.close()
@@ -182,7 +211,6 @@ class CodeforcesDataset(AbstractDataset):
                 if count > 0:
                     log.info(f"Bucket `{bucket_id}` has only {self.params['bucket_debug_k'] - count} datapoints")
 
-        log.info(f"Loaded {len(self.data)} datapoints from {path}")
         log.info(
             f"Number of problems without public individual tests (filtered): "
             f"{num_problems_without_public_individual_tests}"
@@ -196,7 +224,6 @@ class CodeforcesDataset(AbstractDataset):
             f"({'filtered' if filter_problems_with_non_unique_outputs else 'not filtered'}): "
             f"{num_problems_with_non_unique_outputs}"
         )
-        self.data = sorted(self.data, key=lambda x: x["contest"])
 
     def _to_keep(self, dp):
         if dp["id"] in self.ids_to_discard:
@@ -251,8 +278,26 @@ class CodeforcesDataset(AbstractDataset):
 
         return True
 
+    def __iter__(self):
+        if self.data is not None:
+            yield from super().__iter__()
+            return
+
+        # Streaming mode: the datapoints are read, formatted and yielded one at a time (in the order of the file)
+        plans_data = self._read_plans()
+        for dp in self._read_data():
+            if plans_data is not None:
+                if dp["id"] not in plans_data:
+                    log.warning(f"Datapoint {dp['id']} was discarded as it didn't have an oracle plan.")
+                    continue
+                dp.update(**plans_data[dp["id"]])
+
+            yield self._format_datapoint(dp)
+
     def __getitem__(self, idx):
-        dp = self.data[idx]
+        return self._format_datapoint(self.data[idx])
+
+    def _format_datapoint(self, dp):
 
         io_examples = []
 
@@ -1 +1,2 @@
 from .codeforces_local_evaluator import CodeforcesLocalEvaluator
+from .pipelined_evaluation import PipelinedEvaluation
@@ -1,7 +1,11 @@
 from typing import Dict
 
+from .stage_profiling import profile_problem, profile_stage
+from .failure_ordering import FailureStats, count_test_outcomes, get_test_order
 from .testing_utils_codeforces import evaluate_solution_for_problem
+from .time_limits import AdaptiveTimeLimits
 from src import utils
+from src.utils.inference_helpers import SAMPLE_BUDGET_KEY
 
 log = utils.get_pylogger(__name__)
 
@@ -9,11 +13,27 @@ log = utils.get_pylogger(__name__)
 class CodeforcesLocalEvaluator:
     name = "local_evaluator"
 
-    def __init__(self, eval_helper_params, num_workers=1, debug=False):
+    def __init__(self, eval_helper_params, num_workers=1, debug=False, path_to_test_stats=None, time_limits=None):
+        """
+        path_to_test_stats: if given, the tests of each problem are run in the order of their (historical) failure rate,
+            which is tracked in this file across the candidates and the evaluation runs (see `failure_ordering`)
+        time_limits: if enabled, each test gets a time limit calibrated from the runtime of the problem's reference
+            solution on it, capped at the `timeout` (see `AdaptiveTimeLimits` for the other parameters)
+        """
         self.num_workers = num_workers
         self.debug = debug
         self.eval_helper_params = eval_helper_params
         self.eval_helper_params["debug"] = debug
+        self.path_to_test_stats = path_to_test_stats
+
+        self.time_limits = None
+        if time_limits is not None and time_limits.get("enabled", False):
+            self.time_limits = AdaptiveTimeLimits(
+                **{key: value for key, value in time_limits.items() if key != "enabled"},
+                max_time_limit=eval_helper_params["timeout"],
+                add_extra_imports=eval_helper_params.get("add_extra_imports", False),
+                allow_truncated_io=eval_helper_params.get("allow_truncated_io", True),
+            )
 
     def evaluate_problem(self, problem_data, pred_data) -> Dict:
         """
@@ -25,6 +45,8 @@ class CodeforcesLocalEvaluator:
         pred_data:
             - id: id of the problem in our dataset
             - candidate_solutions: list of candidate solutions for the problem
+            - sample_budget: Optional(dict): how the candidates were sampled (see `SampleBudgetPolicy`), carried over
+              to the output for the metrics
         See the readme for the output format of this function.
         """
         assert pred_data["id"] == problem_data["id"]
@@ -32,27 +54,84 @@ class CodeforcesLocalEvaluator:
         if self.debug:
             log.info(f"Number of solutions: {len(pred_data['candidate_solutions'])}")
 
+        hidden_tests_io = problem_data["hidden_tests_io"] or []
+        public_tests_io = problem_data["public_tests_io"] or []
+        test_stats = None
+        if self.path_to_test_stats is not None:
+            test_stats = FailureStats(self.path_to_test_stats)
+            # the historical counts (used for the ordering) and the counts of this evaluation (to be added to them)
+            key2counts = test_stats.load(problem_data["id"])
+            new_key2counts = {}
+
+        tests_time_limits = {}
+        if self.time_limits is not None:
+            with profile_stage("calibrate_time_limits"):
+                tests_time_limits = {
+                    "hidden_tests_time_limits": self.time_limits.get_time_limits(problem_data, hidden_tests_io),
+                    "public_tests_time_limits": self.time_limits.get_time_limits(problem_data, public_tests_io),
+                }
+
         evaluation_results_per_candidate_solutions = []
 
         for solution in pred_data["candidate_solutions"]:
-            evaluation_results_per_candidate_solutions.append(
-                self.evaluate_solution(
-                    candidate_solution=solution,
-                    hidden_tests_io=problem_data["hidden_tests_io"],
-                    public_tests_io=problem_data["public_tests_io"],
-                )
+            tests_order = {}
+            if test_stats is not None:
+                tests_order = {
+                    "hidden_tests_order": get_test_order(hidden_tests_io, key2counts),
+                    "public_tests_order": get_test_order(public_tests_io, key2counts),
+                }
+
+            evaluation_results = self.evaluate_solution(
+                candidate_solution=solution,
+                hidden_tests_io=hidden_tests_io,
+                public_tests_io=public_tests_io,
+                **tests_order,
+                **tests_time_limits,
             )
+            evaluation_results_per_candidate_solutions.append(evaluation_results)
+
+            # a solution that doesn't compile or times out (as a whole) fails all the tests alike
+            if (
+                test_stats is not None
+                and evaluation_results["compilation_status"]
+                and not evaluation_results["timeout_error"]
+            ):
+                for counts in [key2counts, new_key2counts]:
+                    count_test_outcomes(hidden_tests_io, evaluation_results["hidden_tests_results"], counts)
+                    count_test_outcomes(public_tests_io, evaluation_results["public_tests_results"], counts)
+
+        if test_stats is not None:
+            test_stats.update(problem_data["id"], new_key2counts)
 
         complete_evaluation_output = {
             "id": pred_data["id"],
             self.name: evaluation_results_per_candidate_solutions,
         }
+        if SAMPLE_BUDGET_KEY in pred_data:
+            complete_evaluation_output[SAMPLE_BUDGET_KEY] = pred_data[SAMPLE_BUDGET_KEY]
         return complete_evaluation_output
 
-    def evaluate_solution(self, candidate_solution, hidden_tests_io, public_tests_io):
-        return evaluate_solution_for_problem(
-            candidate_solution, hidden_tests_io, public_tests_io, **self.eval_helper_params
-        )
+    def evaluate_solution(
+        self,
+        candidate_solution,
+        hidden_tests_io,
+        public_tests_io,
+        hidden_tests_order=None,
+        public_tests_order=None,
+        hidden_tests_time_limits=None,
+        public_tests_time_limits=None,
+    ):
+        with profile_stage("evaluate_solution"):
+            return evaluate_solution_for_problem(
+                candidate_solution,
+                hidden_tests_io,
+                public_tests_io,
+                hidden_tests_order=hidden_tests_order,
+                public_tests_order=public_tests_order,
+                hidden_tests_time_limits=hidden_tests_time_limits,
+                public_tests_time_limits=public_tests_time_limits,
+                **self.eval_helper_params,
+            )
 
     def evaluate_dataset(self, problems_dataset, predictions_dataset, existing_evaluation_output=[], override=False):
         id2problem_data = {problem["id"]: problem for problem in problems_dataset.data}
@@ -62,6 +141,7 @@ class CodeforcesLocalEvaluator:
                 "candidate_solutions": [
                     predictions_dataset.get_prediction(output) for output in pred["inference_outputs"]
                 ],
+                **({SAMPLE_BUDGET_KEY: pred[SAMPLE_BUDGET_KEY]} if SAMPLE_BUDGET_KEY in pred else {}),
             }
             for pred in predictions_dataset
         }
@@ -72,7 +152,8 @@ class CodeforcesLocalEvaluator:
                 log.info(f"Skipping evaluation for problem {_id} as it already exists.")
                 continue
             eval_output = id2eval_output_data.get(_id, {})
-            eval_output.update(self.evaluate_problem(id2problem_data[_id], id2pred_data[_id]))
+            with profile_problem(_id):
+                eval_output.update(self.evaluate_problem(id2problem_data[_id], id2pred_data[_id]))
             id2eval_output_data[_id] = eval_output
 
         evaluation_outputs = list(id2eval_output_data.values())
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+from typing import Dict, List, Tuple
+
+from src import utils
+
+log = utils.get_pylogger(__name__)
+
+
+def get_test_key(test) -> str:
+    """Identifies a test (an input-output pair) by its content, so that the statistics don't depend on its index."""
+    return hashlib.sha1(json.dumps(test).encode("utf-8")).hexdigest()
+
+
+def _get_input_size(test) -> int:
+    test_input = test[0]
+    return len("\n".join(test_input)) if isinstance(test_input, list) else len(test_input)
+
+
+def get_test_order(tests, key2counts: Dict[str, Tuple[int, int]]) -> List[int]:
+    """The indices of the tests, ordered by their (historical) failure rate, and then by the size of their input, so that
+    a failing candidate solution fails as early as possible."""
+    keys = [get_test_key(test) for test in tests]
+
+    def _failure_rate(index):
+        num_runs, num_failures = key2counts.get(keys[index], (0, 0))
+        return num_failures / (num_runs + 1)
+
+    return sorted(range(len(tests)), key=lambda index: (-_failure_rate(index), _get_input_size(tests[index]), index))
+
+
+class FailureStats:
+    """Persistent (SQLite) per-problem statistics of how often each test was run and failed, shared by the evaluation
+    runs (and by concurrent evaluation processes)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS test_failures ("
+            "problem_id TEXT, test_key TEXT, num_runs INTEGER, num_failures INTEGER, "
+            "PRIMARY KEY (problem_id, test_key))"
+        )
+        return connection
+
+    def load(self, problem_id: str) -> Dict[str, Tuple[int, int]]:
+        """Returns test_key -> (num_runs, num_failures) for the tests of the problem."""
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT test_key, num_runs, num_failures FROM test_failures WHERE problem_id = ?", (problem_id,)
+            ).fetchall()
+        return {test_key: (num_runs, num_failures) for test_key, num_runs, num_failures in rows}
+
+    def update(self, problem_id: str, key2counts: Dict[str, Tuple[int, int]]):
+        """Adds the (num_runs, num_failures) of the tests to their statistics."""
+        if not key2counts:
+            return
+
+        rows = [
+            (problem_id, test_key, num_runs, num_failures) for test_key, (num_runs, num_failures) in key2counts.items()
+        ]
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT INTO test_failures VALUES (?, ?, ?, ?) ON CONFLICT (problem_id, test_key) DO UPDATE SET "
+                "num_runs = num_runs + excluded.num_runs, num_failures = num_failures + excluded.num_failures",
+                rows,
+            )
+
+
+def count_test_outcomes(tests, test_results, key2counts: Dict[str, Tuple[int, int]]):
+    """Adds the outcomes of the tests that were run to `key2counts` (in place)."""
+    for test, test_result in zip(tests, test_results):
+        if test_result.get("not_run", False):
+            continue
+
+        test_key = get_test_key(test)
+        num_runs, num_failures = key2counts.get(test_key, (0, 0))
+        key2counts[test_key] = (num_runs + 1, num_failures + (not test_result["status"]))
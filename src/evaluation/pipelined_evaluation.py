@@ -0,0 +1,123 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+import jsonlines
+
+from src import utils
+from src.utils import evaluation_helpers
+from src.utils.inference_helpers import SAMPLE_BUDGET_KEY
+
+log = utils.get_pylogger(__name__)
+
+
+def _evaluate_problem(code_evaluator, problem_data, pred_data):
+    return code_evaluator.evaluate_problem(problem_data, pred_data)
+
+
+class PipelinedEvaluation:
+    """Evaluates the predictions with a (local) code evaluator as soon as they are submitted, i.e., while the
+    inference is still running.
+
+    The predictions are evaluated in `num_workers` processes (the local evaluator runs a single problem at a time per
+    process), and each evaluation output is appended to `evaluation_output.jsonl` in the output directory as soon as
+    it is available. When closed, the file is rewritten sorted by id (and compressed with `compression`, if given), as
+    `CodeforcesLocalEvaluator.evaluate_dataset` would have written it, so that `run_evaluation.py` skips the problems
+    that are already evaluated.
+    """
+
+    def __init__(
+        self,
+        code_evaluator,
+        id2problem_data: Dict[str, Dict],
+        output_dir: str,
+        get_prediction: Callable[[Dict], str],
+        num_workers: int = 4,
+        compression: Optional[str] = None,
+    ):
+        self.code_evaluator = code_evaluator
+        self.id2problem_data = id2problem_data
+        self.output_dir = output_dir
+        self.get_prediction = get_prediction
+        self.compression = compression
+
+        self.path_to_output_file = os.path.join(output_dir, "evaluation_output.jsonl")
+        # the solutions are run in subprocesses (with signals), so the workers are spawned rather than forked
+        # from the (multi-threaded) inference process
+        self.executor = ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._lock = threading.Lock()
+        self._futures = set()
+        self._start_time = time.perf_counter()
+
+        self.stats = {"num_submitted": 0, "num_evaluated": 0, "num_failed": 0, "num_skipped": 0}
+
+    def submit(self, prediction: Dict):
+        """Schedules the evaluation of a prediction (with the keys written by the launcher) and returns immediately."""
+        if prediction.get("error") is not None or prediction["id"] not in self.id2problem_data:
+            # same as the predictions dataset used by `run_evaluation.py`, which drops the failed predictions
+            with self._lock:
+                self.stats["num_skipped"] += 1
+            return
+
+        # the inference outputs are messages; the evaluator expects them in their serialized (dict) form
+        inference_outputs = json.loads(json.dumps(prediction["inference_outputs"], default=lambda obj: obj.to_dict()))
+        pred_data = {
+            "id": prediction["id"],
+            "candidate_solutions": [self.get_prediction(output) for output in inference_outputs],
+        }
+        if SAMPLE_BUDGET_KEY in prediction:
+            pred_data[SAMPLE_BUDGET_KEY] = prediction[SAMPLE_BUDGET_KEY]
+
+        future = self.executor.submit(
+            _evaluate_problem, self.code_evaluator, self.id2problem_data[prediction["id"]], pred_data
+        )
+        with self._lock:
+            self.stats["num_submitted"] += 1
+            self._futures.add(future)
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        with self._lock:
+            self._futures.discard(future)
+            try:
+                evaluation_output = future.result()
+            except Exception:
+                log.exception("The evaluation of a prediction failed")
+                self.stats["num_failed"] += 1
+                return
+
+            with jsonlines.open(self.path_to_output_file, "a") as writer:
+                writer.write(evaluation_output)
+            self.stats["num_evaluated"] += 1
+
+    def close(self):
+        """Waits for the pending evaluations and writes the final (sorted) evaluation output."""
+        with self._lock:
+            num_pending = len(self._futures)
+        log.info(f"Inference done; waiting for the {num_pending} pending evaluations...")
+        self.executor.shutdown(wait=True)
+
+        id2evaluation_output = {
+            evaluation_output["id"]: evaluation_output for evaluation_output in self._read_evaluation_outputs()
+        }
+        # the final evaluation output replaces the one that was appended to
+        self.path_to_output_file = evaluation_helpers.write_evaluation_output(
+            self.output_dir, [id2evaluation_output[_id] for _id in sorted(id2evaluation_output)], self.compression
+        )
+
+        log.info(
+            f"[{self.code_evaluator.name}] Evaluated {self.stats['num_evaluated']} predictions while running the "
+            f"inference (failed: {self.stats['num_failed']}, skipped: {self.stats['num_skipped']}); "
+            f"{time.perf_counter() - self._start_time:.2f}s since the start of the inference"
+        )
+
+    def _read_evaluation_outputs(self):
+        if not os.path.isfile(self.path_to_output_file):
+            return []
+
+        with jsonlines.open(self.path_to_output_file, "r") as reader:
+            return list(reader)
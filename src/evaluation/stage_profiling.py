@@ -0,0 +1,213 @@
+import bisect
+import contextlib
+import cProfile
+import heapq
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src import utils
+
+log = utils.get_pylogger(__name__)
+
+# the profiler of the current evaluation run (the stages run outside of it are not timed)
+_ACTIVE_PROFILER: Optional["StageProfiler"] = None
+
+# the upper bounds (in seconds) of the buckets of the stages' duration histograms
+HISTOGRAM_BUCKETS = [1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0, float("inf")]
+
+
+def _get_empty_stats() -> Dict[str, Any]:
+    return {"count": 0, "total": 0.0, "max": 0.0, "histogram": [0] * len(HISTOGRAM_BUCKETS)}
+
+
+def _format_bucket(upper_bound: float) -> str:
+    if upper_bound == float("inf"):
+        return f">{HISTOGRAM_BUCKETS[-2]:g}s"
+    return f"<={upper_bound:g}s"
+
+
+class StageProfiler:
+    """Times the stages of an evaluation run (e.g., the loading of the data, and the compilation, the execution, the
+    output capture and the output comparison of each test), as a count, a total, a maximum and a histogram of the
+    durations per stage, which are written to `stage_profile.json` in the output directory.
+
+    If `num_slowest_problems` > 0, each problem's evaluation is also profiled with cProfile, and the profiles of the
+    slowest problems are written to `profiles/<problem id>.prof` (e.g., for `snakeviz` or `python -m pstats`).
+
+    The candidate solutions are run in a subprocess (see `evaluate_solution_for_problem`), which times its stages with
+    its own profiler and sends the timings (and its cProfile dump) back to be merged with `merge`.
+    """
+
+    FILE_NAME = "stage_profile.json"
+    PROFILES_DIR = "profiles"
+
+    def __init__(self, output_dir: Optional[str] = None, num_slowest_problems: int = 0):
+        self.output_dir = output_dir
+        self.num_slowest_problems = num_slowest_problems
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stage2stats: Dict[str, Dict[str, Any]] = {}
+        # a min-heap of (duration, problem_id, path to the profile) of the slowest problems
+        self._slowest_problems = []
+
+    def record(self, stage: str, duration: float):
+        with self._lock:
+            stats = self.stage2stats.setdefault(stage, _get_empty_stats())
+            stats["count"] += 1
+            stats["total"] += duration
+            stats["max"] = max(stats["max"], duration)
+            stats["histogram"][bisect.bisect_left(HISTOGRAM_BUCKETS, duration)] += 1
+
+    @contextlib.contextmanager
+    def stage(self, stage: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start_time)
+
+    def merge(self, stage2stats: Dict[str, Dict[str, Any]]):
+        """Adds the timings of another profiler (e.g., of the subprocess that ran a candidate solution)."""
+        with self._lock:
+            for stage, other_stats in stage2stats.items():
+                stats = self.stage2stats.setdefault(stage, _get_empty_stats())
+                stats["count"] += other_stats["count"]
+                stats["total"] += other_stats["total"]
+                stats["max"] = max(stats["max"], other_stats["max"])
+                stats["histogram"] = [a + b for a, b in zip(stats["histogram"], other_stats["histogram"])]
+
+    def add_profile(self, path_to_profile: str):
+        """Attaches a cProfile dump to the problem that is being evaluated (in this thread)."""
+        paths_to_profiles = getattr(self._local, "paths_to_profiles", None)
+        if paths_to_profiles is None:
+            os.remove(path_to_profile)
+            return
+        paths_to_profiles.append(path_to_profile)
+
+    @contextlib.contextmanager
+    def problem(self, problem_id: str):
+        """Wraps the evaluation of a problem, which is timed and, if `num_slowest_problems` > 0, profiled."""
+        self._local.paths_to_profiles = [] if self.num_slowest_problems > 0 else None
+        profile = cProfile.Profile() if self.num_slowest_problems > 0 else None
+        start_time = time.perf_counter()
+        try:
+            if profile is not None:
+                profile.enable()
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            duration = time.perf_counter() - start_time
+            self.record("problem", duration)
+
+            if profile is not None:
+                self._keep_if_slowest(problem_id, duration, profile, self._local.paths_to_profiles)
+            self._local.paths_to_profiles = None
+
+    def _keep_if_slowest(self, problem_id, duration, profile, paths_to_profiles):
+        with self._lock:
+            is_slowest = (
+                len(self._slowest_problems) < self.num_slowest_problems or duration > self._slowest_problems[0][0]
+            )
+
+        path_to_profile = None
+        if is_slowest:
+            # the profile of the problem's process, and of the subprocesses that ran its candidate solutions
+            stats = pstats.Stats(profile)
+            for path in paths_to_profiles:
+                stats.add(path)
+
+            fd, path_to_profile = tempfile.mkstemp(suffix=".prof")
+            os.close(fd)
+            stats.dump_stats(path_to_profile)
+
+        for path in paths_to_profiles:
+            os.remove(path)
+        if not is_slowest:
+            return
+
+        with self._lock:
+            heapq.heappush(self._slowest_problems, (duration, problem_id, path_to_profile))
+            if len(self._slowest_problems) > self.num_slowest_problems:
+                _, _, path_to_dropped_profile = heapq.heappop(self._slowest_problems)
+                os.remove(path_to_dropped_profile)
+
+    def get_summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stage2stats = {stage: dict(stats) for stage, stats in self.stage2stats.items()}
+
+        summary = {"stages": {}}
+        for stage, stats in sorted(stage2stats.items()):
+            summary["stages"][stage] = {
+                "count": stats["count"],
+                "total": stats["total"],
+                "mean": stats["total"] / stats["count"],
+                "max": stats["max"],
+                "histogram": {
+                    _format_bucket(upper_bound): count
+                    for upper_bound, count in zip(HISTOGRAM_BUCKETS, stats["histogram"])
+                },
+            }
+        return summary
+
+    def write(self):
+        """Writes the summary (and the profiles of the slowest problems) to the output directory."""
+        summary = self.get_summary()
+
+        slowest_problems = []
+        if self._slowest_problems:
+            os.makedirs(os.path.join(self.output_dir, self.PROFILES_DIR), exist_ok=True)
+        for duration, problem_id, path_to_tmp_profile in sorted(self._slowest_problems, reverse=True):
+            path_to_profile = os.path.join(self.PROFILES_DIR, f"{str(problem_id).replace(os.sep, '_')}.prof")
+            shutil.move(path_to_tmp_profile, os.path.join(self.output_dir, path_to_profile))
+            slowest_problems.append({"id": problem_id, "duration": duration, "profile": path_to_profile})
+        self._slowest_problems = []
+        if slowest_problems:
+            summary["slowest_problems"] = slowest_problems
+
+        path_to_output_file = os.path.join(self.output_dir, self.FILE_NAME)
+        with open(path_to_output_file, "w") as f:
+            json.dump(summary, f, indent=2)
+
+        lines = [f"{'stage':<32}{'count':>10}{'total (s)':>12}{'mean (ms)':>12}{'max (ms)':>12}"]
+        for stage, stats in summary["stages"].items():
+            lines.append(
+                f"{stage[-32:]:<32}{stats['count']:>10}{stats['total']:>12.2f}"
+                f"{stats['mean'] * 1000:>12.3f}{stats['max'] * 1000:>12.1f}"
+            )
+        log.info(f"Evaluation stages (see `{path_to_output_file}`):\n" + "\n".join(lines))
+
+
+def get_active_profiler() -> Optional[StageProfiler]:
+    return _ACTIVE_PROFILER
+
+
+@contextlib.contextmanager
+def active_profiler(profiler: Optional[StageProfiler]):
+    """Makes the profiler the active one (within the context)."""
+    global _ACTIVE_PROFILER
+    previous_profiler = _ACTIVE_PROFILER
+    _ACTIVE_PROFILER = profiler
+    try:
+        yield profiler
+    finally:
+        _ACTIVE_PROFILER = previous_profiler
+
+
+def profile_stage(stage: str):
+    """Times the stage with the active profiler, if any (and is a no-op otherwise)."""
+    if _ACTIVE_PROFILER is None:
+        return contextlib.nullcontext()
+    return _ACTIVE_PROFILER.stage(stage)
+
+
+def profile_problem(problem_id: str):
+    if _ACTIVE_PROFILER is None:
+        return contextlib.nullcontext()
+    return _ACTIVE_PROFILER.problem(problem_id)
@@ -1,9 +1,12 @@
 # This is based heavily on the huggingface APPS metric
+import os
 import re
 
 # to run the solution files we're using a timing based approach
 import signal
 import sys
+import cProfile
+import tempfile
 
 # for capturing the stdout
 from io import StringIO
@@ -18,12 +21,18 @@ from wrapt_timeout_decorator import timeout as wrapt_timeout
 import threading
 
 from src.datasets.schema import assert_test_format_codeforces
+from src.evaluation.stage_profiling import StageProfiler, active_profiler, get_active_profiler, profile_stage
 
 import src.utils as utils
 
 log = utils.get_pylogger(__name__)
 lock = threading.Lock()
 
+# the error messages of the tests that were not run (and are marked with `not_run`), as a previous test failed (with
+# `stop_on_first_failure`), or as the candidate solution failed the public tests (with `staged_evaluation`)
+NOT_RUN_ERROR_MESSAGE = "Not run (a previous test failed)."
+NOT_RUN_PUBLIC_TESTS_FAILED_ERROR_MESSAGE = "Not run (the public tests failed)."
+
 
 def evaluate_solution_for_problem(
     candidate_solution,
@@ -33,6 +42,12 @@ def evaluate_solution_for_problem(
     debug=False,
     add_extra_imports=False,
     allow_truncated_io=False,
+    stop_on_first_failure=False,
+    staged_evaluation=False,
+    hidden_tests_order=None,
+    public_tests_order=None,
+    hidden_tests_time_limits=None,
+    public_tests_time_limits=None,
 ):
     with lock:
         """See the readme for the output format of this function."""
@@ -69,20 +84,85 @@ def evaluate_solution_for_problem(
             }
             return results_dict
 
+        # the tests are run in a subprocess, which times its stages (and is profiled) on its own; the timings (and the
+        # profile) are merged into the active profiler
+        profiler = get_active_profiler()
+        time_stages = profiler is not None
+        profile_code = profiler is not None and profiler.num_slowest_problems > 0
+
         @wrapt_timeout(timeout, use_signals=False)
         def run_tests():
-            hidden_tests_results = check_correctness(
-                candidate_solution, hidden_tests_io, timeout, debug, add_extra_imports, allow_truncated_io
-            )
-            public_tests_results = check_correctness(
-                candidate_solution, public_tests_io, timeout, debug, add_extra_imports, allow_truncated_io
-            )
+            with active_profiler(StageProfiler() if time_stages else None) as subprocess_profiler:
+                profile = cProfile.Profile() if profile_code else None
+                if profile is not None:
+                    profile.enable()
+                with profile_stage("run_tests"):
+                    hidden_tests_results, public_tests_results = _run_tests()
+
+            path_to_profile = None
+            if profile is not None:
+                profile.disable()
+                fd, path_to_profile = tempfile.mkstemp(suffix=".prof")
+                os.close(fd)
+                profile.dump_stats(path_to_profile)
+
+            stage2stats = subprocess_profiler.stage2stats if time_stages else None
+            return hidden_tests_results, public_tests_results, stage2stats, path_to_profile
+
+        def _run_tests():
+            if staged_evaluation:
+                # the (few) public tests are run first, and the hidden tests only if they all pass
+                public_tests_results = _check_public_tests()
+                public_tests_passed = all(result["status"] for result in public_tests_results["results"])
+                # a solution that doesn't compile fails (without running) the hidden tests as in the non-staged mode
+                if public_tests_passed or not public_tests_results["compilation_status"]:
+                    hidden_tests_results = _check_hidden_tests()
+                else:
+                    hidden_tests_results = {
+                        **public_tests_results,
+                        "results": _get_not_run_results(hidden_tests_io, NOT_RUN_PUBLIC_TESTS_FAILED_ERROR_MESSAGE),
+                    }
+                return hidden_tests_results, public_tests_results
+
+            hidden_tests_results = _check_hidden_tests()
+            public_tests_results = _check_public_tests()
 
             return hidden_tests_results, public_tests_results
 
+        def _check_hidden_tests():
+            return check_correctness(
+                candidate_solution,
+                hidden_tests_io,
+                timeout,
+                debug,
+                add_extra_imports,
+                allow_truncated_io,
+                stop_on_first_failure,
+                hidden_tests_order,
+                hidden_tests_time_limits,
+            )
+
+        def _check_public_tests():
+            return check_correctness(
+                candidate_solution,
+                public_tests_io,
+                timeout,
+                debug,
+                add_extra_imports,
+                allow_truncated_io,
+                stop_on_first_failure,
+                public_tests_order,
+                public_tests_time_limits,
+            )
+
         try:
-            hidden_tests_results, public_tests_results = run_tests()
+            hidden_tests_results, public_tests_results, stage2stats, path_to_profile = run_tests()
             timeout_error_occurred = False
+
+            if stage2stats is not None:
+                profiler.merge(stage2stats)
+            if path_to_profile is not None:
+                profiler.add_profile(path_to_profile)
         except BaseException as e:
             log.info(e)
             hidden_tests_results = {}
@@ -135,6 +215,9 @@ def check_correctness(
     debug=True,
     add_extra_imports=False,
     allow_truncated_io=True,
+    stop_on_first_failure=False,
+    test_order=None,
+    test_time_limits=None,
 ):
     """
     wrapping the testing code in a global timeout, based on huggingface code
@@ -146,7 +229,16 @@ def check_correctness(
         inputs, outputs = zip(*tests)
 
     compilation_error, results = run_test(
-        candidate_solution, inputs, outputs, timeout, debug, add_extra_imports, allow_truncated_io
+        candidate_solution,
+        inputs,
+        outputs,
+        timeout,
+        debug,
+        add_extra_imports,
+        allow_truncated_io,
+        stop_on_first_failure,
+        test_order,
+        test_time_limits,
     )
 
     assert len(results) == len(inputs)
@@ -190,16 +282,33 @@ class Capturing(list):
         return self
 
     def __exit__(self, *args):
-        self.extend(self._stringio.getvalue().splitlines())
-        del self._stringio  # free up some memory
-        sys.stdout = self._stdout
+        with profile_stage("output_capture"):
+            self.extend(self._stringio.getvalue().splitlines())
+            del self._stringio  # free up some memory
+            sys.stdout = self._stdout
 
 
-def run_test(code, inputs, outputs, timeout: int = 6000, debug=True, add_extra_imports=False, allow_truncated_io=True):
+def run_test(
+    code,
+    inputs,
+    outputs,
+    timeout: int = 6000,
+    debug=True,
+    add_extra_imports=False,
+    allow_truncated_io=True,
+    stop_on_first_failure=False,
+    test_order=None,
+    test_time_limits=None,
+):
     """
     runs the code and tries to match inputs and outputs
     the scraped testcases may be incomplete
     if allow_truncated_io==True, then we ignore an EOF exception at the end of the generated output
+    the tests are run in the order of `test_order` (a permutation of their indices), if given, but the results are
+    returned in the original order of the tests; if stop_on_first_failure==True, the tests after the first failing one
+    are not run, and are marked as failed with `not_run`
+    if given, `test_time_limits` are the time limits (in seconds) of the tests, which fail with a `TimeoutException`
+    when they exceed them
     """
     # Disable functionalities that can make destructive changes to the test.
 
@@ -248,7 +357,8 @@ def run_test(code, inputs, outputs, timeout: int = 6000, debug=True, add_extra_i
     # convert the solution snippet into a pyext runtime module
     sol_module = None
     try:
-        sol_module = RuntimeModule.from_string("tmp_sol", "", sol)
+        with profile_stage("compilation"):
+            sol_module = RuntimeModule.from_string("tmp_sol", "", sol)
         signal.alarm(0)
     except Exception as e:
         signal.alarm(0)
@@ -292,7 +402,13 @@ def run_test(code, inputs, outputs, timeout: int = 6000, debug=True, add_extra_i
 
     # go through all tests, call our runtime module with the inputs
     # then compare with the reference output
-    for index, (test_input, reference_output) in enumerate(zip(inputs, outputs)):
+    results = [None] * len(inputs)
+    if test_order is None:
+        test_order = range(len(inputs))
+    assert sorted(test_order) == list(range(len(inputs))), "The test order must be a permutation of the tests' indices"
+
+    for index in test_order:
+        test_input, reference_output = inputs[index], outputs[index]
 
         result_object = {
             "input": test_input,
@@ -313,7 +429,10 @@ def run_test(code, inputs, outputs, timeout: int = 6000, debug=True, add_extra_i
         error_code = None
         with Capturing() as generated_output:
             try:
-                call_method(method, test_input)
+                with profile_stage("execution"):
+                    if test_time_limits is not None:
+                        signal.setitimer(signal.ITIMER_REAL, test_time_limits[index])
+                    call_method(method, test_input)
                 # reset the alarm
                 signal.alarm(0)
             except Exception as e:
@@ -343,7 +462,7 @@ def run_test(code, inputs, outputs, timeout: int = 6000, debug=True, add_extra_i
                         "error_message": None,
                     }
                 )
-                results.append(result_object)
+                results[index] = result_object
             else:
                 result_object.update(
                     **{
@@ -352,12 +471,12 @@ def run_test(code, inputs, outputs, timeout: int = 6000, debug=True, add_extra_i
                         "error_message": None,
                     }
                 )
-                results.append(result_object)
+                results[index] = result_object
 
         # if the input and output are not truncated, we don't allow any errors
         elif error_code is not None:
             result_object.update(**{"status": False, "generated_output": None, "error_message": repr(error_code)})
-            results.append(result_object)
+            results[index] = result_object
         # finally, if there are no errors, we expect the output to match the reference output
         else:
             # the execution went well, let's compare the outputs
@@ -368,12 +487,38 @@ def run_test(code, inputs, outputs, timeout: int = 6000, debug=True, add_extra_i
                     "error_message": None,
                 }
             )
-            results.append(result_object)
+            results[index] = result_object
+
+        if stop_on_first_failure and not results[index]["status"]:
+            break
+
+    not_run_results = _get_not_run_results(zip(inputs, outputs), NOT_RUN_ERROR_MESSAGE)
+    results = [not_run_result if result is None else result for result, not_run_result in zip(results, not_run_results)]
 
     return "", results
 
 
+def _get_not_run_results(tests, error_message):
+    """The results of tests that weren't run, which count as failed."""
+    return [
+        {
+            "input": test_input,
+            "expected_output": expected_output,
+            "status": False,
+            "generated_output": None,
+            "error_message": error_message,
+            "not_run": True,
+        }
+        for test_input, expected_output in tests
+    ]
+
+
 def string_compare(candidate, correct, truncate_output=False, floating_point_accuracy=0.01):
+    with profile_stage("comparison"):
+        return _string_compare(candidate, correct, truncate_output, floating_point_accuracy)
+
+
+def _string_compare(candidate, correct, truncate_output=False, floating_point_accuracy=0.01):
     candidate = [o.strip().lower() for o in candidate]
     correct = correct.strip().lower()
 
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, List, Optional
+
+from wrapt_timeout_decorator import timeout as wrapt_timeout
+
+from src import utils
+from src.evaluation.failure_ordering import get_test_key
+from src.evaluation.testing_utils_codeforces import run_test
+
+log = utils.get_pylogger(__name__)
+
+
+class ReferenceRuntimes:
+    """Persistent (SQLite) cache of the runtime of each problem's reference solution (`working_solution`) on each of
+    its tests, keyed by the solution's and the test's content. A test on which the reference solution fails has no
+    runtime (None)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS reference_runtimes ("
+            "problem_id TEXT, solution_key TEXT, test_key TEXT, runtime REAL, "
+            "PRIMARY KEY (problem_id, solution_key, test_key))"
+        )
+        return connection
+
+    def load(self, problem_id: str, solution_key: str) -> Dict[str, Optional[float]]:
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT test_key, runtime FROM reference_runtimes WHERE problem_id = ? AND solution_key = ?",
+                (problem_id, solution_key),
+            ).fetchall()
+        return dict(rows)
+
+    def update(self, problem_id: str, solution_key: str, key2runtime: Dict[str, Optional[float]]):
+        rows = [(problem_id, solution_key, test_key, runtime) for test_key, runtime in key2runtime.items()]
+        with closing(self._connect()) as connection, connection:
+            connection.executemany("INSERT OR REPLACE INTO reference_runtimes VALUES (?, ?, ?, ?)", rows)
+
+
+def measure_test_runtimes(solution, tests, timeout, add_extra_imports=False, allow_truncated_io=True):
+    """Runs the solution on each test (in a subprocess, as the candidate solutions), and returns its runtime on each
+    test (None if the solution fails the test or exceeds the `timeout` on it)."""
+
+    @wrapt_timeout(timeout * max(len(tests), 1), use_signals=False)
+    def _measure():
+        runtimes = []
+        for test_input, expected_output in tests:
+            # the solution is compiled for each test, which takes a negligible time compared to the limits
+            start_time = time.perf_counter()
+            _, results = run_test(
+                solution,
+                [test_input],
+                [expected_output],
+                timeout,
+                debug=False,
+                add_extra_imports=add_extra_imports,
+                allow_truncated_io=allow_truncated_io,
+                test_time_limits=[timeout],
+            )
+            runtime = time.perf_counter() - start_time
+            runtimes.append(runtime if results[0]["status"] else None)
+        return runtimes
+
+    try:
+        return _measure()
+    except BaseException as e:
+        log.info(f"The calibration of the time limits timed out: {e}")
+        return [None] * len(tests)
+
+
+class AdaptiveTimeLimits:
+    """Derives the time limit of each test of a problem from the runtime of the problem's reference solution on it:
+    `multiplier` * runtime + `slack` seconds, capped at `max_time_limit`. The tests on which the reference solution
+    fails (or that have no reference solution) get the `max_time_limit`.
+
+    The runtimes are measured once (the first time the problem is evaluated) and cached in `path_to_cache`.
+    """
+
+    def __init__(
+        self,
+        path_to_cache: str,
+        multiplier: float = 3.0,
+        slack: float = 1.0,
+        max_time_limit: float = 20.0,
+        add_extra_imports: bool = False,
+        allow_truncated_io: bool = True,
+    ):
+        self.path_to_cache = path_to_cache
+        self.multiplier = multiplier
+        self.slack = slack
+        self.max_time_limit = max_time_limit
+        self.add_extra_imports = add_extra_imports
+        self.allow_truncated_io = allow_truncated_io
+
+    def get_reference_runtimes(self, problem_data, tests) -> List[Optional[float]]:
+        solution = problem_data.get("working_solution")
+        if not solution:
+            return [None] * len(tests)
+
+        cache = ReferenceRuntimes(self.path_to_cache)
+        solution_key = hashlib.sha1(solution.encode("utf-8")).hexdigest()
+        key2runtime = cache.load(problem_data["id"], solution_key)
+
+        test_keys = [get_test_key(test) for test in tests]
+        missing_tests = {test_key: test for test_key, test in zip(test_keys, tests) if test_key not in key2runtime}
+        if missing_tests:
+            log.info(f"[{problem_data['id']}] Calibrating the time limits of {len(missing_tests)} tests")
+            runtimes = measure_test_runtimes(
+                solution,
+                list(missing_tests.values()),
+                # the reference solution is run with the maximal time limit
+                timeout=self.max_time_limit,
+                add_extra_imports=self.add_extra_imports,
+                allow_truncated_io=self.allow_truncated_io,
+            )
+            new_key2runtime = dict(zip(missing_tests, runtimes))
+            cache.update(problem_data["id"], solution_key, new_key2runtime)
+            key2runtime.update(new_key2runtime)
+
+        return [key2runtime[test_key] for test_key in test_keys]
+
+    def get_time_limits(self, problem_data, tests) -> List[float]:
+        return [
+            self.max_time_limit if runtime is None else min(self.multiplier * runtime + self.slack, self.max_time_limit)
+            for runtime in self.get_reference_runtimes(problem_data, tests)
+        ]
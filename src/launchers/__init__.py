@@ -0,0 +1,3 @@
+from .flow_pool import FlowPool
+from .resumable_flow_launcher import ResumableFlowLauncher
+from .async_flow_launcher import AsyncFlowLauncher
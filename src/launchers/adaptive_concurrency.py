@@ -0,0 +1,186 @@
+import contextlib
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from src import utils
+from src.launchers.call_instrumentation import get_active_instrumentation
+
+log = utils.get_pylogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_rate_limit_error(exception: Exception) -> bool:
+    return getattr(exception, "status_code", None) == 429 or "RateLimit" in type(exception).__name__
+
+
+def is_retryable_error(exception: Exception) -> bool:
+    """Rate limits, timeouts, connection errors and server-side errors are worth retrying."""
+    if getattr(exception, "status_code", None) in RETRYABLE_STATUS_CODES:
+        return True
+
+    name = type(exception).__name__
+    return any(key in name for key in ["RateLimit", "Timeout", "APIConnectionError", "ServiceUnavailable"])
+
+
+class AIMDLimiter:
+    """A concurrency limit for a single API key, adapted with additive increase / multiplicative decrease (AIMD).
+
+    Every successful request increases the limit by `additive_increase / limit` (i.e., by `additive_increase`
+    per window of `limit` requests). A rate-limit error, or a latency above `latency_threshold` (if given),
+    multiplies it by `multiplicative_decrease`, at most once per window, so a burst of errors counts once.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        additive_increase: float = 1.0,
+        multiplicative_decrease: float = 0.5,
+        latency_threshold: Optional[float] = None,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.latency_threshold = latency_threshold
+
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self._num_started = 0
+        # the requests started before the last decrease belong to the window that already triggered it
+        self._last_decrease_at = -1
+
+        self._condition = threading.Condition()
+
+    def acquire(self) -> int:
+        """Blocks until a request can be sent; returns the request's sequence number."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+
+            self.in_flight += 1
+            self._num_started += 1
+            return self._num_started
+
+    def release(self, request_idx: int, latency: float, rate_limited: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+
+            congested = rate_limited or (self.latency_threshold is not None and latency > self.latency_threshold)
+            if congested:
+                if request_idx > self._last_decrease_at:
+                    self.limit = max(self.min_limit, self.limit * self.multiplicative_decrease)
+                    self._last_decrease_at = self._num_started
+            else:
+                self.limit = min(self.max_limit, self.limit + self.additive_increase / self.limit)
+
+            self._condition.notify_all()
+
+
+class AdaptiveRequestController:
+    """Sends the API requests through a per-key `AIMDLimiter`, and retries the failed requests (and only those)
+    with a jittered ("full jitter") exponential backoff."""
+
+    def __init__(
+        self,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        seed: Optional[int] = None,
+        **limiter_kwargs,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter_kwargs = limiter_kwargs
+
+        self.key2limiter: Dict[str, AIMDLimiter] = {}
+        self.key2stats: Dict[str, Dict[str, Any]] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _get_limiter(self, key: str) -> AIMDLimiter:
+        with self._lock:
+            if key not in self.key2limiter:
+                self.key2limiter[key] = AIMDLimiter(**self.limiter_kwargs)
+                self.key2stats[key] = {"num_requests": 0, "num_rate_limited": 0, "num_retries": 0, "num_failed": 0}
+            return self.key2limiter[key]
+
+    def _update_stats(self, key: str, stat: str):
+        with self._lock:
+            self.key2stats[key][stat] += 1
+
+    def get_backoff_delay(self, attempt: int) -> float:
+        with self._lock:
+            return self._random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def call(self, fn: Callable, key: str, *args, **kwargs):
+        limiter = self._get_limiter(key)
+
+        attempt = 0
+        while True:
+            request_idx = limiter.acquire()
+            self._update_stats(key, "num_requests")
+            start_time = time.perf_counter()
+            try:
+                output = fn(*args, **kwargs)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                limiter.release(request_idx, time.perf_counter() - start_time, rate_limited=rate_limited)
+                if rate_limited:
+                    self._update_stats(key, "num_rate_limited")
+
+                if not is_retryable_error(e) or attempt >= self.max_retries:
+                    self._update_stats(key, "num_failed")
+                    raise e
+
+                delay = self.get_backoff_delay(attempt)
+                log.warning(
+                    f"Request failed with `{type(e).__name__}` (attempt {attempt + 1}); retrying in {delay:.1f}s"
+                )
+                self._update_stats(key, "num_retries")
+                attempt += 1
+                time.sleep(delay)
+                if get_active_instrumentation() is not None:
+                    get_active_instrumentation().record_backoff(delay)
+                continue
+
+            limiter.release(request_idx, time.perf_counter() - start_time)
+            return output
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                key: {**stats, "concurrency_limit": self.key2limiter[key].limit}
+                for key, stats in self.key2stats.items()
+            }
+
+    def log_stats(self):
+        for key_idx, stats in enumerate(self.get_stats().values()):
+            log.info(
+                f"[API key {key_idx}] requests: {stats['num_requests']}, rate limited: {stats['num_rate_limited']}, "
+                f"retries: {stats['num_retries']}, failed: {stats['num_failed']}, "
+                f"final concurrency limit: {stats['concurrency_limit']:.1f}"
+            )
+
+
+@contextlib.contextmanager
+def adaptive_llm_requests(controller: AdaptiveRequestController):
+    """Routes the completion requests of the flows' LiteLLM backend through the controller (within the context)."""
+    from aiflows.backends import llm_lite
+
+    completion = llm_lite.completion
+
+    def _controlled_completion(*args, **kwargs):
+        return controller.call(completion, str(kwargs.get("api_key")), *args, **kwargs)
+
+    llm_lite.completion = _controlled_completion
+    try:
+        yield controller
+    finally:
+        llm_lite.completion = completion
+        controller.log_stats()
@@ -0,0 +1,154 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+from src import utils
+from src.launchers.adaptive_concurrency import AdaptiveRequestController, adaptive_llm_requests
+from src.launchers.flow_pool import FlowPool
+from src.launchers.resumable_flow_launcher import ResumableFlowLauncher
+
+log = utils.get_pylogger(__name__)
+
+
+class AsyncFlowLauncher(ResumableFlowLauncher):
+    """Runs the inference with asyncio, keeping up to `max_in_flight` flow runs in flight at any time.
+
+    Each flow instance is bound to a single API key, and a flow run holds the instance for its whole duration,
+    so the size of each key's `FlowPool` is the key's concurrency limit (at most `max_in_flight_per_key`).
+    The instances are constructed lazily (in the worker threads), when no released instance can be reused.
+    If `adaptive_concurrency.enabled`, the API requests of each key are further limited by an adaptive (AIMD) limit,
+    and the failed requests are retried individually (see `AdaptiveRequestController`).
+    The flows (and their API requests) are synchronous, so each in-flight run executes in, and holds, one of the
+    `max_in_flight` worker threads, while the scheduling and the writing of the predictions (to
+    `predictions/predictions_{key_idx}.jsonl`) happen in the event loop.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        max_in_flight_per_key: int = 16,
+        adaptive_concurrency: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_key = max_in_flight_per_key
+        self.adaptive_concurrency = dict(adaptive_concurrency or {})
+        self.request_controller: Optional[AdaptiveRequestController] = None
+
+    def get_num_flows_per_key(self, num_keys: int) -> int:
+        """Returns the maximum number of flow instances (i.e., the pool size) for each of the `num_keys` API keys."""
+        return max(1, min(self.max_in_flight_per_key, -(-self.max_in_flight // num_keys)))
+
+    def predict_dataloader(self, dataloader: Iterable[dict], key2flow_pool: Dict[Any, FlowPool]) -> None:
+        """Runs the inference for the data in the dataloader.
+
+        :param dataloader: An iterable of samples (it is consumed lazily, so it can be a generator)
+        :param key2flow_pool: The pool of flow instances (with their interfaces) bound to each API key
+        """
+        controller_kwargs = dict(self.adaptive_concurrency)
+        with self._instrumented_flow_calls():
+            if not controller_kwargs.pop("enabled", False):
+                asyncio.run(self.apredict_dataloader(dataloader, key2flow_pool))
+            else:
+                # The API requests are additionally limited per key by an adaptive (AIMD) limit, up to the pool size
+                self.request_controller = AdaptiveRequestController(
+                    max_limit=self.max_in_flight_per_key, **controller_kwargs
+                )
+                with adaptive_llm_requests(self.request_controller):
+                    asyncio.run(self.apredict_dataloader(dataloader, key2flow_pool))
+
+        for flow_pool in key2flow_pool.values():
+            flow_pool.log_stats()
+
+    async def apredict_dataloader(self, dataloader: Iterable[dict], key2flow_pool: Dict[Any, FlowPool]) -> None:
+        predictions_dir = os.path.dirname(self.existing_predictions_file)
+        key2path_to_output_file = {
+            key: os.path.join(predictions_dir, f"predictions_{key_idx}.jsonl")
+            for key_idx, key in enumerate(key2flow_pool)
+        }
+
+        # A slot per (potential) flow instance; interleaved across the keys so that the load is spread evenly
+        free_slots = asyncio.Queue()
+        max_pool_size = max(flow_pool.max_size for flow_pool in key2flow_pool.values())
+        for slot_idx in range(max_pool_size):
+            for key, flow_pool in key2flow_pool.items():
+                if slot_idx < flow_pool.max_size:
+                    free_slots.put_nowait(key)
+
+        max_in_flight = min(self.max_in_flight, free_slots.qsize())
+        in_flight = asyncio.Semaphore(max_in_flight)
+        num_datapoints = len(dataloader) if hasattr(dataloader, "__len__") else "?"
+        state = {"num_finished": 0, "num_failures": 0, "exception": None}
+        log.info(f"Running in asyncio mode with at most {max_in_flight} flow runs in flight.")
+
+        async def _run(sample):
+            scheduled_time = time.perf_counter()
+            key = await free_slots.get()
+            try:
+                sample = await self._apredict_sample(executor, key2flow_pool[key], sample, scheduled_time)
+                self.write_batch_output(
+                    [sample], path_to_output_file=key2path_to_output_file[key], keys_to_write=self.keys_to_write
+                )
+                self._on_prediction(sample)
+
+                state["num_finished"] += 1
+                if sample["error"] is not None:
+                    state["num_failures"] += 1
+                log.info(
+                    f"~~~~~~~~~~~~ Progress: {state['num_finished']}/{num_datapoints} batches finished ~~~~~~~~~~~~~"
+                )
+            except Exception as e:
+                log.exception("")  # logs the exception
+                state["exception"] = state["exception"] or e
+            finally:
+                free_slots.put_nowait(key)
+                in_flight.release()
+
+        tasks = set()
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            for sample in dataloader:
+                await in_flight.acquire()
+                if state["exception"] is not None:
+                    break
+
+                task = asyncio.create_task(_run(sample))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            # The flow runs that are already in flight can't be cancelled (they are executing in threads)
+            await asyncio.gather(*tasks)
+
+        if state["num_failures"] > 0:
+            log.error(f"Number of failures: {state['num_failures']} (out of {num_datapoints})")
+
+        if state["exception"] is not None:
+            raise state["exception"]
+
+    async def _apredict_sample(self, executor, flow_pool: FlowPool, sample, scheduled_time: float):
+        predict_sample = functools.partial(self._predict_sample_with_pool, flow_pool, sample, scheduled_time)
+        return await asyncio.get_running_loop().run_in_executor(executor, predict_sample)
+
+    def _predict_sample_with_pool(self, flow_pool: FlowPool, sample, scheduled_time: float):
+        # a slot of the key was taken, so an instance is available (or can be constructed) without waiting
+        flow_with_interfaces = flow_pool.acquire()
+        try:
+            with self._instrumented_run(sample, queue_wait=time.perf_counter() - scheduled_time):
+                batch = self.predict_batch(
+                    flow=flow_with_interfaces["flow"],
+                    batch=[sample],
+                    input_interface=flow_with_interfaces["input_interface"],
+                    output_interface=flow_with_interfaces["output_interface"],
+                    n_independent_samples=self.n_independent_samples,
+                    fault_tolerant_mode=self.fault_tolerant_mode,
+                    n_batch_retries=self.n_batch_retries,
+                    wait_time_between_retries=self.wait_time_between_retries,
+                    sample_budget_policy=self.sample_budget_policy,
+                )
+        finally:
+            flow_pool.release(flow_with_interfaces)
+
+        return batch[0]
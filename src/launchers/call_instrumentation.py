@@ -0,0 +1,269 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src import utils
+
+log = utils.get_pylogger(__name__)
+
+# the instrumentation of the current inference run (requests made outside of it are not recorded)
+_ACTIVE_INSTRUMENTATION: Optional["CallInstrumentation"] = None
+
+
+class CallInstrumentation:
+    """Records where the time of an inference run goes, as a sidecar (`flow_calls.jsonl`) of the predictions.
+
+    Two kinds of records are written, one per line:
+        - `run`: a flow run on a datapoint, with its queue wait (the time between the datapoint being scheduled and
+          the flow run starting) and its duration;
+        - `request`: an API request made by a (sub-)flow during a run, with its total time, the latency of its last
+          attempt, the time spent waiting for the API key or for a concurrency slot, the retries and the backoff
+          between them, and the prompt/completion tokens.
+    The time of a run that is not spent in its requests is the local (flow) overhead.
+    """
+
+    FILE_NAME = "flow_calls.jsonl"
+
+    def __init__(self, output_dir: str):
+        self.path_to_output_file = os.path.join(output_dir, self.FILE_NAME)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._records: List[Dict[str, Any]] = []
+        self._file = open(self.path_to_output_file, "a")
+
+    def _write(self, record: Dict[str, Any]):
+        record = {key: round(value, 4) if isinstance(value, float) else value for key, value in record.items()}
+        with self._lock:
+            self._records.append(record)
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    @contextlib.contextmanager
+    def run(self, sample_id: str, queue_wait: float = 0.0):
+        """Wraps a flow run on a datapoint (in the thread that executes it)."""
+        self._local.sample_id = sample_id
+        self._local.flow_names = []
+        start_time = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._write(
+                {
+                    "type": "run",
+                    "id": sample_id,
+                    "queue_wait": queue_wait,
+                    "duration": time.perf_counter() - start_time,
+                    "error": error,
+                }
+            )
+            self._local.sample_id = None
+
+    @contextlib.contextmanager
+    def flow_call(self, flow_name: str):
+        flow_names = getattr(self._local, "flow_names", None)
+        if flow_names is None:
+            flow_names = self._local.flow_names = []
+
+        flow_names.append(flow_name)
+        try:
+            yield
+        finally:
+            flow_names.pop()
+
+    @contextlib.contextmanager
+    def request(self):
+        """Wraps an API request, including the waiting for the API key and the retries."""
+        record = {
+            "type": "request",
+            "id": getattr(self._local, "sample_id", None),
+            "flow": "/".join(getattr(self._local, "flow_names", None) or []) or None,
+            "total": 0.0,
+            "latency": 0.0,
+            "wait": 0.0,
+            "backoff": 0.0,
+            "retries": 0,
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "error": None,
+        }
+        self._local.request = record
+        self._local.num_attempts = 0
+        self._local.attempts_time = 0.0
+        start_time = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            self._local.request = None
+            record["total"] = time.perf_counter() - start_time
+            record["wait"] = max(0.0, record["total"] - self._local.attempts_time - record["backoff"])
+            record["retries"] = max(0, self._local.num_attempts - 1)
+            self._write(record)
+
+    def record_attempt(self, latency: float, response: Any = None):
+        """Records an attempt (i.e., a call to the API) of the current request."""
+        record = getattr(self._local, "request", None)
+        if record is None:
+            return
+
+        self._local.num_attempts += 1
+        self._local.attempts_time += latency
+        record["latency"] = latency
+
+        usage = _get_usage(response)
+        if usage is not None:
+            record["prompt_tokens"] = (record["prompt_tokens"] or 0) + usage["prompt_tokens"]
+            record["completion_tokens"] = (record["completion_tokens"] or 0) + usage["completion_tokens"]
+
+    def record_backoff(self, delay: float):
+        record = getattr(self._local, "request", None)
+        if record is not None:
+            record["backoff"] += delay
+
+    def get_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Aggregates the requests per (sub-)flow, and the runs."""
+        with self._lock:
+            records = list(self._records)
+
+        flow2requests = defaultdict(list)
+        runs = []
+        for record in records:
+            if record["type"] == "run":
+                runs.append(record)
+            else:
+                flow2requests[record["flow"] or "-"].append(record)
+
+        summary = {}
+        for flow_name, requests in sorted(flow2requests.items()):
+            latencies = [request["latency"] for request in requests]
+            summary[flow_name] = {
+                "num_requests": len(requests),
+                "num_errors": sum(request["error"] is not None for request in requests),
+                "num_retries": sum(request["retries"] for request in requests),
+                "latency_p50": float(np.percentile(latencies, 50)),
+                "latency_p95": float(np.percentile(latencies, 95)),
+                "total_time": sum(request["total"] for request in requests),
+                "total_latency": float(np.sum(latencies)),
+                "total_wait": sum(request["wait"] for request in requests),
+                "total_backoff": sum(request["backoff"] for request in requests),
+                "prompt_tokens": sum(request["prompt_tokens"] or 0 for request in requests),
+                "completion_tokens": sum(request["completion_tokens"] or 0 for request in requests),
+            }
+
+        if runs:
+            total_duration = sum(run["duration"] for run in runs)
+            total_request_time = sum(stats["total_time"] for stats in summary.values())
+            summary["runs"] = {
+                "num_runs": len(runs),
+                "num_errors": sum(run["error"] is not None for run in runs),
+                "duration_p50": float(np.percentile([run["duration"] for run in runs], 50)),
+                "total_duration": total_duration,
+                "total_queue_wait": sum(run["queue_wait"] for run in runs),
+                "total_local_overhead": max(0.0, total_duration - total_request_time),
+            }
+
+        return summary
+
+    def log_summary(self):
+        summary = self.get_summary()
+        run_stats = summary.pop("runs", None)
+
+        lines = [
+            f"{'flow':<40}{'requests':>9}{'errors':>8}{'retries':>9}{'p50 lat.':>10}{'p95 lat.':>10}"
+            f"{'total (s)':>11}{'wait (s)':>10}{'backoff (s)':>13}{'prompt tok.':>13}{'compl. tok.':>13}"
+        ]
+        for flow_name, stats in summary.items():
+            lines.append(
+                f"{flow_name[-40:]:<40}{stats['num_requests']:>9}{stats['num_errors']:>8}{stats['num_retries']:>9}"
+                f"{stats['latency_p50']:>10.2f}{stats['latency_p95']:>10.2f}{stats['total_time']:>11.1f}"
+                f"{stats['total_wait']:>10.1f}{stats['total_backoff']:>13.1f}"
+                f"{stats['prompt_tokens']:>13}{stats['completion_tokens']:>13}"
+            )
+        if run_stats is not None:
+            lines.append(
+                f"{run_stats['num_runs']} flow runs ({run_stats['num_errors']} failed), "
+                f"p50 duration: {run_stats['duration_p50']:.2f}s, total duration: {run_stats['total_duration']:.1f}s, "
+                f"of which local overhead: {run_stats['total_local_overhead']:.1f}s; "
+                f"total queue wait: {run_stats['total_queue_wait']:.1f}s"
+            )
+
+        log.info(f"Flow calls (see `{self.path_to_output_file}`):\n" + "\n".join(lines))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _get_usage(response: Any) -> Optional[Dict[str, int]]:
+    try:
+        usage = response["usage"]
+    except (KeyError, TypeError):
+        return None
+
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return {key: usage.get(key) or 0 for key in ["prompt_tokens", "completion_tokens"]}
+    return {key: getattr(usage, key, None) or 0 for key in ["prompt_tokens", "completion_tokens"]}
+
+
+def get_active_instrumentation() -> Optional[CallInstrumentation]:
+    return _ACTIVE_INSTRUMENTATION
+
+
+@contextlib.contextmanager
+def instrumented_flow_calls(instrumentation: CallInstrumentation):
+    """Records the flow calls and the API requests of the flows' LiteLLM backend (within the context).
+
+    Enter it before `adaptive_llm_requests`, so that each of the controller's attempts is recorded.
+    """
+    global _ACTIVE_INSTRUMENTATION
+    from aiflows.backends import llm_lite
+    from aiflows.base_flows import Flow
+
+    flow_call = Flow.__call__
+    backend_call = llm_lite.LiteLLMBackend.__call__
+    completion = llm_lite.completion
+
+    def _instrumented_flow_call(flow, *args, **kwargs):
+        with instrumentation.flow_call(flow.flow_config.get("name", type(flow).__name__)):
+            return flow_call(flow, *args, **kwargs)
+
+    def _instrumented_backend_call(backend, **kwargs):
+        with instrumentation.request():
+            return backend_call(backend, **kwargs)
+
+    def _instrumented_completion(*args, **kwargs):
+        start_time = time.perf_counter()
+        response = None
+        try:
+            response = completion(*args, **kwargs)
+            return response
+        finally:
+            instrumentation.record_attempt(time.perf_counter() - start_time, response)
+
+    Flow.__call__ = _instrumented_flow_call
+    llm_lite.LiteLLMBackend.__call__ = _instrumented_backend_call
+    llm_lite.completion = _instrumented_completion
+    _ACTIVE_INSTRUMENTATION = instrumentation
+    try:
+        yield instrumentation
+    finally:
+        _ACTIVE_INSTRUMENTATION = None
+        Flow.__call__ = flow_call
+        llm_lite.LiteLLMBackend.__call__ = backend_call
+        llm_lite.completion = completion
+        instrumentation.close()
+        instrumentation.log_summary()
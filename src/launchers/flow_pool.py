@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from src import utils
+
+log = utils.get_pylogger(__name__)
+
+
+class FlowPool:
+    """A pool of flow instances (each with its input and output interfaces) that are constructed lazily.
+
+    An instance is constructed only when it is acquired and no free instance is available, so the pool grows with
+    the actual concurrency rather than with the configured number of workers, up to `max_size` instances (after
+    which `acquire` blocks until an instance is released). A released instance is reset (fully and recursively)
+    and reused for the next datapoints.
+    """
+
+    def __init__(self, factory: Callable[[], Dict[str, Any]], max_size: int = 1, name: str = "flows"):
+        assert max_size >= 1, "The pool must be able to hold at least one flow instance"
+        self.factory = factory
+        self.max_size = max_size
+        self.name = name
+
+        self._free: List[Dict[str, Any]] = []
+        self._size = 0
+        self._condition = threading.Condition()
+
+        self.stats = {"num_acquired": 0, "num_hits": 0, "num_constructed": 0, "construction_time": 0.0}
+
+    def __len__(self):
+        """The number of instances constructed so far."""
+        return self._size
+
+    def acquire(self) -> Dict[str, Any]:
+        with self._condition:
+            while not self._free and self._size >= self.max_size:
+                self._condition.wait()
+
+            self.stats["num_acquired"] += 1
+            if self._free:
+                self.stats["num_hits"] += 1
+                return self._free.pop()
+
+            # reserve the slot before constructing (outside the lock), so that concurrent constructions are allowed
+            self._size += 1
+
+        start_time = time.perf_counter()
+        try:
+            flow_with_interfaces = self.factory()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+        construction_time = time.perf_counter() - start_time
+        with self._condition:
+            self.stats["num_constructed"] += 1
+            self.stats["construction_time"] += construction_time
+        log.debug(f"[{self.name}] Constructed flow instance {self._size}/{self.max_size} in {construction_time:.2f}s")
+
+        return flow_with_interfaces
+
+    def release(self, flow_with_interfaces: Dict[str, Any]):
+        """Resets the instance's state (e.g., after a failed run) and puts it back in the pool."""
+        flow_with_interfaces["flow"].reset(full_reset=True, recursive=True)
+
+        with self._condition:
+            self._free.append(flow_with_interfaces)
+            self._condition.notify()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            stats = dict(self.stats)
+            stats["size"] = self._size
+            stats["hit_rate"] = stats["num_hits"] / stats["num_acquired"] if stats["num_acquired"] > 0 else 0.0
+            return stats
+
+    def log_stats(self):
+        stats = self.get_stats()
+        mean_construction_time = stats["construction_time"] / max(1, stats["num_constructed"])
+        log.info(
+            f"[{self.name}] Flow pool: {stats['size']}/{self.max_size} instances, "
+            f"hit rate: {stats['hit_rate']:.1%} ({stats['num_hits']}/{stats['num_acquired']}), "
+            f"construction time: {stats['construction_time']:.2f}s (mean: {mean_construction_time:.2f}s)"
+        )
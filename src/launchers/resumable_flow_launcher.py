@@ -0,0 +1,198 @@
+import contextlib
+import itertools
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from aiflows.base_flows import Flow
+from aiflows.flow_launchers import FlowLauncher
+from aiflows.interfaces.abstract import Interface
+
+from src.launchers.call_instrumentation import CallInstrumentation, instrumented_flow_calls
+from src.launchers.flow_pool import FlowPool
+from src.launchers.sample_budgeting import SampleBudgetPolicy
+from src.utils.inference_helpers import RESUMED_OUTPUTS_KEY, SAMPLE_BUDGET_KEY
+
+
+class ResumableFlowLauncher(FlowLauncher):
+    """A FlowLauncher that can resume the inference of partially completed datapoints.
+
+    A sample can carry the outputs of the independent samples that were completed in a previous run (under
+    `RESUMED_OUTPUTS_KEY`), in which case only the missing independent samples are run, and the written prediction
+    contains both the resumed and the new outputs.
+
+    The flows can be given as a `FlowPool`, in which case each worker acquires a (lazily constructed) instance for
+    the duration of a datapoint, instead of using a dedicated, eagerly constructed one.
+    The `prediction_callbacks` are called with each datapoint's prediction once it is written (e.g., to evaluate it
+    while the inference is still running).
+    If `sample_budgeting.enabled`, the independent samples are drawn one at a time, and the sampling of a datapoint
+    stops early according to the `SampleBudgetPolicy` configured by the remaining `sample_budgeting` parameters.
+    If `instrument_flow_calls`, the flow runs and their API requests are recorded (see `CallInstrumentation`).
+    A dataloader without a length (e.g., a generator of streamed samples) is consumed in chunks of
+    `streaming_chunk_size` samples, so that the samples are never all held in memory.
+    """
+
+    KEYS_TO_WRITE = ["id", "inference_outputs", "human_readable_outputs", "error"]
+
+    def __init__(
+        self,
+        sample_budgeting: Optional[Dict[str, Any]] = None,
+        instrument_flow_calls: bool = False,
+        streaming_chunk_size: int = 256,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        # a chunk smaller than the number of workers would leave some of them idle
+        self.streaming_chunk_size = max(streaming_chunk_size, self.n_workers)
+        self.prediction_callbacks: List[Callable[[dict], None]] = []
+        self.instrument_flow_calls = instrument_flow_calls
+        self.instrumentation: Optional[CallInstrumentation] = None
+
+        policy_kwargs = dict(sample_budgeting or {})
+        self.sample_budget_policy = SampleBudgetPolicy(**policy_kwargs) if policy_kwargs.pop("enabled", False) else None
+        self.keys_to_write = self.KEYS_TO_WRITE + ([SAMPLE_BUDGET_KEY] if self.sample_budget_policy else [])
+
+    def _on_prediction(self, sample: dict):
+        for callback in self.prediction_callbacks:
+            callback(sample)
+
+    def _instrumented_flow_calls(self):
+        if not self.instrument_flow_calls:
+            return contextlib.nullcontext()
+
+        self.instrumentation = CallInstrumentation(self.output_dir)
+        return instrumented_flow_calls(self.instrumentation)
+
+    def _instrumented_run(self, sample: dict, queue_wait: float):
+        if self.instrumentation is None:
+            return contextlib.nullcontext()
+
+        return self.instrumentation.run(sample["id"], queue_wait=queue_wait)
+
+    def predict_dataloader(
+        self, dataloader: Iterable[dict], flows_with_interfaces: Union[FlowPool, List[Dict[str, Any]]]
+    ) -> None:
+        with self._instrumented_flow_calls():
+            if hasattr(dataloader, "__len__"):
+                super().predict_dataloader(dataloader, flows_with_interfaces)
+            else:
+                # the FlowLauncher needs the number of samples upfront, so it is given one chunk at a time
+                samples = iter(dataloader)
+                while True:
+                    chunk = list(itertools.islice(samples, self.streaming_chunk_size))
+                    if not chunk:
+                        break
+                    super().predict_dataloader(chunk, flows_with_interfaces)
+
+        if isinstance(flows_with_interfaces, FlowPool):
+            flows_with_interfaces.log_stats()
+
+    def predict(self, batch: List[dict]):
+        if not isinstance(self.flows, FlowPool):
+            return super().predict(batch)
+
+        assert len(batch) == 1, "The Flow API model does not support batch sizes greater than 1."
+        _resource_id = self._resource_IDs.get()  # The ID of the output file to be used by the thread for this sample
+        start_time = time.perf_counter()
+        flow_with_interfaces = self.flows.acquire()
+        try:
+            with self._instrumented_run(batch[0], queue_wait=time.perf_counter() - start_time):
+                batch = self.predict_batch(
+                    flow=flow_with_interfaces["flow"],
+                    input_interface=flow_with_interfaces["input_interface"],
+                    output_interface=flow_with_interfaces["output_interface"],
+                    batch=batch,
+                    path_to_output_file=self.paths_to_output_files[_resource_id],
+                    keys_to_write=self.keys_to_write,
+                    n_independent_samples=self.n_independent_samples,
+                    sample_budget_policy=self.sample_budget_policy,
+                )
+        finally:
+            self.flows.release(flow_with_interfaces)
+            self._resource_IDs.put(_resource_id)
+
+        self._on_prediction(batch[0])
+        return batch
+
+    @classmethod
+    def predict_batch(
+        cls,
+        flow: Flow,
+        batch: List[dict],
+        input_interface: Optional[Interface] = None,
+        output_interface: Optional[Interface] = None,
+        path_to_output_file: Optional[str] = None,
+        keys_to_write: Optional[List[str]] = None,
+        n_independent_samples: int = 1,
+        sample_budget_policy: Optional[SampleBudgetPolicy] = None,
+        **kwargs,
+    ):
+        for sample in batch:
+            resumed_outputs = sample.pop(RESUMED_OUTPUTS_KEY, None)
+            if resumed_outputs is None:
+                resumed_outputs = {"inference_outputs": [], "human_readable_outputs": []}
+            num_samples_to_run = n_independent_samples - len(resumed_outputs["inference_outputs"])
+
+            if sample_budget_policy is None:
+                super().predict_batch(
+                    flow=flow,
+                    batch=[sample],
+                    input_interface=input_interface,
+                    output_interface=output_interface,
+                    n_independent_samples=num_samples_to_run,
+                    **kwargs,
+                )
+            else:
+                cls._predict_sample_with_budget(
+                    flow,
+                    sample,
+                    resumed_outputs,
+                    num_samples_to_run,
+                    sample_budget_policy,
+                    input_interface=input_interface,
+                    output_interface=output_interface,
+                    **kwargs,
+                )
+
+            sample["inference_outputs"] = resumed_outputs["inference_outputs"] + sample["inference_outputs"]
+            sample["human_readable_outputs"] = (
+                resumed_outputs["human_readable_outputs"] + sample["human_readable_outputs"]
+            )
+
+        if path_to_output_file is not None:
+            cls.write_batch_output(batch, path_to_output_file=path_to_output_file, keys_to_write=keys_to_write)
+
+        return batch
+
+    @classmethod
+    def _predict_sample_with_budget(
+        cls,
+        flow: Flow,
+        sample: dict,
+        resumed_outputs: Dict[str, List],
+        num_samples_to_run: int,
+        sample_budget_policy: SampleBudgetPolicy,
+        **kwargs,
+    ):
+        """Draws the independent samples one at a time, until the policy stops the sampling (or the first error)."""
+        inference_outputs = []
+        human_readable_outputs = []
+        error = None
+
+        record = sample_budget_policy.new_record()
+        stop_reason = sample_budget_policy.update(record, sample, resumed_outputs["human_readable_outputs"])
+        while stop_reason is None and len(inference_outputs) < num_samples_to_run:
+            super().predict_batch(flow=flow, batch=[sample], n_independent_samples=1, **kwargs)
+            inference_outputs += sample["inference_outputs"]
+            human_readable_outputs += sample["human_readable_outputs"]
+            error = sample["error"]
+            if error is not None:
+                break
+
+            stop_reason = sample_budget_policy.update(
+                record, sample, resumed_outputs["human_readable_outputs"] + human_readable_outputs
+            )
+
+        sample["inference_outputs"] = inference_outputs
+        sample["human_readable_outputs"] = human_readable_outputs
+        sample["error"] = error
+        sample[SAMPLE_BUDGET_KEY] = record
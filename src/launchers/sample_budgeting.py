@@ -0,0 +1,70 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from src import utils
+from src.evaluation import CodeforcesLocalEvaluator
+from src.utils.inference_helpers import SAMPLE_BUDGET_KEY
+
+log = utils.get_pylogger(__name__)
+
+
+class SampleBudgetPolicy:
+    """Decides, after each independent sample of a datapoint, whether the remaining samples should still be drawn.
+
+    The candidate solution of each sample is run on the public tests with the local evaluator, and the sampling stops
+    (after at least `min_samples` samples) as soon as one of the `stop_on` conditions holds:
+        - `public_tests_passed`: the candidate passes all the public tests.
+
+    The outcome of the candidates on the public tests and the reason for stopping are recorded with each prediction
+    (under `SAMPLE_BUDGET_KEY`), together with the policy, and carried over to the evaluation output. Note that
+    stopping on a public pass makes the standard pass@k estimator biased (`PassAtK` refuses such runs); the
+    `FilteredPassAtK` metric (submitting the first public-passing candidate) remains unbiased under this policy, as it
+    never looks past the first public-passing candidate. A condition that could stop the sampling before any candidate
+    passes the public tests (e.g., on a duplicated candidate) would bias it too, so none is supported.
+    """
+
+    STOP_CONDITIONS = ("public_tests_passed",)
+
+    def __init__(
+        self,
+        stop_on: Sequence[str] = ("public_tests_passed",),
+        min_samples: int = 1,
+        eval_helper_params: Optional[Dict[str, Any]] = None,
+        code_key: str = "code",
+    ):
+        for condition in stop_on:
+            assert condition in self.STOP_CONDITIONS, f"Unknown stopping condition `{condition}`"
+
+        self.stop_on = list(stop_on)
+        self.min_samples = min_samples
+        self.code_key = code_key
+        self.evaluator = CodeforcesLocalEvaluator(eval_helper_params=dict(eval_helper_params or {}))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"stop_on": self.stop_on, "min_samples": self.min_samples}
+
+    def new_record(self) -> Dict[str, Any]:
+        return {"policy": self.to_dict(), "public_tests_passed": [], "num_samples": 0, "stop_reason": None}
+
+    def _passes_public_tests(self, candidate_solution, public_tests_io) -> bool:
+        results = self.evaluator.evaluate_solution(
+            candidate_solution=candidate_solution, hidden_tests_io=[], public_tests_io=public_tests_io
+        )
+        test_statuses = [test["status"] for test in results["public_tests_results"]]
+        return len(test_statuses) > 0 and all(test_statuses)
+
+    def update(self, record: Dict[str, Any], sample: Dict, human_readable_outputs: List[Dict]) -> Optional[str]:
+        """Records the outcome of the samples in `human_readable_outputs` that are not yet in the record, and returns
+        the reason for stopping the sampling (None if the sampling should continue)."""
+        candidates = [output.get(self.code_key) for output in human_readable_outputs]
+
+        for candidate in candidates[record["num_samples"] :]:
+            record["public_tests_passed"].append(self._passes_public_tests(candidate, sample["public_tests_io"]))
+        record["num_samples"] = len(candidates)
+
+        if record["num_samples"] < self.min_samples or record["num_samples"] == 0:
+            return None
+
+        if "public_tests_passed" in self.stop_on and any(record["public_tests_passed"]):
+            record["stop_reason"] = "public_tests_passed"
+
+        return record["stop_reason"]
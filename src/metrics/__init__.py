@@ -1,3 +1,4 @@
 from .solve_rate import SolveRate
 from .temporal_metric import TemporalMetric
 from .pass_at_k import PassAtK
+from .filtered_pass_at_k import FilteredPassAtK
@@ -1,5 +1,7 @@
 from abc import ABC
 
+import numpy as np
+
 from typing import Union
 from src import utils
 
@@ -14,6 +16,11 @@ class AbstractMetric(ABC):
         self.bucket_id2datapoint_ids = None
         self._load_bucketing_data()
 
+        # (evaluation_output, bucket_id2indices) -- the positions of each bucket's datapoints are computed only once
+        self._bucket_id2indices_cache = None
+        # (evaluation_output, problem_scores) -- the score of each problem is computed only once
+        self._problem_scores_cache = None
+
     def _load_bucketing_data(self):
         if self.params["bucketing_id"] is None:
             return
@@ -27,6 +34,7 @@ class AbstractMetric(ABC):
         raise NotImplementedError()
 
     def compute(self, evaluation_output, seed=None):
+        """Computes the score without modifying the evaluation output, so one instance can be shared across threads."""
         if self.bucket_id2datapoint_ids is not None:
             return self._compute_per_bucket_performance(evaluation_output, seed=seed)
 
@@ -34,50 +42,95 @@ class AbstractMetric(ABC):
 
         return solve_rate
 
-    def _compute(self, evaluation_output, seed=None):
+    def _compute(self, evaluation_output, seed=None, indices=None):
         # ~~ Concerning bootstrapping ~~
-        original_data = evaluation_output.data
-
         if seed is not None:
-            if len(original_data) == 1:
+            num_datapoints = len(evaluation_output.data) if indices is None else len(indices)
+            if num_datapoints == 1:
                 log.info("Bootstrapping is enabled but the evaluation output contains only one problem.")
 
-            evaluation_output.data = evaluation_output.get_bootstrapped_data(seed=seed)
+            indices = evaluation_output.get_bootstrap_indices(seed=seed, indices=indices)
         # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        tests_key = "hidden_tests_results" if self.params["hidden_test_cases"] else "public_tests_results"
-        score = self._compute_score(evaluation_output, tests_key)
+        problem_scores = self._get_problem_scores(evaluation_output)
+        if indices is not None:
+            problem_scores = problem_scores[indices]
 
-        # ~~ Concerning bootstrapping ~~
-        evaluation_output.data = original_data
-        # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        return self._aggregate(problem_scores[~np.isnan(problem_scores)])
+
+    def _get_problem_scores(self, evaluation_output):
+        """Returns the score of each datapoint in the evaluation output (NaN for the datapoints that are skipped).
+
+        As the evaluation output is never modified, the scores are computed once and resampled by the bootstrap.
+        """
+        cache = self._problem_scores_cache
+        if cache is None or cache[0] is not evaluation_output:
+            tests_key = "hidden_tests_results" if self.params["hidden_test_cases"] else "public_tests_results"
+            problem_scores = [
+                self._compute_problem_score(problem_eval_output, tests_key)
+                for problem_eval_output in evaluation_output.data
+            ]
+            problem_scores = np.array([np.nan if score is None else score for score in problem_scores], dtype=float)
+            cache = (evaluation_output, problem_scores)
+            self._problem_scores_cache = cache
+
+        return cache[1]
+
+    def get_per_problem_scores(self, evaluation_output):
+        """Returns the scores of the problems that the metric averages over (a dictionary of arrays if bucketed)."""
+        problem_scores = self._get_problem_scores(evaluation_output)
+
+        if self.bucket_id2datapoint_ids is None:
+            return problem_scores[~np.isnan(problem_scores)]
+
+        bucket_id2problem_scores = {}
+        for bucket_id, indices in self._get_bucket_id2indices(evaluation_output).items():
+            bucket_problem_scores = problem_scores[indices]
+            bucket_id2problem_scores[bucket_id] = bucket_problem_scores[~np.isnan(bucket_problem_scores)]
 
-        return score
+        return bucket_id2problem_scores
 
-    def _compute_score(self, evaluation_output, tests_key):
+    def get_aligned_problem_scores(self, evaluation_output):
+        """Returns the score of each datapoint in the order of the evaluation output (NaN for the skipped datapoints).
+        If bucketed, a dictionary with the scores of each bucket's datapoints is returned."""
+        problem_scores = self._get_problem_scores(evaluation_output)
+
+        if self.bucket_id2datapoint_ids is None:
+            return problem_scores
+
+        return {
+            bucket_id: problem_scores[indices]
+            for bucket_id, indices in self._get_bucket_id2indices(evaluation_output).items()
+        }
+
+    def _compute_problem_score(self, problem_eval_output, tests_key) -> Union[float, None]:
+        """Returns the score for a single problem, or None if the problem should be skipped."""
         raise NotImplementedError()
 
+    def _aggregate(self, problem_scores):
+        return np.mean(problem_scores)
+
+    def _get_bucket_id2indices(self, evaluation_output):
+        cache = self._bucket_id2indices_cache
+        if cache is None or cache[0] is not evaluation_output:
+            bucket_id2indices = {
+                bucket_id: evaluation_output.get_indices_for_ids(ids_to_keep=datapoint_ids)
+                for bucket_id, datapoint_ids in self.bucket_id2datapoint_ids.items()
+            }
+            cache = (evaluation_output, bucket_id2indices)
+            self._bucket_id2indices_cache = cache
+
+        return cache[1]
+
     def _compute_per_bucket_performance(self, evaluation_output, seed):
         bucket_id2score = {}
 
-        for bucket_id, datapoint_ids in self.bucket_id2datapoint_ids.items():
+        for bucket_id, indices in self._get_bucket_id2indices(evaluation_output).items():
             # ~~ Concerning bucketing ~~
-            original_data = evaluation_output.data
-            evaluation_output.data = evaluation_output.get_filtered_data(ids_to_keep=datapoint_ids)
-
-            if len(evaluation_output.data) == 0:
+            if len(indices) == 0:
                 raise ValueError(f"Bucket {bucket_id} is empty.")
-
-            # Convenient for debugging but can hide bugs for real runs
-            # if len(evaluation_output.data) == 0:
-            #     evaluation_output.data = original_data
-            #     continue
             # ~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-            bucket_id2score[bucket_id] = self._compute(evaluation_output, seed=seed)
-
-            # ~~ Concerning bucketing ~~
-            evaluation_output.data = original_data
-            # ~~~~~~~~~~~~~~~~~~~~~~~~~~
+            bucket_id2score[bucket_id] = self._compute(evaluation_output, seed=seed, indices=indices)
 
         return bucket_id2score
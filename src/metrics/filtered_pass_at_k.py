@@ -0,0 +1,65 @@
+import numpy as np
+from src import utils
+from src.metrics.pass_at_k import PassAtK
+from src.utils.inference_helpers import SAMPLE_BUDGET_KEY
+
+log = utils.get_pylogger(__name__)
+
+
+class FilteredPassAtK(PassAtK):
+    """The probability of solving a problem when, out of k candidates, the first one (in the order in which they were
+    sampled) that passes the public tests is submitted.
+
+    Unlike pass@k, the estimate only depends on the candidates up to the first public-passing one, so it remains
+    unbiased when the sampling is stopped as soon as a candidate passes the public tests (see `SampleBudgetPolicy`).
+    """
+
+    def __init__(self, **kwargs):
+        """
+        code_evaluator_id: str,
+        hidden_test_cases: bool,
+        bucketing_id: Union[str, None],
+        evaluation_buckets_dir: Union[str, None],
+        k: int
+        """
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def _get_id(code_evaluator_id, hidden_test_cases, bucketing_id, k, **kwargs):
+        return PassAtK._get_id(code_evaluator_id, hidden_test_cases, bucketing_id, k).replace(
+            "_pass_at_", "_filtered_pass_at_", 1
+        )
+
+    def _compute_problem_score(self, problem_eval_output, tests_key):
+        sample_budget = problem_eval_output.get(SAMPLE_BUDGET_KEY)
+        if sample_budget is not None and sample_budget.get("stop_reason") not in [None, "public_tests_passed"]:
+            # the sampling was stopped before a candidate passed the public tests, so the estimate would be biased
+            raise ValueError(
+                f"The sampling of problem {problem_eval_output['id']} was stopped early "
+                f"(`{sample_budget['stop_reason']}`), which biases the filtered pass@k."
+            )
+
+        eval_outputs = problem_eval_output[self.params["code_evaluator_id"]]
+
+        num_candidates = 0
+        for candidate_sol_eval_output in eval_outputs:
+            if (
+                "evaluation_status" in candidate_sol_eval_output
+                and candidate_sol_eval_output["evaluation_status"] != "completed"
+            ):
+                continue
+
+            num_candidates += 1
+            if num_candidates > self.params["k"]:
+                break
+
+            public_test_statuses = [test["status"] for test in candidate_sol_eval_output["public_tests_results"]]
+            if len(public_test_statuses) > 0 and np.all(public_test_statuses):
+                test_statuses = [test["status"] for test in candidate_sol_eval_output[tests_key]]
+                return float(len(test_statuses) > 0 and np.all(test_statuses))
+
+        if num_candidates == 0:
+            log.error(f"Problem {problem_eval_output['id']} has no candidate solutions with completed evaluations.")
+            return None
+
+        return 0.0
@@ -1,6 +1,7 @@
 import numpy as np
 from src import utils
 from src.metrics.abstract import AbstractMetric
+from src.utils.inference_helpers import SAMPLE_BUDGET_KEY
 
 log = utils.get_pylogger(__name__)
 
@@ -37,53 +38,63 @@ class PassAtK(AbstractMetric):
             return 1.0
         return 1.0 - np.prod(1.0 - k / np.arange(n - c + 1, n + 1))
 
-    def _compute_score(self, evaluation_output, tests_key):
-        result = []
-
-        for problem_eval_output in evaluation_output.data:
-            eval_outputs = problem_eval_output[self.params["code_evaluator_id"]]
-
-            total_sol_num = 0
-            pass_sol_num = 0
-
-            for candidate_sol_eval_output in eval_outputs:
-                assert (
-                    not self.params["code_evaluator_id"] == "online_judge"
-                ) or "evaluation_status" in candidate_sol_eval_output, "Online judges must have evaluation_status"
-
-                if (
-                    "evaluation_status" in candidate_sol_eval_output
-                    and candidate_sol_eval_output["evaluation_status"] != "completed"
-                ):
-                    log.error(
-                        f"Problem {problem_eval_output['id']} has a candidate solution for which "
-                        f"the evaluation status is `{candidate_sol_eval_output['evaluation_status']}` "
-                        f"rather than completed."
-                    )
-                    continue
+    @staticmethod
+    def _check_sampling_is_complete(problem_eval_output):
+        """The estimator assumes that the n candidates were sampled independently of their outcomes, which doesn't hold
+        when the sampling was stopped early by a `SampleBudgetPolicy` (recorded under `SAMPLE_BUDGET_KEY`)."""
+        sample_budget = problem_eval_output.get(SAMPLE_BUDGET_KEY)
+        if sample_budget is not None and sample_budget.get("stop_reason") is not None:
+            raise ValueError(
+                f"The sampling of problem {problem_eval_output['id']} was stopped early "
+                f"(`{sample_budget['stop_reason']}`, policy: {sample_budget['policy']}), which biases pass@k; "
+                f"use the `filtered_pass_at_k` metric (`FilteredPassAtK`) for the runs with sample budgeting."
+            )
+
+    def _compute_problem_score(self, problem_eval_output, tests_key):
+        self._check_sampling_is_complete(problem_eval_output)
+        eval_outputs = problem_eval_output[self.params["code_evaluator_id"]]
+
+        total_sol_num = 0
+        pass_sol_num = 0
+
+        for candidate_sol_eval_output in eval_outputs:
+            assert (
+                not self.params["code_evaluator_id"] == "online_judge"
+            ) or "evaluation_status" in candidate_sol_eval_output, "Online judges must have evaluation_status"
+
+            if (
+                "evaluation_status" in candidate_sol_eval_output
+                and candidate_sol_eval_output["evaluation_status"] != "completed"
+            ):
+                log.error(
+                    f"Problem {problem_eval_output['id']} has a candidate solution for which "
+                    f"the evaluation status is `{candidate_sol_eval_output['evaluation_status']}` "
+                    f"rather than completed."
+                )
+                continue
 
-                test_statuses = [test["status"] for test in candidate_sol_eval_output[tests_key]]
+            test_statuses = [test["status"] for test in candidate_sol_eval_output[tests_key]]
 
-                if len(test_statuses) == 0:
-                    log.error(f"Problem {problem_eval_output['id']} has a candidate solution with no tests!")
-                    continue
+            if len(test_statuses) == 0:
+                log.error(f"Problem {problem_eval_output['id']} has a candidate solution with no tests!")
+                continue
 
-                pass_sol_num += np.all(test_statuses)
-                total_sol_num += 1
+            pass_sol_num += np.all(test_statuses)
+            total_sol_num += 1
 
-            if total_sol_num == 1:
-                log.warning("Calculating PassAtK with a single candidate solution.")
-            elif total_sol_num == 0:
-                log.error(f"Problem {problem_eval_output['id']} has no candidate solutions with completed evaluations.")
-                continue
+        if total_sol_num == 1:
+            log.warning("Calculating PassAtK with a single candidate solution.")
+        elif total_sol_num == 0:
+            log.error(f"Problem {problem_eval_output['id']} has no candidate solutions with completed evaluations.")
+            return None
 
-            if total_sol_num == self.params["k"]:
-                log.warning(f"Calculating PassAtK with k = n = {total_sol_num}.")
+        if total_sol_num == self.params["k"]:
+            log.warning(f"Calculating PassAtK with k = n = {total_sol_num}.")
 
-            cur_res = self._estimator(n=total_sol_num, c=pass_sol_num, k=self.params["k"])
-            result.append(cur_res)
+        return self._estimator(n=total_sol_num, c=pass_sol_num, k=self.params["k"])
 
-        if len(result) == 0:
+    def _aggregate(self, problem_scores):
+        if len(problem_scores) == 0:
             raise ValueError("There are no problems with completed evaluations.")
 
-        return np.mean(result)
+        return np.mean(problem_scores)
@@ -33,60 +33,53 @@ class SolveRate(AbstractMetric):
 
         return name
 
-    def _compute_score(self, evaluation_output, tests_key):
-        result_solve_rate = []
-        result_test_pass_rate = []
-
-        for problem_eval_output in evaluation_output.data:
-            eval_outputs = problem_eval_output[self.params["code_evaluator_id"]]
-
-            psr = []
-            tpr = []
-
-            for candidate_sol_eval_output in eval_outputs:
-                assert (
-                    not self.params["code_evaluator_id"] == "online_judge"
-                ) or "evaluation_status" in candidate_sol_eval_output, "Online judges must have evaluation_status"
-
-                if (
-                    "evaluation_status" in candidate_sol_eval_output
-                    and candidate_sol_eval_output["evaluation_status"] != "completed"
-                ):
-                    log.error(
-                        f"Problem {problem_eval_output['id']} has a candidate solution for which "
-                        f"the evaluation status is `{candidate_sol_eval_output['evaluation_status']}` "
-                        f"rather than completed."
-                    )
-                    continue
-
-                if self.params["test_level"]:
-                    if "test_pass_rate" in candidate_sol_eval_output[tests_key][0]:
-                        # We are relying on the test pass rate that was scrapped from an online judge
-                        assert len(candidate_sol_eval_output[tests_key]) == 1
-                        tpr.append(candidate_sol_eval_output[tests_key][0]["test_pass_rate"])
-                        continue
+    def _compute_problem_score(self, problem_eval_output, tests_key):
+        eval_outputs = problem_eval_output[self.params["code_evaluator_id"]]
+
+        psr = []
+        tpr = []
+
+        for candidate_sol_eval_output in eval_outputs:
+            assert (
+                not self.params["code_evaluator_id"] == "online_judge"
+            ) or "evaluation_status" in candidate_sol_eval_output, "Online judges must have evaluation_status"
+
+            if (
+                "evaluation_status" in candidate_sol_eval_output
+                and candidate_sol_eval_output["evaluation_status"] != "completed"
+            ):
+                log.error(
+                    f"Problem {problem_eval_output['id']} has a candidate solution for which "
+                    f"the evaluation status is `{candidate_sol_eval_output['evaluation_status']}` "
+                    f"rather than completed."
+                )
+                continue
 
-                # Collect the status of each test
-                test_statuses = [test["status"] for test in candidate_sol_eval_output[tests_key]]
+            if self.params["test_level"]:
+                if "test_pass_rate" in candidate_sol_eval_output[tests_key][0]:
+                    # We are relying on the test pass rate that was scrapped from an online judge
+                    assert len(candidate_sol_eval_output[tests_key]) == 1
+                    tpr.append(candidate_sol_eval_output[tests_key][0]["test_pass_rate"])
+                    continue
 
-                assert (
-                    len(test_statuses) > 0
-                ), f"Problem {problem_eval_output['id']} has a candidate solution with no tests!"
+            # Collect the status of each test
+            test_statuses = [test["status"] for test in candidate_sol_eval_output[tests_key]]
 
-                # Compute the problem solve rate for the candidate solution
-                psr.append(int(np.all(test_statuses)))
+            assert (
+                len(test_statuses) > 0
+            ), f"Problem {problem_eval_output['id']} has a candidate solution with no tests!"
 
-                # Compute the test pass rate for the candidate solution
-                tpr.append(float(sum(test_statuses)) / len(test_statuses))
+            # Compute the problem solve rate for the candidate solution
+            psr.append(int(np.all(test_statuses)))
 
-            if len(psr) == 0:
-                log.error(f"Problem {problem_eval_output['id']} has no candidate solutions with completed evaluations.")
-                continue
+            # Compute the test pass rate for the candidate solution
+            tpr.append(float(sum(test_statuses)) / len(test_statuses))
 
-            result_solve_rate.append(np.mean(psr))
-            result_test_pass_rate.append(np.mean(tpr))
+        if len(psr) == 0:
+            log.error(f"Problem {problem_eval_output['id']} has no candidate solutions with completed evaluations.")
+            return None
 
         if self.params["test_level"]:
-            return np.mean(result_test_pass_rate)
+            return np.mean(tpr)
 
-        return np.mean(result_solve_rate)
+        return np.mean(psr)
@@ -26,3 +26,9 @@ class TemporalMetric:
 
     def compute(self, evaluation_output, seed=None):
         return self.metric.compute(evaluation_output=evaluation_output, seed=seed)
+
+    def get_per_problem_scores(self, evaluation_output):
+        return self.metric.get_per_problem_scores(evaluation_output=evaluation_output)
+
+    def get_aligned_problem_scores(self, evaluation_output):
+        return self.metric.get_aligned_problem_scores(evaluation_output=evaluation_output)
@@ -0,0 +1,266 @@
+"""The stores from which the experiment data (the run's config, predictions, evaluation output and results) is synced.
+
+A store exposes the part of the W&B API that the `sync_*` helpers use: `store.run(run_path)` returns a run with a
+(nested or "/"-flattened) `config`, `files()` (each with a `name` and `download(root, replace)`) and
+`upload_file(path, root)`. Two stores are available:
+    - `WandbArtifactStore`: the runs logged to W&B (`wandb.Api()`);
+    - `LocalArtifactStore`: a content-addressed store on the local filesystem, which needs no network access. Each
+      file is stored once, under `objects/` by its SHA-256, and each run is a manifest (`runs/<run_path>.json`) with
+      the run's config and the hash of each of its files. Optionally, the uploaded files are mirrored to W&B.
+
+`download_run_file` downloads a run's file (from either store) atomically and resumably, and `is_file_up_to_date`
+compares a local file with the size and the checksum of a run's file, so that the sync skips the files it already has.
+"""
+
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src import utils
+
+log = utils.get_pylogger(__name__)
+
+# the prefix of the paths of the runs published to a local store without a W&B run
+LOCAL_RUN_PREFIX = "local"
+# the suffix of the partially downloaded files, from which an interrupted download is resumed
+PARTIAL_DOWNLOAD_SUFFIX = ".part"
+CHUNK_SIZE = 1 << 20
+
+
+class WandbArtifactStore:
+    def __init__(self):
+        import wandb
+
+        self.api = wandb.Api()
+
+    def run(self, run_path: str):
+        return self.api.run(run_path)
+
+
+class LocalRunFile:
+    def __init__(self, store: "LocalArtifactStore", name: str, sha256: str, size: int, updated_at: str = ""):
+        self.store = store
+        self.name = name
+        self.sha256 = sha256
+        self.size = size
+        self.updated_at = updated_at
+
+    def download(self, root: str = ".", replace: bool = False):
+        path_to_file = os.path.join(root, self.name)
+        if os.path.exists(path_to_file) and not replace:
+            raise ValueError(f"File `{path_to_file}` already exists; pass replace=True to overwrite it")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path_to_file)), exist_ok=True)
+        self.store.copy_object(self.sha256, path_to_file)
+        return path_to_file
+
+    def iter_content(self, offset: int = 0, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self.store._get_object_path(self.sha256), "rb") as f:
+            f.seek(offset)
+            yield from iter(lambda: f.read(chunk_size), b"")
+
+
+class LocalRun:
+    def __init__(self, store: "LocalArtifactStore", path: str, manifest: Dict[str, Any]):
+        self.store = store
+        self.path = path
+        self.manifest = manifest
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        return self.manifest["config"]
+
+    def files(self) -> List[LocalRunFile]:
+        return [
+            LocalRunFile(self.store, name, file_info["sha256"], file_info["size"], file_info.get("updated_at", ""))
+            for name, file_info in sorted(self.manifest["files"].items())
+        ]
+
+    def upload_file(self, path: str, root: str = "."):
+        """Adds the file to the run, as `os.path.relpath(path, root)` (same as `wandb.apis.public.Run.upload_file`)."""
+        name = os.path.relpath(path, root)
+        sha256, size = self.store.put_object(path)
+        updated_at = datetime.now(timezone.utc).isoformat()
+        file_info = {"sha256": sha256, "size": size, "updated_at": updated_at}
+        self.manifest = self.store.update_manifest(self.path, files={name: file_info})
+
+        if self.store.mirror_to_wandb and not self.path.startswith(f"{LOCAL_RUN_PREFIX}/"):
+            import wandb
+
+            wandb.Api().run(self.path).upload_file(path, root=root)
+
+
+class LocalArtifactStore:
+    def __init__(self, root_dir: str, mirror_to_wandb: bool = False):
+        self.root_dir = root_dir
+        self.mirror_to_wandb = mirror_to_wandb
+        self._lock = threading.Lock()
+
+    def _get_object_path(self, sha256: str) -> str:
+        return os.path.join(self.root_dir, "objects", sha256[:2], sha256)
+
+    def _get_manifest_path(self, run_path: str) -> str:
+        return os.path.join(self.root_dir, "runs", f"{run_path}.json")
+
+    def put_object(self, path: str):
+        """Stores the file's content (if not already stored) and returns its hash and size."""
+        sha256 = compute_checksum(path, "sha256")
+
+        path_to_object = self._get_object_path(sha256)
+        if not os.path.exists(path_to_object):
+            _atomic_copy(path, path_to_object)
+
+        return sha256, os.path.getsize(path_to_object)
+
+    def copy_object(self, sha256: str, path: str):
+        _atomic_copy(self._get_object_path(sha256), path)
+
+    def has_run(self, run_path: str) -> bool:
+        return os.path.isfile(self._get_manifest_path(run_path))
+
+    def run(self, run_path: str) -> LocalRun:
+        if not self.has_run(run_path):
+            raise ValueError(f"Run `{run_path}` not found in the local artifact store `{self.root_dir}`")
+
+        with open(self._get_manifest_path(run_path), "r") as f:
+            return LocalRun(self, run_path, json.load(f))
+
+    def create_run(self, run_path: str, config: Dict[str, Any]) -> LocalRun:
+        """Creates the run (or replaces its config, if it exists) and returns it."""
+        return LocalRun(self, run_path, self.update_manifest(run_path, config=config))
+
+    def update_manifest(
+        self, run_path: str, config: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Dict]] = None
+    ) -> Dict[str, Any]:
+        with self._lock:
+            manifest = {"config": {}, "files": {}}
+            if self.has_run(run_path):
+                with open(self._get_manifest_path(run_path), "r") as f:
+                    manifest = json.load(f)
+
+            if config is not None:
+                manifest["config"] = config
+            manifest["files"].update(files or {})
+
+            _atomic_write_json(manifest, self._get_manifest_path(run_path))
+            return manifest
+
+
+def compute_checksum(path: str, algorithm: str) -> str:
+    """The file's checksum, in the format of the stores: the base64-encoded MD5 (W&B) or the hex SHA-256 (local)."""
+    hasher = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+
+    if algorithm == "md5":
+        return base64.b64encode(hasher.digest()).decode("ascii")
+    return hasher.hexdigest()
+
+
+def get_remote_checksum(run_file) -> Optional[Tuple[str, str]]:
+    """The (algorithm, checksum) of a run's file, or None if the store doesn't provide one."""
+    if isinstance(run_file, LocalRunFile):
+        return "sha256", run_file.sha256
+
+    md5 = getattr(run_file, "md5", None)
+    return ("md5", md5) if md5 else None
+
+
+def is_file_up_to_date(run_file, path: str) -> bool:
+    """Whether the local file has the size and (if available) the checksum of the run's file."""
+    if not os.path.isfile(path) or os.path.getsize(path) != run_file.size:
+        return False
+
+    checksum = get_remote_checksum(run_file)
+    return checksum is None or compute_checksum(path, checksum[0]) == checksum[1]
+
+
+@contextlib.contextmanager
+def _open_run_file(run_file, offset: int):
+    """Yields the chunks of the run's file starting at (at most) `offset`, and the offset at which they start, which is
+    0 if the server doesn't support range requests."""
+    if isinstance(run_file, LocalRunFile):
+        yield run_file.iter_content(offset), offset
+        return
+
+    import requests
+    import wandb
+
+    headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
+    # same request as `wandb.apis.public.File.download`, which can't resume a download (the file's `client` is a
+    # `RetryingClient`, which doesn't hold the API key)
+    with requests.get(
+        run_file.url, auth=("user", wandb.Api().api_key), headers=headers, stream=True, timeout=30
+    ) as response:
+        response.raise_for_status()
+        yield response.iter_content(chunk_size=CHUNK_SIZE), offset if response.status_code == 206 else 0
+
+
+def download_run_file(run_file, path: str) -> str:
+    """Downloads the run's file to `path`. The content is written to `<path>.part`, resuming the partial file left by
+    an interrupted download, and is renamed to `path` only once its size and checksum match the remote ones."""
+    path_to_partial_file = path + PARTIAL_DOWNLOAD_SUFFIX
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    for _ in range(2):
+        offset = os.path.getsize(path_to_partial_file) if os.path.isfile(path_to_partial_file) else 0
+        if offset > run_file.size:
+            offset = 0
+
+        if offset < run_file.size or not os.path.isfile(path_to_partial_file):
+            if offset > 0:
+                log.info(f"Resuming the download of `{path}` at byte {offset}/{run_file.size}.")
+            with _open_run_file(run_file, offset) as (chunks, offset):
+                with open(path_to_partial_file, "ab" if offset > 0 else "wb") as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+
+        if is_file_up_to_date(run_file, path_to_partial_file):
+            os.replace(path_to_partial_file, path)
+            return path
+
+        # the partial file was stale (e.g., left by the download of a previous version of the file); start over
+        log.warning(f"The download of `{path}` doesn't match the remote file, downloading it again.")
+        os.remove(path_to_partial_file)
+
+    raise IOError(f"The download of `{run_file.name}` to `{path}` doesn't match the size/checksum of the remote file")
+
+
+def _atomic_copy(src_path: str, dst_path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(dst_path)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dst_path)), suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _atomic_write_json(data: Dict[str, Any], path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def get_local_run_name(root_dir: Optional[str], run_path: str) -> Optional[str]:
+    """The name of a run in the local store (None if the store or the run doesn't exist)."""
+    if root_dir is None:
+        return None
+
+    store = LocalArtifactStore(root_dir)
+    if not store.has_run(run_path):
+        return None
+
+    return store.run(run_path).config["hydra_config"]["run_name"]
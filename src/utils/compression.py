@@ -0,0 +1,119 @@
+"""Transparent, streaming compression of the data files (predictions, evaluation outputs and bucketings).
+
+The compression of a file is given by its extension: `.gz` (gzip) or `.zst` (zstd, which needs the `zstandard` package
+and compresses on all the cores). `open_file` returns a text stream regardless of the compression, so the files are
+still read and written one line at a time, and `find_file` returns the variant (plain or compressed) of a file that
+exists, so that the readers don't depend on how the file was written.
+"""
+
+import gzip
+import io
+import os
+import shutil
+from typing import IO, List, Optional
+
+from src import utils
+
+log = utils.get_pylogger(__name__)
+
+COMPRESSION2EXTENSION = {"gzip": ".gz", "zstd": ".zst"}
+GZIP_COMPRESS_LEVEL = 6
+ZSTD_COMPRESS_LEVEL = 3
+
+
+def get_compression(path: str) -> Optional[str]:
+    for compression, extension in COMPRESSION2EXTENSION.items():
+        if path.endswith(extension):
+            return compression
+    return None
+
+
+def strip_compression_extension(path: str) -> str:
+    compression = get_compression(path)
+    return path if compression is None else path[: -len(COMPRESSION2EXTENSION[compression])]
+
+
+def add_compression_extension(path: str, compression: Optional[str]) -> str:
+    if compression is None:
+        return path
+
+    assert (
+        compression in COMPRESSION2EXTENSION
+    ), f"Unknown compression `{compression}` (supported: {', '.join(COMPRESSION2EXTENSION)})"
+    return path + COMPRESSION2EXTENSION[compression]
+
+
+def has_extension(path: str, extension: str) -> bool:
+    """Whether the file has the extension, before the compression extension (e.g., `.jsonl` for `x.jsonl.gz`)."""
+    return strip_compression_extension(path).endswith(extension)
+
+
+def get_file_variants(path: str) -> List[str]:
+    """The plain and the compressed variants of the file's path."""
+    path = strip_compression_extension(path)
+    return [path] + [path + extension for extension in COMPRESSION2EXTENSION.values()]
+
+
+def find_file(path: str) -> Optional[str]:
+    """The variant of the file that exists (the most recently modified one, if several do), or None."""
+    existing_paths = [variant for variant in get_file_variants(path) if os.path.isfile(variant)]
+    return max(existing_paths, key=os.path.getmtime, default=None)
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("Reading and writing `.zst` files requires `zstandard` (pip install zstandard)") from e
+
+    return zstandard
+
+
+def _open_binary(path: str, mode: str) -> IO[bytes]:
+    compression = get_compression(path)
+    if compression is None:
+        return open(path, mode + "b")
+    if compression == "gzip":
+        return gzip.open(path, mode + "b", compresslevel=GZIP_COMPRESS_LEVEL)
+
+    zstandard = _import_zstandard()
+    if mode == "r":
+        # a file that was appended to consists of several frames
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+    compressor = zstandard.ZstdCompressor(level=ZSTD_COMPRESS_LEVEL, threads=-1)
+    return compressor.stream_writer(open(path, mode + "b"), closefd=True)
+
+
+def open_binary_file(path: str, mode: str = "r") -> IO[bytes]:
+    """Opens the (plain, gzip or zstd) file as a binary stream of its (decompressed) content, in mode "r", "w" or "a".
+    The compressed streams can only be read sequentially, and seeking forward decompresses up to the position."""
+    assert mode in ("r", "w", "a"), f"Unsupported mode `{mode}`"
+    return _open_binary(path, mode)
+
+
+def open_file(path: str, mode: str = "r") -> IO[str]:
+    """Opens the (plain, gzip or zstd) file as a text stream, in mode "r", "w" or "a"."""
+    assert mode in ("r", "w", "a"), f"Unsupported mode `{mode}`"
+    if get_compression(path) is None:
+        return open(path, mode)
+
+    return io.TextIOWrapper(_open_binary(path, mode), encoding="utf-8")
+
+
+def compress_file(path: str, compression: str) -> str:
+    """Compresses the plain file (streaming, through a temporary file) and replaces it with the compressed one, whose
+    path is returned."""
+    path_to_compressed_file = add_compression_extension(path, compression)
+    # the temporary file has the compression's extension, but not the extension of the data files
+    path_to_tmp_file = add_compression_extension(f"{path}.tmp", compression)
+
+    with open(path, "rb") as input_file, _open_binary(path_to_tmp_file, "w") as output_file:
+        shutil.copyfileobj(input_file, output_file, length=1 << 20)
+
+    os.replace(path_to_tmp_file, path_to_compressed_file)
+    log.info(
+        f"Compressed `{path}` with {compression}: {os.path.getsize(path):,} -> "
+        f"{os.path.getsize(path_to_compressed_file):,} bytes"
+    )
+    os.remove(path)
+    return path_to_compressed_file
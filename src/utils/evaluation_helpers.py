@@ -1,20 +1,40 @@
 import numpy as np
+import contextlib
+import itertools
 import json
 import os
 import re
 import zipfile
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from statistics import NormalDist
 
 import hydra
 from jsonlines import jsonlines
 
 from src import utils
-from src.utils.general_helpers import get_predictions_dir_path, write_jsonlines
+from src.utils.compression import (
+    add_compression_extension,
+    find_file,
+    get_file_variants,
+    has_extension,
+    open_file,
+    strip_compression_extension,
+)
+from src.utils.evaluation_output_index import IndexedEvaluationOutput, get_path_to_index, write_indexed_jsonlines
+from src.utils.general_helpers import get_predictions_dir_path
 
 
 log = utils.get_pylogger(__name__)
 
+# The problem fields that the metrics (and the bucketings) can rely on when the evaluation output is loaded in lean mode
+LEAN_PROBLEM_FIELDS = ["id", "contest", "problem_name", "difficulty", "tags", "release_time", "non_unique_output"]
+# The per-test fields that the metrics rely on; the inputs and (expected/generated) outputs are never used
+LEAN_TEST_RESULT_FIELDS = ["status", "test_pass_rate"]
+# The maximum number of files that are downloaded concurrently when syncing the experiment data
+NUM_DOWNLOAD_WORKERS = 8
+
 
 def unflatten_dict(dictionary: dict) -> dict:
     result_dict = dict()
@@ -29,37 +49,83 @@ def unflatten_dict(dictionary: dict) -> dict:
     return result_dict
 
 
-def _sync_helper_download_file(wandb_file, exp_dir, replace):
-    full_path = os.path.join(exp_dir, wandb_file.name)
+def _sync_helper_download_file(run_file, exp_dir, replace):
+    from src.utils.artifact_store import download_run_file, is_file_up_to_date
 
-    if os.path.exists(full_path) and not replace:
-        log.info(f"File `{full_path}` already exists, skipping download.")
-    elif os.path.exists(full_path) and replace:
-        log.info(f"File `{full_path}` already exists, but will be replaced.")
-        wandb_file.download(root=exp_dir, replace=replace)
-    else:
+    full_path = os.path.join(exp_dir, run_file.name)
+
+    if not os.path.exists(full_path):
         log.info(f"Downloading file `{full_path}` to `{exp_dir}`.")
-        wandb_file.download(root=exp_dir, replace=replace)
+    elif is_file_up_to_date(run_file, full_path):
+        log.info(f"File `{full_path}` is up to date, skipping download.")
+        return
+    elif replace:
+        log.info(f"File `{full_path}` differs from the remote file, and will be replaced.")
+    else:
+        log.warning(f"File `{full_path}` differs from the remote file, but will be kept (replace=False).")
+        return
+
+    download_run_file(run_file, full_path)
+
+    if replace:
+        # the other (plain or compressed) variants of the file are outdated copies of it
+        for path_to_variant in get_file_variants(full_path):
+            if path_to_variant != full_path and os.path.isfile(path_to_variant):
+                log.info(f"Removing the outdated variant `{path_to_variant}` of `{full_path}`.")
+                os.remove(path_to_variant)
+
+
+def _sync_helper_download_files(files_to_download, exp_dir, num_workers=NUM_DOWNLOAD_WORKERS):
+    """Downloads the (run file, replace) pairs concurrently, with at most `num_workers` downloads in flight."""
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+        futures = [executor.submit(_sync_helper_download_file, f, exp_dir, replace) for f, replace in files_to_download]
+        for future in futures:
+            future.result()
+
+
+@contextlib.contextmanager
+def _sync_lock(exp_dir):
+    """Serializes the syncs of the same experiment directory by concurrent processes (e.g., the shards of a sharded
+    evaluation), which would otherwise download the same files at the same time."""
+    import fcntl
+
+    with open(os.path.join(exp_dir, ".sync.lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)  # released when the file is closed
+        yield
+
+
+def _is_results_file(run_file):
+    return run_file.name == "results.json"
+
+
+def _is_evaluation_output_file(run_file):
+    return strip_compression_extension(run_file.name) == "evaluation_output.jsonl"
+
+
+def _is_predictions_file(run_file):
+    file_name = run_file.name.split("/")[-1]
+    return file_name.startswith("predictions") and has_extension(file_name, ".jsonl")
 
 
-def sync_results_from_wandb(wandb_run, exp_dir, replace):
-    for f in wandb_run.files():
-        if f.name == "results.json":
-            _sync_helper_download_file(f, exp_dir, replace)
+def _select_latest_variants(run_files):
+    """Keeps, among the plain and the compressed variants of each file, only the most recently uploaded one."""
+    name2run_file = {}
+    for f in run_files:
+        name = strip_compression_extension(f.name)
+        if name not in name2run_file or getattr(f, "updated_at", "") > getattr(name2run_file[name], "updated_at", ""):
+            name2run_file[name] = f
 
+    return list(name2run_file.values())
 
-def sync_evaluation_output_from_wandb(wandb_run, exp_dir, replace):
-    for f in wandb_run.files():
-        if f.name == "evaluation_output.jsonl":
-            _sync_helper_download_file(f, exp_dir, replace)
 
+def instantiate_artifact_store(artifact_store_config=None):
+    """Instantiates the store from which the experiment data is synced (by default, W&B)."""
+    if artifact_store_config is None:
+        from src.utils.artifact_store import WandbArtifactStore
 
-def sync_predictions_from_wandb(wandb_run, exp_dir, replace):
-    for f in wandb_run.files():
-        full_path = f.name
-        file_name = full_path.split("/")[-1]
-        if file_name.startswith("predictions") and file_name.endswith(".jsonl"):
-            _sync_helper_download_file(f, exp_dir, replace)
+        return WandbArtifactStore()
+
+    return hydra.utils.instantiate(artifact_store_config)
 
 
 def sync_experiment_data(
@@ -72,11 +138,12 @@ def sync_experiment_data(
     sync_results=True,
     replace_results=True,
     work_dir=".",
+    artifact_store=None,
+    num_download_workers=NUM_DOWNLOAD_WORKERS,
 ):
-    import wandb
-
-    api = wandb.Api()
-    run = api.run(wandb_run_path)
+    if artifact_store is None:
+        artifact_store = instantiate_artifact_store()
+    run = artifact_store.run(wandb_run_path)
 
     wandb_run_config = unflatten_dict(run.config)
     wandb_run_hydra_config = wandb_run_config["hydra_config"]
@@ -88,12 +155,17 @@ def sync_experiment_data(
     Path(exp_dir).mkdir(parents=True, exist_ok=True)
     get_predictions_dir_path(exp_dir, create_if_not_exists=True)
 
-    if sync_predictions:
-        sync_predictions_from_wandb(run, exp_dir, replace_predictions)
-    if sync_evaluation_output:
-        sync_evaluation_output_from_wandb(run, exp_dir, replace_evaluation_output)
-    if sync_results:
-        sync_results_from_wandb(run, exp_dir, replace_results)
+    # the files are listed once, and downloaded concurrently
+    files_to_download = []
+    for f in _select_latest_variants(run.files()):
+        if sync_predictions and _is_predictions_file(f):
+            files_to_download.append((f, replace_predictions))
+        elif sync_evaluation_output and _is_evaluation_output_file(f):
+            files_to_download.append((f, replace_evaluation_output))
+        elif sync_results and _is_results_file(f):
+            files_to_download.append((f, replace_results))
+    with _sync_lock(exp_dir):
+        _sync_helper_download_files(files_to_download, exp_dir, num_workers=num_download_workers)
 
     return wandb_run_config, wandb_run_hydra_config, exp_dir
 
@@ -101,11 +173,11 @@ def sync_experiment_data(
 def read_predictions(outputs_dir):
     items_dict = defaultdict(dict)
     for filename in os.listdir(outputs_dir):
-        if not filename.endswith(".jsonl"):
+        if not has_extension(filename, ".jsonl"):
             continue
 
         input_file_path = os.path.join(outputs_dir, filename)
-        with open(input_file_path, "r+") as fp:
+        with open_file(input_file_path, "r") as fp:
             # reader = jsonlines.Reader(fp)
             # for element in reader:
             for idx, line in enumerate(fp):
@@ -124,18 +196,49 @@ def read_predictions(outputs_dir):
     return items
 
 
-def read_evaluation_output(exp_dir):
-    input_file_path = os.path.join(exp_dir, "evaluation_output.jsonl")
-    if not os.path.isfile(input_file_path):
+def _strip_tests_io(element):
+    """Drops the inputs and the outputs of the tests, keeping only the fields used for calculating the metrics."""
+    for key, value in element.items():
+        if key == "id" or not isinstance(value, list):
+            continue
+
+        for candidate_sol_eval_output in value:
+            for tests_key in ["hidden_tests_results", "public_tests_results"]:
+                if tests_key not in candidate_sol_eval_output:
+                    continue
+
+                candidate_sol_eval_output[tests_key] = [
+                    {field: test[field] for field in LEAN_TEST_RESULT_FIELDS if field in test}
+                    for test in candidate_sol_eval_output[tests_key]
+                ]
+
+    return element
+
+
+def read_evaluation_output(exp_dir, lean=False, ids=None):
+    """Reads the evaluation output from the experiment directory.
+
+    If `lean` is True, the inputs and the outputs of the tests are dropped as each line is parsed. If `ids` is given,
+    only the evaluation of these problems is read (and parsed), through the index of the file.
+    """
+    input_file_path = find_file(os.path.join(exp_dir, "evaluation_output.jsonl"))
+    if input_file_path is None:
         return []
 
+    if ids is not None:
+        items = IndexedEvaluationOutput(input_file_path).get_items(ids)
+        return [_strip_tests_io(element) for element in items] if lean else items
+
     items_dict = {}
-    with open(input_file_path, "r+") as fp:
+    with open_file(input_file_path, "r") as fp:
         reader = jsonlines.Reader(fp)
         for element in reader:
             assert "id" in element
             assert element["id"] not in items_dict
 
+            if lean:
+                element = _strip_tests_io(element)
+
             items_dict[element["id"]] = element
 
     items = [items_dict[_id] for _id in sorted(items_dict.keys())]
@@ -143,9 +246,20 @@ def read_evaluation_output(exp_dir):
     return items
 
 
-def write_evaluation_output(exp_dir, items):
-    output_file_path = os.path.join(exp_dir, "evaluation_output.jsonl")
-    write_jsonlines(output_file_path, items)
+def write_evaluation_output(exp_dir, items, compression=None):
+    """Writes the evaluation output (compressed with `compression`, if given), along with its index, and returns the
+    path to the file."""
+    output_file_path = add_compression_extension(os.path.join(exp_dir, "evaluation_output.jsonl"), compression)
+    write_indexed_jsonlines(output_file_path, items)
+
+    # the evaluation output written in another format (e.g., during the inference) is superseded
+    for path_to_variant in get_file_variants(output_file_path):
+        if path_to_variant != output_file_path:
+            for path in [path_to_variant, get_path_to_index(path_to_variant)]:
+                if os.path.isfile(path):
+                    os.remove(path)
+
+    return output_file_path
 
 
 def read_results(exp_dir):
@@ -171,7 +285,7 @@ def _update_paths_relative_to_data_dir(old_path, old_data_dir, new_data_dir):
     return new_path
 
 
-def get_dataset_used_in_run(hydra_config, split, data_dir=None):
+def get_dataset_used_in_run(hydra_config, split, data_dir=None, fields_to_keep=None):
     if data_dir is not None:
         old_data_dir = hydra_config["data_dir"]
 
@@ -197,40 +311,95 @@ def get_dataset_used_in_run(hydra_config, split, data_dir=None):
 
     dataset_cfg = json.dumps(hydra_config["datamodule"]["dataset_parameters"][split]["dataset"])
     dataset_cfg = json.loads(dataset_cfg, object_pairs_hook=fix_nones)
+    if fields_to_keep is not None:
+        dataset_cfg["fields_to_keep"] = list(fields_to_keep)
+    # the fields hidden from the flows (e.g., the hidden test cases) are needed for the evaluation
+    dataset_cfg["fields_to_drop"] = None
+    dataset_cfg["streaming"] = False
 
     dataset = hydra.utils.instantiate(dataset_cfg)
     return dataset
 
 
 class EvaluationOutput:
-    def __init__(self, exp_dir=None, data={}, problems_dataset=None):
+    def __init__(self, exp_dir=None, data={}, problems_dataset=None, lean=False, ids=None):
+        """
+        exp_dir: the directory from which the evaluation output is read
+        ids: if given, only the evaluation of these problems is read from `exp_dir`
+        data: the evaluation output (used if `exp_dir` is None)
+        problems_dataset: the dataset containing the problems' data, attached to each item under `problem_data`
+        lean: if True, the tests' inputs and outputs are dropped and only the `LEAN_PROBLEM_FIELDS` are attached
+        """
         self.data = data
         self.dataset_name = None
 
         if exp_dir is not None:
-            self.data = read_evaluation_output(exp_dir)
+            self.data = read_evaluation_output(exp_dir, lean=lean, ids=ids)
 
         if problems_dataset is not None:
-            id2problem_data = {problem_data["id"]: problem_data for problem_data in problems_dataset}
+            id2problem_data = {problem_data["id"]: problem_data for problem_data in problems_dataset.data}
             for item in self.data:
-                item["problem_data"] = id2problem_data[item["id"]]
+                problem_data = id2problem_data[item["id"]]
+                if lean:
+                    problem_data = {key: problem_data[key] for key in LEAN_PROBLEM_FIELDS if key in problem_data}
+                item["problem_data"] = problem_data
             self.dataset_name = problems_dataset.params["dataset_name"]
 
         log.info(f"Loaded {len(self.data)} datapoints from experiment dir {exp_dir}.")
 
-    def get_bootstrapped_data(self, seed):
-        data = self.data
-        num_datapoints = len(data)
+    def get_data(self, indices=None):
+        """Returns the datapoints at the given positions (all datapoints if `indices` is None) without copying them."""
+        if indices is None:
+            return self.data
+
+        return [self.data[i] for i in indices]
+
+    def get_bootstrap_indices(self, seed, indices=None):
+        """Returns the positions of a bootstrap sample drawn from `indices` (from all datapoints if None)."""
+        if indices is None:
+            indices = np.arange(len(self.data))
 
         random_state = np.random.RandomState(seed)
-        bootstrap_ids = random_state.choice(len(self.data), num_datapoints, replace=True)
+        return indices[random_state.choice(len(indices), len(indices), replace=True)]
+
+    def get_indices_for_ids(self, ids_to_keep):
+        """Returns the positions of the datapoints with an id in `ids_to_keep` (in the order of the data)."""
+        ids_to_keep = set(ids_to_keep)
+        return np.array([idx for idx, dp in enumerate(self.data) if dp["id"] in ids_to_keep], dtype=int)
 
-        bootstrap_data = [data[i] for i in bootstrap_ids]
-        return bootstrap_data
+    def get_bootstrapped_data(self, seed):
+        return self.get_data(self.get_bootstrap_indices(seed))
 
     def get_filtered_data(self, ids_to_keep):
-        ids_to_keep = set(ids_to_keep)
-        return [dp for dp in self.data if dp["id"] in ids_to_keep]
+        return self.get_data(self.get_indices_for_ids(ids_to_keep))
+
+
+def align_evaluation_outputs(evaluation_outputs, restrict_to_common_problems=False):
+    """Returns evaluation outputs with the datapoints of the same problems in the same order (sorted by id).
+
+    Raises a ValueError if the evaluation outputs are not over the same set of problems,
+    unless `restrict_to_common_problems` is True, in which case only the common problems are kept.
+    """
+    id_sets = [set(dp["id"] for dp in evaluation_output.data) for evaluation_output in evaluation_outputs]
+    common_ids = set.intersection(*id_sets)
+
+    num_dropped = max(len(ids) for ids in id_sets) - len(common_ids)
+    if any(len(ids) != len(common_ids) for ids in id_sets):
+        if not restrict_to_common_problems:
+            raise ValueError(
+                f"The evaluation outputs are not over the same set of problems ({len(common_ids)} in common)."
+            )
+        log.warning(f"Only the {len(common_ids)} common problems are kept (at least {num_dropped} dropped).")
+
+    common_ids = sorted(common_ids)
+    aligned_evaluation_outputs = []
+    for evaluation_output in evaluation_outputs:
+        id2datapoint = {dp["id"]: dp for dp in evaluation_output.data}
+        aligned_evaluation_output = EvaluationOutput(data=[id2datapoint[_id] for _id in common_ids])
+        aligned_evaluation_output.dataset_name = evaluation_output.dataset_name
+        aligned_evaluation_outputs.append(aligned_evaluation_output)
+
+    return aligned_evaluation_outputs
 
 
 class Results:
@@ -292,6 +461,22 @@ class Results:
 
         return bucket2seed2scores
 
+    def set_confidence_interval(self, metric_id, method, ci, confidence_level):
+        """Records the CI (a (lower, mean, upper) tuple, or a dictionary of tuples if bucketed) and the method used."""
+        if isinstance(ci, dict):
+            ci = {bucket_id: [float(value) for value in bucket_ci] for bucket_id, bucket_ci in ci.items()}
+        else:
+            ci = [float(value) for value in ci]
+
+        self.data[metric_id].setdefault("confidence_intervals", {})[method] = {
+            "method": method,
+            "confidence_level": confidence_level,
+            "ci": ci,
+        }
+
+    def get_confidence_interval(self, metric_id, method):
+        return self.data[metric_id].get("confidence_intervals", {}).get(method, None)
+
     @staticmethod
     def _select_bootstrap_scores_for_ci(seed2score, n_bootstrap_samples):
         return [score for seed, score in sorted(seed2score.items(), key=lambda x: int(x[0]))[:n_bootstrap_samples]]
@@ -362,20 +547,163 @@ def get_std_based_ci(scores):
     return ci_l, mean, ci_u
 
 
+def _get_z_score(confidence_level):
+    return NormalDist().inv_cdf(1 - (1 - confidence_level) / 2)
+
+
+def get_normal_approximation_ci(problem_scores, confidence_level):
+    """Returns the CI of the mean score based on the normal approximation of its sampling distribution."""
+    problem_scores = np.asarray(problem_scores, dtype=float)
+    mean = np.mean(problem_scores)
+
+    if len(problem_scores) < 2:
+        return mean, mean, mean
+
+    std_error = np.std(problem_scores, ddof=1) / np.sqrt(len(problem_scores))
+    z = _get_z_score(confidence_level)
+    return mean - z * std_error, mean, mean + z * std_error
+
+
+def is_binary(problem_scores):
+    problem_scores = np.asarray(problem_scores, dtype=float)
+    return bool(np.all((problem_scores == 0) | (problem_scores == 1)))
+
+
+def get_wilson_ci(problem_scores, confidence_level):
+    """Returns the Wilson score interval, treating the mean score as a proportion over the problems.
+    Only valid for binary (0 or 1) problem scores, e.g., the solve rate."""
+    problem_scores = np.asarray(problem_scores, dtype=float)
+    if not is_binary(problem_scores):
+        raise ValueError(
+            "The Wilson score interval requires binary (0 or 1) problem scores; "
+            "use the `normal` or `bayesian_bootstrap` method for fractional scores (e.g., pass@k or test pass rates)."
+        )
+    n = len(problem_scores)
+    mean = np.mean(problem_scores)
+    z = _get_z_score(confidence_level)
+
+    denominator = 1 + z**2 / n
+    center = (mean + z**2 / (2 * n)) / denominator
+    half_width = z * np.sqrt(mean * (1 - mean) / n + z**2 / (4 * n**2)) / denominator
+    return center - half_width, mean, center + half_width
+
+
+def get_bayesian_bootstrap_ci(problem_scores, confidence_level, n_samples, seed, chunk_size=1000):
+    """Returns the percentile based CI of the Bayesian bootstrap, i.e., of the means of the problem scores
+    weighted by `n_samples` draws from a flat Dirichlet distribution (computed in chunks of `chunk_size` draws)."""
+    problem_scores = np.asarray(problem_scores, dtype=float)
+    random_state = np.random.RandomState(seed)
+
+    bootstrap_scores = []
+    for start in range(0, n_samples, chunk_size):
+        weights = random_state.dirichlet(np.ones(len(problem_scores)), size=min(chunk_size, n_samples - start))
+        bootstrap_scores.append(weights @ problem_scores)
+
+    return get_percentile_based_ci(np.concatenate(bootstrap_scores), confidence_level)
+
+
+def get_ci(problem_scores, method, confidence_level=0.95, n_samples=10000, seed=None):
+    """Returns the (lower, mean, upper) CI for the mean of the problem scores, computed with the given method:
+    - normal: normal approximation
+    - wilson: Wilson score interval (binary problem scores only)
+    - bayesian_bootstrap: vectorized Bayesian bootstrap
+    """
+    if len(problem_scores) == 0:
+        raise ValueError("Cannot compute a confidence interval without problem scores.")
+
+    if method == "normal":
+        return get_normal_approximation_ci(problem_scores, confidence_level)
+    if method == "wilson":
+        return get_wilson_ci(problem_scores, confidence_level)
+    if method == "bayesian_bootstrap":
+        return get_bayesian_bootstrap_ci(problem_scores, confidence_level, n_samples, seed)
+
+    raise ValueError(f"Unknown confidence interval method `{method}`.")
+
+
+def get_paired_bootstrap_scores(run_problem_scores, n_samples, seed, chunk_size=1000):
+    """Returns an (n_samples, num_runs) array with the score of each run on each bootstrap sample.
+
+    `run_problem_scores` is a (num_runs, num_problems) array with aligned columns (NaN for the skipped problems).
+    A single resample index matrix is drawn (in chunks of `chunk_size` samples) and shared by all the runs,
+    so the scores of the runs on the same bootstrap sample are paired.
+    """
+    run_problem_scores = np.asarray(run_problem_scores, dtype=float)
+    num_problems = run_problem_scores.shape[1]
+    is_scored = (~np.isnan(run_problem_scores)).astype(float)
+    scores = np.nan_to_num(run_problem_scores, nan=0.0)
+    random_state = np.random.RandomState(seed)
+
+    bootstrap_scores = []
+    for start in range(0, n_samples, chunk_size):
+        size = min(chunk_size, n_samples - start)
+        indices = random_state.choice(num_problems, (size, num_problems), replace=True)
+
+        # counts[i, j] -- the number of times that problem j is drawn in the i-th bootstrap sample
+        offsets = np.arange(size)[:, None] * num_problems
+        counts = np.bincount((indices + offsets).ravel(), minlength=size * num_problems)
+        counts = counts.reshape(size, num_problems).astype(float)
+
+        # the mean over the drawn problems that are not skipped (NaN if all of them are skipped)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bootstrap_scores.append((counts @ scores.T) / (counts @ is_scored.T))
+
+    return np.concatenate(bootstrap_scores)
+
+
+def get_paired_bootstrap_comparison(run_ids, run_problem_scores, confidence_level, n_samples, seed):
+    """Returns the score and the percentile based CI of each run, and the difference between each pair of runs
+    with its CI and a two-sided p-value (for the null hypothesis of no difference), from the paired bootstrap."""
+    run_problem_scores = np.asarray(run_problem_scores, dtype=float)
+    unscored_run_ids = [run_id for run_id, is_nan in zip(run_ids, np.isnan(run_problem_scores).all(axis=1)) if is_nan]
+    if unscored_run_ids:
+        raise ValueError(f"Cannot compare the runs {unscored_run_ids}, which have no scored problems.")
+
+    bootstrap_scores = get_paired_bootstrap_scores(run_problem_scores, n_samples, seed)
+    scores = np.nanmean(run_problem_scores, axis=1)
+
+    # the resamples that draw only problems skipped by a run have no score for it, and are left out of its statistics
+    comparison = {"runs": {}, "differences": {}}
+    for i, run_id in enumerate(run_ids):
+        run_bootstrap_scores = bootstrap_scores[:, i]
+        run_bootstrap_scores = run_bootstrap_scores[~np.isnan(run_bootstrap_scores)]
+        comparison["runs"][run_id] = {
+            "score": float(scores[i]),
+            "ci": [float(value) for value in get_percentile_based_ci(run_bootstrap_scores, confidence_level)],
+        }
+
+    for i, j in itertools.combinations(range(len(run_ids)), 2):
+        differences = bootstrap_scores[:, i] - bootstrap_scores[:, j]
+        differences = differences[~np.isnan(differences)]
+        p_value = min(1.0, 2 * min(np.mean(differences <= 0), np.mean(differences >= 0)))
+        comparison["differences"][f"{run_ids[i]} - {run_ids[j]}"] = {
+            "difference": float(scores[i] - scores[j]),
+            "ci": [float(value) for value in get_percentile_based_ci(differences, confidence_level)],
+            "p_value": float(p_value),
+        }
+
+    return comparison
+
+
 def read_bucketing_data(evaluation_buckets_dir, bucketing_id):
-    buckets_data_path = os.path.join(evaluation_buckets_dir, f"{bucketing_id}.json")
-    with open(buckets_data_path, "r") as f:
+    path_to_bucketing = os.path.join(evaluation_buckets_dir, f"{bucketing_id}.json")
+    buckets_data_path = find_file(path_to_bucketing)
+    if buckets_data_path is None:
+        raise FileNotFoundError(f"No bucketing data found at `{path_to_bucketing}` (plain or compressed)")
+
+    with open_file(buckets_data_path, "r") as f:
         buckets_data_path = json.load(f)
     return buckets_data_path
 
 
-def write_bucketing_data(evaluation_buckets_dir, bucketing_id, bucket_data):
+def write_bucketing_data(evaluation_buckets_dir, bucketing_id, bucket_data, compression=None):
+    buckets_data_path = os.path.join(evaluation_buckets_dir, f"{bucketing_id}.json")
+    buckets_data_path = add_compression_extension(buckets_data_path, compression)
     log.info(
-        f"Writing the bucketing data, corresponding to {sum([len(dp_ids) for dp_ids in bucket_data.values()])} datapoints in {len(bucket_data)} buckets to `{os.path.join(evaluation_buckets_dir, f'{bucketing_id}.json')}`"
+        f"Writing the bucketing data, corresponding to {sum([len(dp_ids) for dp_ids in bucket_data.values()])} datapoints in {len(bucket_data)} buckets to `{buckets_data_path}`"
     )
 
-    buckets_data_path = os.path.join(evaluation_buckets_dir, f"{bucketing_id}.json")
-    with open(buckets_data_path, "w") as f:
+    with open_file(buckets_data_path, "w") as f:
         json.dump(bucket_data, f)
 
 
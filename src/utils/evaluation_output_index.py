@@ -0,0 +1,147 @@
+"""Random access to the evaluation output by problem id.
+
+The index of an evaluation output file is a sidecar (`<file>.index.json`) mapping each id to the position (offset,
+length) of its line, so that the evaluation of a few problems (e.g., the problems of one bucket) is read without parsing
+the rest of the file. The index records the size and the modification time of the file it was built for, and is
+rebuilt when they don't match (e.g., after the file was appended to or replaced).
+
+The positions of a compressed file are in its decompressed content: the lines are still read without being parsed, but
+the file is decompressed up to the last requested line.
+"""
+
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, List, Tuple
+
+from src import utils
+from src.utils.compression import open_binary_file
+
+log = utils.get_pylogger(__name__)
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+
+
+def get_path_to_index(path_to_file: str) -> str:
+    return path_to_file + INDEX_SUFFIX
+
+
+def _get_file_signature(path_to_file: str) -> Dict:
+    stat = os.stat(path_to_file)
+    return {"version": INDEX_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _write_index(path_to_file: str, id2position: Dict[str, Tuple[int, int]]):
+    index = {**_get_file_signature(path_to_file), "positions": id2position}
+
+    path_to_index = get_path_to_index(path_to_file)
+    try:
+        fd, path_to_tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path_to_index)), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f)
+        os.replace(path_to_tmp_file, path_to_index)
+    except OSError as e:
+        # e.g., a read-only directory; the index is then only kept in memory
+        log.warning(f"Could not write the index `{path_to_index}`: {e}")
+
+
+def build_index(path_to_file: str) -> Dict[str, Tuple[int, int]]:
+    """Indexes the (plain or compressed) jsonlines file by the `id` of its items and writes the index next to it."""
+    id2position = {}
+    offset = 0
+    with open_binary_file(path_to_file, "r") as f:
+        for line in f:
+            if line.strip():
+                _id = json.loads(line)["id"]
+                assert _id not in id2position, f"Duplicated id `{_id}` in `{path_to_file}`"
+                id2position[_id] = (offset, len(line))
+            offset += len(line)
+
+    _write_index(path_to_file, id2position)
+    return id2position
+
+
+def write_indexed_jsonlines(path_to_file: str, items: Iterable[Dict]):
+    """Writes the items (plain or compressed, depending on the extension) and their index, in a single pass."""
+    id2position = {}
+    offset = 0
+    with open_binary_file(path_to_file, "w") as f:
+        for item in items:
+            # same serialization as `jsonlines.Writer`
+            line = (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+            f.write(line)
+            id2position[item["id"]] = (offset, len(line))
+            offset += len(line)
+
+    _write_index(path_to_file, id2position)
+
+
+def load_index(path_to_file: str) -> Dict[str, Tuple[int, int]]:
+    """The index of the file, which is (re)built if it is missing or was built for another version of the file."""
+    path_to_index = get_path_to_index(path_to_file)
+    if os.path.isfile(path_to_index):
+        try:
+            with open(path_to_index, "r") as f:
+                index = json.load(f)
+        except ValueError:
+            index = {}
+
+        positions = index.pop("positions", None)
+        if positions is not None and index == _get_file_signature(path_to_file):
+            return positions
+
+        log.info(f"The index `{path_to_index}` is out of date, rebuilding it.")
+
+    return build_index(path_to_file)
+
+
+def _read_exactly(f, num_bytes: int) -> bytes:
+    # the decompressing streams can return fewer bytes than requested
+    chunks = []
+    while num_bytes > 0:
+        chunk = f.read(num_bytes)
+        if not chunk:
+            raise EOFError("Unexpected end of file (the index is out of date?)")
+        chunks.append(chunk)
+        num_bytes -= len(chunk)
+
+    return b"".join(chunks)
+
+
+class IndexedEvaluationOutput:
+    """Reads the evaluation of single problems, or of subsets of the problems, from an evaluation output file."""
+
+    def __init__(self, path_to_file: str):
+        self.path_to_file = path_to_file
+        self.id2position = load_index(path_to_file)
+
+    @property
+    def ids(self) -> List[str]:
+        return sorted(self.id2position)
+
+    def __len__(self):
+        return len(self.id2position)
+
+    def __contains__(self, _id):
+        return _id in self.id2position
+
+    def __getitem__(self, _id) -> Dict:
+        return self.get_items([_id])[0]
+
+    def get_items(self, ids: Iterable[str]) -> List[Dict]:
+        """The evaluation of the problems with the given ids, sorted by id. Raises a KeyError if an id is missing."""
+        ids = sorted(set(ids))
+        missing_ids = [_id for _id in ids if _id not in self.id2position]
+        if missing_ids:
+            raise KeyError(f"{len(missing_ids)} ids are not in `{self.path_to_file}`: {missing_ids[:10]}")
+
+        id2item = {}
+        with open_binary_file(self.path_to_file, "r") as f:
+            # in the order of the file, so that the (compressed) file is read only forward
+            for _id in sorted(ids, key=lambda _id: self.id2position[_id][0]):
+                offset, length = self.id2position[_id]
+                f.seek(offset)
+                id2item[_id] = json.loads(_read_exactly(f, length))
+
+        return [id2item[_id] for _id in ids]
@@ -0,0 +1,115 @@
+"""Sharded evaluation: the problems are partitioned into `num_shards` shards by a stable hash of their id, so that
+independent processes (or machines sharing the filesystem) agree on the partition without coordinating.
+
+Each shard writes its evaluation output to the shards directory, together with a manifest listing the ids assigned to
+it, which is written last and marks the shard as complete. `merge_shards` then produces the canonical (sorted)
+evaluation output, checking that every shard is complete and that no problem is missing or duplicated.
+"""
+
+import hashlib
+import json
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from src import utils
+from src.utils.compression import add_compression_extension
+from src.utils.general_helpers import read_jsonlines, write_jsonlines
+
+log = utils.get_pylogger(__name__)
+
+SHARD_NAME = "evaluation_output.shard-{shard_index:05d}-of-{num_shards:05d}"
+
+
+class ShardMergeError(Exception):
+    """Raised when the shards don't add up to the full evaluation output."""
+
+
+def get_shard_index(_id: str, num_shards: int) -> int:
+    """The shard of a problem. Unlike `hash`, the hash of the id doesn't depend on the process."""
+    digest = hashlib.sha256(str(_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def filter_to_shard(items: Iterable[Dict], shard_index: int, num_shards: int) -> List[Dict]:
+    """The items (with an `id`) that belong to the shard."""
+    assert 0 <= shard_index < num_shards, f"Invalid shard {shard_index} for {num_shards} shards"
+    return [item for item in items if get_shard_index(item["id"], num_shards) == shard_index]
+
+
+def _get_path_to_manifest(shards_dir: str, shard_index: int, num_shards: int) -> str:
+    return os.path.join(shards_dir, SHARD_NAME.format(shard_index=shard_index, num_shards=num_shards) + ".json")
+
+
+def write_shard(shards_dir, shard_index, num_shards, assigned_ids, evaluation_output, compression=None) -> str:
+    """Writes the shard's evaluation output and then its manifest, both atomically. Returns the path to the output."""
+    os.makedirs(shards_dir, exist_ok=True)
+    file_name = add_compression_extension(
+        SHARD_NAME.format(shard_index=shard_index, num_shards=num_shards) + ".jsonl", compression
+    )
+    path_to_output_file = os.path.join(shards_dir, file_name)
+
+    path_to_tmp_file = add_compression_extension(f"{path_to_output_file}.{os.getpid()}.tmp", compression)
+    write_jsonlines(path_to_tmp_file, evaluation_output)
+    os.replace(path_to_tmp_file, path_to_output_file)
+
+    manifest = {
+        "shard_index": shard_index,
+        "num_shards": num_shards,
+        "evaluation_output": file_name,
+        "ids": sorted(assigned_ids),
+    }
+    path_to_manifest = _get_path_to_manifest(shards_dir, shard_index, num_shards)
+    with open(f"{path_to_manifest}.{os.getpid()}.tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(f"{path_to_manifest}.{os.getpid()}.tmp", path_to_manifest)
+
+    log.info(
+        f"[shard {shard_index}/{num_shards}] Wrote the evaluation output of {len(evaluation_output)} problems to "
+        f"`{path_to_output_file}`"
+    )
+    return path_to_output_file
+
+
+def merge_shards(shards_dir: str, num_shards: int, expected_ids: Optional[Iterable[str]] = None) -> List[Dict]:
+    """Merges the evaluation outputs of the shards into the canonical evaluation output (sorted by id). If given, each
+    of the `expected_ids` (e.g., the ids of the predictions) must be in one of the shards."""
+    missing_shards = [
+        shard_index
+        for shard_index in range(num_shards)
+        if not os.path.isfile(_get_path_to_manifest(shards_dir, shard_index, num_shards))
+    ]
+    if missing_shards:
+        raise ShardMergeError(
+            f"{len(missing_shards)} of the {num_shards} shards are not (yet) complete in `{shards_dir}`: "
+            f"{missing_shards}"
+        )
+
+    id2evaluation_output = {}
+    for shard_index in range(num_shards):
+        with open(_get_path_to_manifest(shards_dir, shard_index, num_shards), "r") as f:
+            manifest = json.load(f)
+        evaluation_output = read_jsonlines(os.path.join(shards_dir, manifest["evaluation_output"]))
+
+        ids = [item["id"] for item in evaluation_output]
+        errors = []
+        duplicated_ids = sorted(_id for _id, count in Counter(ids).items() if count > 1 or _id in id2evaluation_output)
+        if duplicated_ids:
+            errors.append(f"duplicated ids: {duplicated_ids[:10]}")
+        missing_ids = sorted(set(manifest["ids"]) - set(ids))
+        if missing_ids:
+            errors.append(f"missing ids: {missing_ids[:10]}")
+        misassigned_ids = sorted(_id for _id in ids if get_shard_index(_id, num_shards) != shard_index)
+        if misassigned_ids:
+            errors.append(f"ids of other shards: {misassigned_ids[:10]}")
+        if errors:
+            raise ShardMergeError(f"[shard {shard_index}/{num_shards}] " + "; ".join(errors))
+
+        id2evaluation_output.update((item["id"], item) for item in evaluation_output)
+
+    missing_ids = sorted(set(expected_ids or []) - set(id2evaluation_output))
+    if missing_ids:
+        raise ShardMergeError(f"{len(missing_ids)} ids are in none of the shards: {missing_ids[:10]}")
+
+    log.info(f"Merged the evaluation output of {len(id2evaluation_output)} problems from {num_shards} shards")
+    return [id2evaluation_output[_id] for _id in sorted(id2evaluation_output)]
@@ -0,0 +1,186 @@
+"""A bounded, namespaced, on-disk cache for the flow runs, which replaces the (unbounded) aiflows cache.
+
+Each flow holds a `cache` object that `Flow.__call__` queries (`get`) before running a flow with `enable_cache` and
+fills (`set`) after running it. `install_flow_cache` replaces that object, in a flow and all of its subflows, with a
+`BoundedFlowCache`, which stores the entries of each namespace (by default, the experiment) in its own directory,
+evicts the least recently used ones beyond a size limit (and, optionally, the ones older than a TTL), and keeps
+hit/miss/byte statistics. In offline mode, a miss raises a `FlowCacheMissError` instead of running the flow, so that
+a run only replays the cached responses.
+
+The cache directory can be inspected (and a namespace cleared) with:
+    python -m src.utils.flow_cache --cache_dir .cc_flows_cache [--clear <namespace>]
+"""
+
+import argparse
+import os
+import pickle
+import shutil
+import threading
+from typing import Any, Dict, List, Optional
+
+from src import utils
+
+log = utils.get_pylogger(__name__)
+
+# the caches created in the current process, whose statistics are logged at the end of the task
+_ACTIVE_CACHES: List["BoundedFlowCache"] = []
+_ACTIVE_CACHES_LOCK = threading.Lock()
+
+
+class FlowCacheMissError(Exception):
+    """Raised, in offline mode, when a flow run is not in the cache."""
+
+
+class BoundedFlowCache:
+    """Drop-in replacement for `aiflows.flow_cache.FlowCache` (`get`, `set`, `pop`, `__len__`), backed by a size-limited
+    `diskcache.Cache` with LRU eviction. The values are pickled once, so that the bytes read and written are known."""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        namespace: str = "default",
+        size_limit_gb: float = 4.0,
+        ttl: Optional[float] = None,
+        offline: bool = False,
+    ):
+        import diskcache
+
+        self.cache_dir = cache_dir
+        self.namespace = namespace
+        self.ttl = ttl
+        self.offline = offline
+
+        self._cache = diskcache.Cache(
+            get_namespace_dir(cache_dir, namespace),
+            size_limit=int(size_limit_gb * 1024**3),
+            eviction_policy="least-recently-used",
+        )
+        self._lock = threading.Lock()
+        self.stats = {"num_hits": 0, "num_misses": 0, "num_sets": 0, "bytes_read": 0, "bytes_written": 0}
+
+    def get(self, key: str) -> Any:
+        serialized_value = self._cache.get(key, default=None, retry=True)
+
+        with self._lock:
+            if serialized_value is None:
+                self.stats["num_misses"] += 1
+            else:
+                self.stats["num_hits"] += 1
+                self.stats["bytes_read"] += len(serialized_value)
+
+        if serialized_value is None:
+            if self.offline:
+                raise FlowCacheMissError(f"[{self.namespace}] The flow run `{key}` is not cached (offline mode)")
+            return None
+
+        return pickle.loads(serialized_value)
+
+    def set(self, key: str, value: Any):
+        serialized_value = pickle.dumps(value)
+        self._cache.set(key, serialized_value, expire=self.ttl, retry=True)
+
+        with self._lock:
+            self.stats["num_sets"] += 1
+            self.stats["bytes_written"] += len(serialized_value)
+
+    def pop(self, key: str):
+        serialized_value = self._cache.pop(key, default=None, retry=True)
+        return None if serialized_value is None else pickle.loads(serialized_value)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        num_lookups = stats["num_hits"] + stats["num_misses"]
+        stats["hit_rate"] = stats["num_hits"] / num_lookups if num_lookups > 0 else 0.0
+        stats["num_entries"] = len(self._cache)
+        stats["volume"] = self._cache.volume()
+        return stats
+
+    def log_stats(self):
+        stats = self.get_stats()
+        log.info(
+            f"[flow cache: {self.namespace}] hit rate: {stats['hit_rate']:.1%} "
+            f"({stats['num_hits']} hits, {stats['num_misses']} misses), "
+            f"read: {format_bytes(stats['bytes_read'])}, written: {format_bytes(stats['bytes_written'])} "
+            f"({stats['num_sets']} entries); {stats['num_entries']} entries ({format_bytes(stats['volume'])}) in "
+            f"`{get_namespace_dir(self.cache_dir, self.namespace)}`"
+        )
+
+    def close(self):
+        self._cache.close()
+
+
+def get_namespace_dir(cache_dir: str, namespace: str) -> str:
+    return os.path.join(cache_dir, namespace.replace(os.sep, "_"))
+
+
+def format_bytes(num_bytes: float) -> str:
+    for unit in ["B", "KB", "MB"]:
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f}{unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f}GB"
+
+
+def get_flow_cache(cache_dir: str, namespace: str = "default", **kwargs) -> BoundedFlowCache:
+    """Returns the cache of the namespace, created on the first call (all the flow instances of a run share it)."""
+    with _ACTIVE_CACHES_LOCK:
+        for cache in _ACTIVE_CACHES:
+            if cache.cache_dir == cache_dir and cache.namespace == namespace:
+                return cache
+
+        cache = BoundedFlowCache(cache_dir, namespace=namespace, **kwargs)
+        _ACTIVE_CACHES.append(cache)
+        log.info(
+            f"[flow cache: {namespace}] Using `{get_namespace_dir(cache_dir, namespace)}` "
+            f"({'offline, replay only' if cache.offline else 'online'}), holding {len(cache)} entries"
+        )
+        return cache
+
+
+def install_flow_cache(flow, cache: BoundedFlowCache) -> List[str]:
+    """Makes the flow and all of its subflows use the given cache. Returns the names of the flows that use it (i.e.,
+    that have `enable_cache`)."""
+    flow.cache = cache
+
+    cached_flows = [flow.flow_config["name"]] if flow.flow_config.get("enable_cache", False) else []
+    for subflow in getattr(flow, "subflows", {}).values():
+        cached_flows += install_flow_cache(subflow, cache)
+
+    return cached_flows
+
+
+def log_flow_cache_stats():
+    with _ACTIVE_CACHES_LOCK:
+        caches = list(_ACTIVE_CACHES)
+
+    for cache in caches:
+        cache.log_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lists the namespaces of a flow cache directory, or clears one.")
+    parser.add_argument("--cache_dir", type=str, default=".cc_flows_cache")
+    parser.add_argument("--clear", type=str, default=None, help="The namespace to clear.")
+    args = parser.parse_args()
+
+    if args.clear is not None:
+        namespace_dir = get_namespace_dir(args.cache_dir, args.clear)
+        assert os.path.isdir(namespace_dir), f"No namespace `{args.clear}` in `{args.cache_dir}`"
+        shutil.rmtree(namespace_dir)
+        print(f"Cleared `{namespace_dir}`")
+        return
+
+    import diskcache
+
+    print(f"{'namespace':<80}{'entries':>10}{'size':>12}")
+    for namespace in sorted(os.listdir(args.cache_dir)):
+        with diskcache.Cache(os.path.join(args.cache_dir, namespace)) as cache:
+            print(f"{namespace:<80}{len(cache):>10}{format_bytes(cache.volume()):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,20 +8,26 @@ import warnings
 import time
 import uuid
 import os
+import random
+import sys
 
 from dataclasses import is_dataclass
-from typing import Callable, List
+from typing import TYPE_CHECKING, Callable, List
 
 from omegaconf import DictConfig, OmegaConf
-from pytorch_lightning.loggers import Logger
-from pytorch_lightning.utilities import rank_zero_only
 
 from pathlib import Path
 from src import utils
 from src.utils import rich_utils
+from src.utils.compression import find_file, open_file
+from src.utils.rank_zero import rank_zero_only
 from importlib.util import find_spec
 from copy import deepcopy
 
+if TYPE_CHECKING:
+    # Lightning (and torch) are only imported when a logger is instantiated
+    from pytorch_lightning.loggers import Logger
+
 log = utils.get_pylogger(__name__)
 
 
@@ -43,6 +49,7 @@ def run_task(cfg: DictConfig, run_func: Callable, upload_predictions=False) -> N
             upload_predictions_to_wandb(
                 base_path=cfg.output_dir, predictions_dir=get_predictions_dir_path(cfg.output_dir)
             )
+            publish_run_to_artifact_store(cfg)
 
         current_time_stamp = f"{time.strftime('%Y-%m-%d-%H-%M-%S', time.localtime())}"
         path = Path(cfg.output_dir, f"exec_time_{current_time_stamp}.log")
@@ -53,10 +60,34 @@ def run_task(cfg: DictConfig, run_func: Callable, upload_predictions=False) -> N
         )
         log.info(content)
         save_string_to_file(path, content)  # save task execution time (even if exception occurs)
+        log_flow_cache_stats()
         close_loggers()  # close loggers (even if exception occurs so multirun won't fail)
         log.info(f"Output directory: `{os.path.join(cfg.work_dir, cfg.output_dir)}`")
 
 
+def log_flow_cache_stats():
+    """Logs the statistics of the flow caches used by the task (if any)."""
+    if "src.utils.flow_cache" in sys.modules:
+        sys.modules["src.utils.flow_cache"].log_flow_cache_stats()
+
+
+def seed_everything(seed: int) -> int:
+    """Seeds the random number generators of Python, NumPy and (only if it is already imported) PyTorch.
+
+    Equivalent to `pl.seed_everything` for the entry points that never use torch, without importing it.
+    """
+    import numpy as np
+
+    log.info(f"Global seed set to {seed}")
+    os.environ["PL_GLOBAL_SEED"] = str(seed)
+    random.seed(seed)
+    np.random.seed(seed)
+    if "torch" in sys.modules:
+        sys.modules["torch"].manual_seed(seed)
+
+    return seed
+
+
 def extras(cfg: DictConfig) -> None:
     """Applies optional utilities before the task is started.
     Utilities:
@@ -125,14 +156,15 @@ def write_outputs(output_file, summary, mode):
 
 
 def read_jsonlines(path_to_file):
-    with open(path_to_file, "r") as f:
+    # plain or compressed (see `src.utils.compression`), depending on the extension
+    with open_file(path_to_file, "r") as f:
         json_reader = jsonlines.Reader(f)
         return list(json_reader)
 
 
 def write_jsonlines(path_to_file, data, mode="w"):
-    with jsonlines.open(path_to_file, mode) as writer:
-        writer.write_all(data)
+    with open_file(path_to_file, mode) as f:
+        jsonlines.Writer(f).write_all(data)
 
 
 def write_gzipped_jsonlines(path_to_file, data, mode="w"):
@@ -160,9 +192,9 @@ def recursive_dictionary_update(d, u):
     return d
 
 
-def instantiate_loggers(logger_cfg: DictConfig) -> List[Logger]:
+def instantiate_loggers(logger_cfg: DictConfig) -> List["Logger"]:
     """Instantiates loggers from config."""
-    logger: List[Logger] = []
+    logger: List["Logger"] = []
 
     if not logger_cfg:
         log.warning("Logger config is empty.")
@@ -214,17 +246,23 @@ def save_string_to_file(path: str, content: str, append_mode=True) -> None:
         file.write(content)
 
 
+def get_config_to_log(hydra_config) -> dict:
+    """The (sanitized and resolved) config that is logged as the run's `hydra_config`."""
+    hparams_to_log = OmegaConf.to_container(sanitize_config(hydra_config), resolve=True)
+    if "local" in hparams_to_log:
+        del hparams_to_log["local"]
+
+    return hparams_to_log
+
+
 @rank_zero_only
 def log_hyperparameters(hydra_config, model, loggers) -> None:
     hparams = {}
-    sanitized_config = sanitize_config(hydra_config)
     if not loggers:
         log.warning("Logger not found! Skipping hyperparameter logging...")
         return
 
-    hparams_to_log = OmegaConf.to_container(sanitized_config, resolve=True)
-    if "local" in hparams_to_log:
-        del hparams_to_log["local"]
+    hparams_to_log = get_config_to_log(hydra_config)
 
     for key in hparams:
         if isinstance(hparams[key], DictConfig):
@@ -236,19 +274,49 @@ def log_hyperparameters(hydra_config, model, loggers) -> None:
         lg.log_hyperparams(hparams)
 
 
+def _get_wandb_run():
+    # a W&B run can only be active if the logger imported wandb (which is not imported otherwise, e.g., offline)
+    return sys.modules["wandb"].run if "wandb" in sys.modules else None
+
+
 @rank_zero_only
 def upload_predictions_to_wandb(base_path, predictions_dir):
-    import wandb
-
-    if wandb.run:
-        wandb.save(f"{predictions_dir}/*", base_path=base_path, policy="now")
+    if _get_wandb_run():
+        sys.modules["wandb"].save(f"{predictions_dir}/*", base_path=base_path, policy="now")
 
 
 def upload_file_to_wandb(base_path, path_to_file):
-    import wandb
+    if _get_wandb_run():
+        sys.modules["wandb"].save(path_to_file, base_path=base_path, policy="now")
+
+
+@rank_zero_only
+def publish_run_to_artifact_store(cfg: DictConfig, extra_files=("evaluation_output.jsonl", "flow_calls.jsonl")):
+    """Publishes the run's config, predictions and `extra_files` (if they exist) to a local artifact store, under the
+    path of the W&B run, if one is active, and under `local/<run_name>/<output dir name>` otherwise."""
+    from src.utils.artifact_store import LOCAL_RUN_PREFIX, LocalArtifactStore
+
+    if cfg.get("artifact_store") is None or cfg.artifact_store.get("root_dir") is None:
+        return  # the W&B store, to which the files are uploaded by the logger
+
+    wandb_run = _get_wandb_run()
+    if wandb_run:
+        run_path = wandb_run.path
+    else:
+        run_path = f"{LOCAL_RUN_PREFIX}/{cfg.run_name}/{os.path.basename(os.path.normpath(cfg.output_dir))}"
+
+    store = hydra.utils.instantiate(cfg.artifact_store)
+    assert isinstance(store, LocalArtifactStore)
+    run = store.create_run(run_path, config={"hydra_config": get_config_to_log(cfg)})
+
+    predictions_dir = get_predictions_dir_path(cfg.output_dir)
+    paths_to_files = [os.path.join(predictions_dir, file_name) for file_name in sorted(os.listdir(predictions_dir))]
+    paths_to_files += [find_file(os.path.join(cfg.output_dir, file_name)) for file_name in extra_files]
+    for path_to_file in paths_to_files:
+        if path_to_file is not None and os.path.isfile(path_to_file):
+            run.upload_file(path_to_file, root=cfg.output_dir)
 
-    if wandb.run:
-        wandb.save(path_to_file, base_path=base_path, policy="now")
+    log.info(f"Published the run to the artifact store `{store.root_dir}` as `{run_path}`")
 
 
 def create_unique_id(existing_ids=set()):
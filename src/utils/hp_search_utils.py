@@ -1,9 +1,14 @@
 import json
 import os
+import sqlite3
+from contextlib import closing
 
 from pathlib import Path
 from omegaconf import OmegaConf, DictConfig
 
+# The registry of the runs of a sweep, kept in the sweep's parent directory
+RUN_REGISTRY_FILENAME = ".run_registry.sqlite"
+
 
 def is_config_compatible(config: DictConfig, dict_to_compare: dict):
     for key, value in dict_to_compare.items():
@@ -13,70 +18,191 @@ def is_config_compatible(config: DictConfig, dict_to_compare: dict):
     return True
 
 
+class RunRegistry:
+    """
+    A persistent index (SQLite) of the runs under a sweep's parent directory (`parent/run_idx/experiment`), holding
+    each run's path, config and files, so that the run directories don't have to be rescanned (and the configs
+    re-parsed) each time the sweep's results are gathered.
+
+    `refresh` updates the registry incrementally, and is called before each query (by `existing_configs` and
+    `gather_results`), so the runs don't need to register themselves: the run directories are only stat-ed, and only
+    the runs whose directory or config changed since they were registered (e.g., a run that finished and wrote its
+    result file) are re-read, and the removed runs are dropped.
+    """
+
+    def __init__(self, parent_directory: str, registry_path: str = None):
+        self.parent_directory = os.path.abspath(parent_directory)
+        self.registry_path = registry_path or os.path.join(self.parent_directory, RUN_REGISTRY_FILENAME)
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "experiment_path TEXT PRIMARY KEY, dir_mtime_ns INTEGER, config_mtime_ns INTEGER, "
+                "config TEXT, files TEXT)"
+            )
+
+    def _connect(self):
+        # several processes can refresh the registry concurrently
+        return sqlite3.connect(self.registry_path, timeout=60)
+
+    @staticmethod
+    def _get_mtimes(experiment_path: str):
+        config_path = os.path.join(experiment_path, '.hydra', 'config.yaml')
+        if not os.path.isfile(config_path):
+            return None
+        return os.stat(experiment_path).st_mtime_ns, os.stat(config_path).st_mtime_ns
+
+    def _list_experiment_paths(self):
+        experiment_paths = []
+        for run_directory in os.listdir(self.parent_directory):  # over 0,1,2,3
+            run_path = os.path.join(self.parent_directory, run_directory)  # abs path to parent/run_idx/
+            if not os.path.isdir(run_path):
+                continue
+
+            for experiment_directory in os.listdir(run_path):
+                experiment_path = os.path.join(run_path, experiment_directory)
+                if os.path.isdir(experiment_path):
+                    experiment_paths.append(experiment_path)
+        return experiment_paths
+
+    def _update_run(self, connection, experiment_path: str, mtimes):
+        """(Re-)registers a run."""
+        config = OmegaConf.to_container(
+            OmegaConf.load(os.path.join(experiment_path, '.hydra', 'config.yaml')), resolve=False
+        )
+        row = (experiment_path, *mtimes, json.dumps(config), json.dumps(sorted(os.listdir(experiment_path))))
+        connection.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)", row)
+
+    def refresh(self):
+        """Registers the new and the changed runs, and drops the runs that no longer exist."""
+        with closing(self._connect()) as connection, connection:
+            path2mtimes = {
+                experiment_path: (dir_mtime_ns, config_mtime_ns)
+                for experiment_path, dir_mtime_ns, config_mtime_ns in connection.execute(
+                    "SELECT experiment_path, dir_mtime_ns, config_mtime_ns FROM runs"
+                )
+            }
+
+            experiment_paths = self._list_experiment_paths()
+            for experiment_path in experiment_paths:
+                mtimes = self._get_mtimes(experiment_path)
+                if mtimes is None:
+                    # the run hasn't written its config (yet)
+                    continue
+                if path2mtimes.get(experiment_path) != mtimes:
+                    self._update_run(connection, experiment_path, mtimes)
+
+            removed_paths = set(path2mtimes) - set(experiment_paths)
+            connection.executemany("DELETE FROM runs WHERE experiment_path = ?", [(path,) for path in removed_paths])
+
+    def query(self, target_result_filename: str = None, filters: dict = None, keys: list = None):
+        """
+        Returns the registered runs that have the result file (if given) and whose config matches the `filters` (a dict
+        of config key -> value, see `is_config_compatible`), as [{'experiment_path', 'config'}], or as
+        [{'experiment_path', 'values'}] with the values of the config `keys` if they are given (which is much faster,
+        as the configs are then not loaded into OmegaConf).
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute("SELECT experiment_path, config, files FROM runs ORDER BY experiment_path")
+            rows = rows.fetchall()
+
+        runs = []
+        for experiment_path, config, files in rows:
+            if target_result_filename is not None:
+                if os.path.dirname(target_result_filename):
+                    # the registry only lists the files at the top of the run directory
+                    has_result_file = os.path.exists(os.path.join(experiment_path, target_result_filename))
+                else:
+                    has_result_file = target_result_filename in json.loads(files)
+                if not has_result_file:
+                    continue
+
+            config = json.loads(config)
+            if filters is not None and any(select_value(config, key) != value for key, value in filters.items()):
+                continue
+
+            if keys is None:
+                runs.append({'experiment_path': experiment_path, 'config': OmegaConf.create(config)})
+            else:
+                runs.append({'experiment_path': experiment_path,
+                             'values': {key: select_value(config, key) for key in keys}})
+        return runs
+
+
+def select_value(config: dict, key: str):
+    """
+    Same as `OmegaConf.select(OmegaConf.create(config), key)` (with the `+` of the key dropped), but without creating
+    the OmegaConf config unless the value is an interpolation.
+    """
+    key = key.replace("+", "")
+    value = config
+    for key_part in key.split('.'):
+        if isinstance(value, dict) and key_part in value:
+            value = value[key_part]
+        elif isinstance(value, list) and key_part.isdigit() and int(key_part) < len(value):
+            value = value[int(key_part)]
+        elif isinstance(value, str) and "${" in value:
+            # the value is inside of an interpolated node
+            break
+        else:
+            return None
+
+    if value == "???" or "${" in (value if isinstance(value, str) else json.dumps(value)):
+        value = OmegaConf.select(OmegaConf.create(config), key)
+        return OmegaConf.to_object(value) if OmegaConf.is_config(value) else value
+    return value
+
+
 def existing_configs(directory: str,
                      return_result_paths: bool = False,
-                     target_result_filename: str = "predictions.jsonl"):
+                     target_result_filename: str = "predictions.jsonl",
+                     filters: dict = None):
     """
-    Goes recursively inside the `directory` folder and searches for existing runs by checking hydra configs
-    and checking whether the runs have a result file with the expected name.
+    Searches for the existing runs next to the `directory` folder (in its parent's `run_idx/experiment` folders)
+    that have a result file with the expected name. The runs are read from the parent's `RunRegistry`, which is
+    refreshed first.
 
     Args:
         directory: the log directory under which to search for existing configs and results.
         return_result_paths: whether to return the file path of the result files as well as the configs.
         target_result_filename: the expected name of the results file, if it exists.
+        filters: if given, only the runs whose config matches these config key -> value pairs are returned.
 
     Returns: a list of dictionaries [{'config', 'result_file'}] if return_result_paths=True
     and [{'config'}] if return_result_paths=False
 
     """
-    parent_directory = Path(directory).parent
+    registry = RunRegistry(Path(directory).parent)
+    registry.refresh()
 
     configs = []
-
-    for run_directory in os.listdir(parent_directory):  # over 0,1,2,3
-        run_path = os.path.join(parent_directory, run_directory)  # abs path to parent/run_idx/
-        if not os.path.isdir(run_path):
-            continue
-
-        for experiment_directory in os.listdir(run_path):
-            experiment_path = os.path.join(run_path, experiment_directory)
-            if not os.path.isdir(experiment_path):
-                continue
-
-            # Skip unsuccessful runs if required
-            result_file = os.path.join(experiment_path, target_result_filename)
-            if not os.path.exists(result_file):
-                continue
-
-            conf = OmegaConf.load(os.path.join(experiment_path, '.hydra', 'config.yaml'))
-            dict_res = {'config': conf}
-            if return_result_paths:
-                dict_res['result_file'] = result_file
-            configs.append(dict_res)
+    for run in registry.query(target_result_filename=target_result_filename, filters=filters):
+        dict_res = {'config': run['config']}
+        if return_result_paths:
+            dict_res['result_file'] = os.path.join(run['experiment_path'], target_result_filename)
+        configs.append(dict_res)
     return configs
 
 def gather_results(hydra_config: DictConfig):
     output_fp = hydra_config.output_dir
     hp_name = hydra_config.parent_run_name
-    results = existing_configs(output_fp, return_result_paths=True)
+    target_result_filename = "predictions.jsonl"
     results_fp = os.path.join(str(Path(output_fp).parent), f"{hp_name}_results.json")
 
     search_space = OmegaConf.to_object(hydra_config.search.search_space)
     keys_to_log = []
     for search_param in search_space:
         # cleaning the parameter names to be easily readable
-        keys_to_log.extend(search_param.keys())
+        keys_to_log.extend(key.replace("+", "") for key in search_param.keys())
+
+    registry = RunRegistry(Path(output_fp).parent)
+    registry.refresh()
+    results = registry.query(target_result_filename=target_result_filename, keys=keys_to_log)
 
     results_json = []
     for result in results:
-        conf = result['config']
-        keys_values = {}
-        for key in keys_to_log:
-            key = key.replace("+", "")
-            keys_values[key] = OmegaConf.select(conf, key)
-
-        relative_run_path = os.path.relpath(result['result_file'], Path(output_fp).parent)
-        results_json.append({'param_config': keys_values,
+        result_file = os.path.join(result['experiment_path'], target_result_filename)
+        relative_run_path = os.path.relpath(result_file, Path(output_fp).parent)
+        results_json.append({'param_config': result['values'],
                              'result_filepath': relative_run_path})
 
     with open(results_fp, 'w') as writer:
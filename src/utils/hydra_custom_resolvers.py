@@ -61,6 +61,25 @@ def get_wandb_run_name(wandb_run_path, api_key):
     return run.config["hydra_config/run_name"]
 
 
+def get_run_name(run_path, artifact_store_root_dir, api_key):
+    """The name of the run in the local artifact store, if it is there, and of the W&B run otherwise."""
+    from src.utils.artifact_store import get_local_run_name
+
+    local_run_name = get_local_run_name(artifact_store_root_dir, run_path)
+    if local_run_name is not None:
+        return local_run_name
+
+    return get_wandb_run_name(run_path, api_key)
+
+
+def get_shard_suffix(shard_index, num_shards, merge):
+    """The suffix of the run name of a shard of a sharded evaluation (empty if the evaluation is not sharded)."""
+    if int(num_shards) <= 1 or merge:
+        return ""
+
+    return f"--shard-{shard_index}-of-{num_shards}"
+
+
 def to_string(arg):
     return str(arg)
 
@@ -79,4 +98,6 @@ OmegaConf.register_new_resolver("floor_div", floor_division)
 OmegaConf.register_new_resolver("max", max_args)
 
 OmegaConf.register_new_resolver("get_wandb_run_name", get_wandb_run_name)
+OmegaConf.register_new_resolver("get_run_name", get_run_name)
+OmegaConf.register_new_resolver("shard_suffix", get_shard_suffix)
 OmegaConf.register_new_resolver("to_string", to_string)
@@ -0,0 +1,132 @@
+import json
+import os
+from typing import Dict, Iterable, List, Set, Tuple
+
+from src import utils
+from src.utils.compression import compress_file, get_compression, has_extension, open_file
+from src.utils.general_helpers import get_predictions_dir_path, write_jsonlines
+
+log = utils.get_pylogger(__name__)
+
+# The key under which a sample carries the outputs of the independent samples completed in a previous run
+RESUMED_OUTPUTS_KEY = "_resumed_outputs"
+# The shard (in the new run's predictions directory) holding the predictions carried over from the previous run
+RESUMED_PREDICTIONS_FILE = "predictions_resumed.jsonl"
+# The key under which a prediction records how its independent samples were drawn (see `SampleBudgetPolicy`)
+SAMPLE_BUDGET_KEY = "sample_budget"
+
+
+def _get_completed_outputs(prediction: Dict) -> Dict[str, List]:
+    """Returns the outputs of the independent samples that completed successfully.
+
+    The independent samples are run in order, and the first failure stops the datapoint's inference,
+    so all the outputs except the last one (that of the failed sample) are successful.
+    """
+    num_completed = len(prediction["inference_outputs"])
+    if prediction.get("error") is not None:
+        num_completed -= 1
+
+    completed_outputs = {
+        "inference_outputs": prediction["inference_outputs"][:num_completed],
+        "human_readable_outputs": prediction.get("human_readable_outputs", [])[:num_completed],
+    }
+    if prediction.get("error") is None and prediction.get(SAMPLE_BUDGET_KEY, {}).get("stop_reason") is not None:
+        # the sampling was stopped early by the sample budget policy, so the prediction is complete
+        completed_outputs[SAMPLE_BUDGET_KEY] = prediction[SAMPLE_BUDGET_KEY]
+
+    return completed_outputs
+
+
+def read_completed_outputs(predictions_dir: str) -> Dict[str, Dict[str, List]]:
+    """Scans the prediction shards and returns the completed outputs for each datapoint id.
+    If a datapoint appears more than once, the prediction with the most completed samples is kept."""
+    id2completed_outputs = {}
+
+    for filename in sorted(os.listdir(predictions_dir)):
+        if not has_extension(filename, ".jsonl"):
+            continue
+
+        input_file_path = os.path.join(predictions_dir, filename)
+        with open_file(input_file_path, "r") as fp:
+            for idx, line in enumerate(fp):
+                try:
+                    prediction = json.loads(line)
+                except json.decoder.JSONDecodeError:
+                    # the last line of a shard might have been partially written if the run crashed
+                    log.error(f"Failed to decode line {idx} in file {input_file_path}")
+                    continue
+
+                completed_outputs = _get_completed_outputs(prediction)
+                previous = id2completed_outputs.get(prediction["id"], None)
+                if previous is None or len(completed_outputs["inference_outputs"]) > len(previous["inference_outputs"]):
+                    id2completed_outputs[prediction["id"]] = completed_outputs
+
+    return id2completed_outputs
+
+
+def resume_predictions(
+    experiment_path_to_continue: str, output_dir: str, n_independent_samples: int
+) -> Tuple[Set[str], Dict[str, Dict[str, List]]]:
+    """Carries over the predictions of a previous run that completed all the independent samples to the
+    `RESUMED_PREDICTIONS_FILE` shard in the output directory (the previous run's directory is left untouched).
+
+    Returns the ids of the completed datapoints, and the completed outputs of the datapoints that are only partially
+    completed (for which only the missing independent samples have to be run).
+    """
+    predictions_dir = get_predictions_dir_path(experiment_path_to_continue, create_if_not_exists=False)
+    if not os.path.isdir(predictions_dir):
+        # the path to the predictions directory itself was given
+        predictions_dir = experiment_path_to_continue
+
+    id2completed_outputs = read_completed_outputs(predictions_dir)
+
+    completed_predictions = []
+    id2partial_outputs = {}
+    for _id, completed_outputs in sorted(id2completed_outputs.items()):
+        num_completed = len(completed_outputs["inference_outputs"])
+        if num_completed >= n_independent_samples or SAMPLE_BUDGET_KEY in completed_outputs:
+            completed_prediction = {
+                "id": _id,
+                "inference_outputs": completed_outputs["inference_outputs"][:n_independent_samples],
+                "human_readable_outputs": completed_outputs["human_readable_outputs"][:n_independent_samples],
+                "error": None,
+            }
+            if SAMPLE_BUDGET_KEY in completed_outputs:
+                completed_prediction[SAMPLE_BUDGET_KEY] = completed_outputs[SAMPLE_BUDGET_KEY]
+            completed_predictions.append(completed_prediction)
+        elif num_completed > 0:
+            id2partial_outputs[_id] = completed_outputs
+
+    write_jsonlines(os.path.join(get_predictions_dir_path(output_dir), RESUMED_PREDICTIONS_FILE), completed_predictions)
+    log.info(
+        f"Resuming from `{predictions_dir}`: {len(completed_predictions)} datapoints are completed and "
+        f"{len(id2partial_outputs)} are partially completed (out of the {len(id2completed_outputs)} found)."
+    )
+
+    return {prediction["id"] for prediction in completed_predictions}, id2partial_outputs
+
+
+def get_samples_to_run(samples: Iterable[Dict], completed_ids, id2partial_outputs) -> Iterable[Dict]:
+    """Skips the completed datapoints and attaches the completed outputs to the partially completed ones."""
+    for sample in samples:
+        if sample["id"] in completed_ids:
+            continue
+
+        if sample["id"] in id2partial_outputs:
+            sample[RESUMED_OUTPUTS_KEY] = id2partial_outputs[sample["id"]]
+
+        yield sample
+
+
+def compress_predictions(output_dir: str, compression: str) -> List[str]:
+    """Compresses the (plain) prediction shards of the output directory, which are appended to line by line during the
+    inference, and returns the paths to the compressed shards."""
+    predictions_dir = get_predictions_dir_path(output_dir, create_if_not_exists=False)
+    if not os.path.isdir(predictions_dir):
+        return []
+
+    return [
+        compress_file(os.path.join(predictions_dir, filename), compression)
+        for filename in sorted(os.listdir(predictions_dir))
+        if has_extension(filename, ".jsonl") and get_compression(filename) is None
+    ]
@@ -1,7 +1,7 @@
 import logging
 import sys
 
-from pytorch_lightning.utilities import rank_zero_only
+from src.utils.rank_zero import rank_zero_only
 
 
 def get_pylogger(name=__name__, stdout=False) -> logging.Logger:
@@ -0,0 +1,26 @@
+import os
+from functools import wraps
+
+
+def _get_rank() -> int:
+    # the environment variables checked by Lightning, in the same order
+    for key in ("RANK", "LOCAL_RANK", "SLURM_PROCID", "JSM_NAMESPACE_RANK"):
+        rank = os.environ.get(key)
+        if rank is not None:
+            return int(rank)
+    return 0
+
+
+def rank_zero_only(fn):
+    """Calls the function only on the process with rank zero (same as Lightning's, without importing torch)."""
+
+    @wraps(fn)
+    def wrapped_fn(*args, **kwargs):
+        if rank_zero_only.rank == 0:
+            return fn(*args, **kwargs)
+        return None
+
+    return wrapped_fn
+
+
+rank_zero_only.rank = _get_rank()
@@ -1,12 +1,8 @@
 import time
 from pathlib import Path
 
-import rich
-import rich.syntax
-import rich.tree
-
 from omegaconf import DictConfig, OmegaConf
-from pytorch_lightning.utilities import rank_zero_only
+from src.utils.rank_zero import rank_zero_only
 from typing import Sequence
 
 from src.utils import pylogger
@@ -36,6 +32,10 @@ def print_config_tree(
         resolve (bool, optional): Whether to resolve reference fields of DictConfig.
         save_to_file (bool, optional): Whether to export config to the hydra output folder.
     """
+    # imported here, as rich (and pygments) are only needed when the config is printed
+    import rich
+    import rich.syntax
+    import rich.tree
     
     sanitized_config = sanitize_config(deepcopy(cfg))
         
@@ -0,0 +1,32 @@
+import threading
+
+import pytest
+
+from benchmarks.mock_llm_server import create_server
+
+
+@pytest.fixture
+def mock_llm_server():
+    """Starts a mock LLM server (see `benchmarks.mock_llm_server`) on a free port; returns the server and its api_base."""
+    servers = []
+
+    def _start(**kwargs):
+        server = create_server(port=0, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    yield _start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def flow_cache_dir(tmp_path, monkeypatch):
+    """Keeps the cache of the flows constructed in the test out of the working directory."""
+    from aiflows.flow_cache import CACHING_PARAMETERS
+
+    monkeypatch.setattr(CACHING_PARAMETERS, "cache_dir", str(tmp_path / ".flow_cache"))
+    return CACHING_PARAMETERS.cache_dir
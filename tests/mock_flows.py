@@ -0,0 +1,77 @@
+import contextlib
+import copy
+import glob
+import json
+import os
+import threading
+from collections import defaultdict
+
+from aiflows.backends.api_info import ApiInfo
+from aiflows.backends.llm_lite import LiteLLMBackend
+from aiflows.base_flows import AtomicFlow, Flow
+
+from src.launchers import FlowPool
+
+
+def get_flow_config(name):
+    flow_config = copy.deepcopy(Flow._Flow__default_flow_config)
+    flow_config.update(name=name, description=f"The {name} flow used in the tests.")
+    return flow_config
+
+
+class ConcurrencyTracker:
+    """Tracks the number of requests in flight per API key, as seen by the flows (the server's count also includes the
+    requests whose response was sent, but that are not yet marked as done)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = defaultdict(int)
+        self.max_in_flight = defaultdict(int)
+
+    @contextlib.contextmanager
+    def track(self, api_key):
+        with self._lock:
+            self.in_flight[api_key] += 1
+            self.max_in_flight[api_key] = max(self.max_in_flight[api_key], self.in_flight[api_key])
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight[api_key] -= 1
+
+
+class MockCodeFlow(AtomicFlow):
+    """Queries the (mock) LLM with the id of the problem, and returns the content of the answer as the solution."""
+
+    def __init__(self, api_info: ApiInfo, tracker: ConcurrencyTracker = None, **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = api_info.api_key
+        self.tracker = tracker or ConcurrencyTracker()
+        self.backend = LiteLLMBackend(api_infos=[api_info], model_name="gpt-3.5-turbo", wait_time_per_key=0)
+
+    def run(self, input_data):
+        with self.tracker.track(self.api_key):
+            messages = self.backend(messages=[{"role": "user", "content": f"Solve problem {input_data['id']}"}])
+        return {"id": input_data["id"], "code": messages[0]["content"]}
+
+
+def get_flow_pool(api_base, api_key, max_size, tracker=None):
+    api_info = ApiInfo(backend_used="openai", api_key=api_key, api_base=api_base)
+
+    def _factory():
+        flow = MockCodeFlow(api_info=api_info, tracker=tracker, flow_config=get_flow_config("MockCodeFlow"))
+        return {"flow": flow, "input_interface": None, "output_interface": None}
+
+    return FlowPool(_factory, max_size=max_size, name=api_key)
+
+
+def read_predictions(output_dir):
+    """Returns id -> (human readable outputs, error) for the predictions written to `output_dir`."""
+    id2prediction = {}
+    for path in glob.glob(os.path.join(output_dir, "predictions", "predictions_*.jsonl")):
+        with open(path) as f:
+            for line in f:
+                prediction = json.loads(line)
+                assert prediction["id"] not in id2prediction, f"Duplicated prediction for `{prediction['id']}`"
+                id2prediction[prediction["id"]] = (prediction["human_readable_outputs"], prediction["error"])
+    return id2prediction
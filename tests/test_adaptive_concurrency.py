@@ -0,0 +1,110 @@
+import json
+
+import pytest
+from aiflows.backends import llm_lite
+from aiflows.base_flows import Flow
+
+from src.launchers import AsyncFlowLauncher
+from src.launchers.call_instrumentation import CallInstrumentation, get_active_instrumentation
+from tests.mock_flows import get_flow_pool, read_predictions
+
+pytestmark = pytest.mark.usefixtures("flow_cache_dir")
+
+NUM_PROBLEMS = 24
+KEYS = ["key_1", "key_2"]
+MAX_IN_FLIGHT_PER_KEY = 6
+
+
+def _get_patched_functions():
+    return Flow.__call__, llm_lite.LiteLLMBackend.__call__, llm_lite.completion
+
+
+def _get_launcher(output_dir, **adaptive_concurrency):
+    return AsyncFlowLauncher(
+        n_independent_samples=2,
+        fault_tolerant_mode=False,
+        n_batch_retries=1,
+        wait_time_between_retries=0,
+        output_dir=output_dir,
+        max_in_flight=2 * MAX_IN_FLIGHT_PER_KEY,
+        max_in_flight_per_key=MAX_IN_FLIGHT_PER_KEY,
+        instrument_flow_calls=True,
+        adaptive_concurrency={
+            "enabled": True,
+            "base_delay": 0.01,
+            "max_delay": 0.05,
+            "seed": 0,
+            **adaptive_concurrency,
+        },
+    )
+
+
+def _run(launcher, api_base):
+    key2flow_pool = {key: get_flow_pool(api_base, key, max_size=MAX_IN_FLIGHT_PER_KEY) for key in KEYS}
+    launcher.predict_dataloader(({"id": f"problem_{idx}"} for idx in range(NUM_PROBLEMS)), key2flow_pool)
+
+
+def test_adaptive_concurrency_retries_the_rate_limited_requests(tmp_path, mock_llm_server):
+    # the server accepts 2 concurrent requests per key, while the flow pools allow 6
+    server, api_base = mock_llm_server(
+        latency=0.05,
+        latency_jitter=0.02,
+        capacity_per_key=2,
+        rate_limit_probability=0.05,
+        latency_spike_probability=0.1,
+        latency_spike=0.3,
+        seed=0,
+    )
+    original_functions = _get_patched_functions()
+
+    # with an additive increase of 0.1, the (at most 2 * NUM_PROBLEMS) successful requests of a key can't raise its
+    # limit back to MAX_IN_FLIGHT_PER_KEY after a 429 halved it, whatever the timing of the requests
+    launcher = _get_launcher(str(tmp_path), initial_limit=MAX_IN_FLIGHT_PER_KEY, additive_increase=0.1, max_retries=50)
+    _run(launcher, api_base)
+
+    # all the datapoints succeeded, as the rate-limited requests (and only those) were retried
+    predictions = read_predictions(str(tmp_path))
+    assert len(predictions) == NUM_PROBLEMS
+    assert all(error is None for _, error in predictions.values())
+
+    server_stats = server.state.get_stats()
+    controller_stats = launcher.request_controller.get_stats()
+    assert sorted(controller_stats) == KEYS
+    for key in KEYS:
+        stats = controller_stats[key]
+        assert stats["num_requests"] == server_stats["num_requests"][key]
+        assert stats["num_rate_limited"] == server_stats["num_rate_limited"][key] > 0
+        assert stats["num_retries"] == stats["num_rate_limited"]
+        assert stats["num_failed"] == 0
+        # each key has its own limit, which was decreased by the 429s
+        assert 1 <= stats["concurrency_limit"] < MAX_IN_FLIGHT_PER_KEY
+        assert server_stats["max_in_flight"][key] <= 2
+
+    # the instrumentation (entered first) records each attempt of the controller
+    with open(tmp_path / CallInstrumentation.FILE_NAME) as f:
+        records = [json.loads(line) for line in f]
+    requests = [record for record in records if record["type"] == "request"]
+    assert len(requests) == 2 * NUM_PROBLEMS
+    assert all(request["error"] is None and request["flow"] == "MockCodeFlow" for request in requests)
+    assert sum(request["retries"] for request in requests) == sum(server_stats["num_rate_limited"].values())
+    assert sum(request["backoff"] > 0 for request in requests) > 0
+
+    assert _get_patched_functions() == original_functions
+    assert get_active_instrumentation() is None
+
+
+def test_patches_are_restored_after_a_failure(tmp_path, mock_llm_server):
+    server, api_base = mock_llm_server(latency=0.01, rate_limit_probability=1.0, seed=0)
+    original_functions = _get_patched_functions()
+
+    launcher = _get_launcher(str(tmp_path), max_retries=1)
+    with pytest.raises(Exception, match="429|[Rr]ate"):
+        _run(launcher, api_base)
+
+    for key, stats in launcher.request_controller.get_stats().items():
+        assert stats["num_failed"] > 0
+        assert stats["num_retries"] == stats["num_failed"]
+        assert stats["num_requests"] == server.state.get_stats()["num_requests"][key]
+
+    assert _get_patched_functions() == original_functions
+    assert get_active_instrumentation() is None
@@ -0,0 +1,139 @@
+import base64
+import hashlib
+import os
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.artifact_store import PARTIAL_DOWNLOAD_SUFFIX, download_run_file
+
+API_KEY = "test-api-key"
+CONTENT = os.urandom(3 * 1024 * 1024 + 123)
+
+
+class MockFileServer:
+    """Serves `CONTENT` (with range requests if `supports_ranges`) to the requests authenticated with `API_KEY`."""
+
+    def __init__(self, supports_ranges=True):
+        self.supports_ranges = supports_ranges
+        self.requests = []
+
+        state = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                range_header = self.headers.get("Range")
+                state.requests.append(range_header)
+                expected_authorization = "Basic " + base64.b64encode(f"user:{API_KEY}".encode()).decode()
+                if self.headers.get("Authorization") != expected_authorization:
+                    self.send_response(401)
+                    self.end_headers()
+                    return
+
+                offset = 0
+                if range_header is not None and state.supports_ranges:
+                    offset = int(range_header.removeprefix("bytes=").removesuffix("-"))
+                body = CONTENT[offset:]
+
+                self.send_response(206 if offset > 0 else 200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/files/evaluation_output.jsonl"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def wandb_api(monkeypatch):
+    wandb = pytest.importorskip("wandb")
+    monkeypatch.setattr(wandb, "Api", lambda *args, **kwargs: types.SimpleNamespace(api_key=API_KEY), raising=False)
+
+
+@pytest.fixture
+def file_server():
+    servers = []
+
+    def _start(**kwargs):
+        servers.append(MockFileServer(**kwargs))
+        return servers[-1]
+
+    yield _start
+
+    for server in servers:
+        server.close()
+
+
+def _get_wandb_file(url):
+    """A stand-in for `wandb.apis.public.File`, whose `client` (a `RetryingClient`) doesn't hold the API key."""
+    return types.SimpleNamespace(
+        name="evaluation_output.jsonl",
+        url=url,
+        size=len(CONTENT),
+        md5=base64.b64encode(hashlib.md5(CONTENT).digest()).decode("ascii"),
+        client=types.SimpleNamespace(),
+    )
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.usefixtures("wandb_api")
+def test_download_run_file(tmp_path, file_server):
+    server = file_server()
+    path = str(tmp_path / "evaluation_output.jsonl")
+
+    assert download_run_file(_get_wandb_file(server.url), path) == path
+    assert _read(path) == CONTENT
+    assert not os.path.exists(path + PARTIAL_DOWNLOAD_SUFFIX)
+    assert server.requests == [None]
+
+
+@pytest.mark.usefixtures("wandb_api")
+def test_download_run_file_resumes_a_partial_download(tmp_path, file_server):
+    server = file_server()
+    path = str(tmp_path / "evaluation_output.jsonl")
+    with open(path + PARTIAL_DOWNLOAD_SUFFIX, "wb") as f:
+        f.write(CONTENT[:1000])
+
+    download_run_file(_get_wandb_file(server.url), path)
+    assert _read(path) == CONTENT
+    assert server.requests == ["bytes=1000-"]
+
+
+@pytest.mark.usefixtures("wandb_api")
+def test_download_run_file_restarts_a_stale_partial_download(tmp_path, file_server):
+    server = file_server()
+    path = str(tmp_path / "evaluation_output.jsonl")
+    # e.g., left by the download of a previous version of the file
+    with open(path + PARTIAL_DOWNLOAD_SUFFIX, "wb") as f:
+        f.write(os.urandom(1000))
+
+    download_run_file(_get_wandb_file(server.url), path)
+    assert _read(path) == CONTENT
+    assert server.requests == ["bytes=1000-", None]
+
+
+@pytest.mark.usefixtures("wandb_api")
+def test_download_run_file_without_range_support(tmp_path, file_server):
+    server = file_server(supports_ranges=False)
+    path = str(tmp_path / "evaluation_output.jsonl")
+    with open(path + PARTIAL_DOWNLOAD_SUFFIX, "wb") as f:
+        f.write(CONTENT[:1000])
+
+    # the server sends the whole file, which replaces the partial one
+    download_run_file(_get_wandb_file(server.url), path)
+    assert _read(path) == CONTENT
+    assert server.requests == ["bytes=1000-"]
@@ -0,0 +1,51 @@
+import pytest
+
+from src.launchers import AsyncFlowLauncher, ResumableFlowLauncher
+from tests.mock_flows import ConcurrencyTracker, get_flow_pool, read_predictions
+
+pytestmark = pytest.mark.usefixtures("flow_cache_dir")
+
+NUM_PROBLEMS = 24
+LAUNCHER_PARAMS = {"n_independent_samples": 2, "fault_tolerant_mode": False, "n_batch_retries": 1}
+
+
+def _get_samples():
+    return ({"id": f"problem_{idx}"} for idx in range(NUM_PROBLEMS))
+
+
+def test_async_launcher_matches_threaded_launcher(tmp_path, mock_llm_server):
+    server, api_base = mock_llm_server(latency=0.05, latency_jitter=0.04, seed=0)
+
+    threaded_launcher = ResumableFlowLauncher(
+        **LAUNCHER_PARAMS, wait_time_between_retries=0, output_dir=str(tmp_path / "threaded"), n_workers=4
+    )
+    # the threaded launcher needs the number of datapoints upfront
+    threaded_launcher.predict_dataloader(list(_get_samples()), get_flow_pool(api_base, "key_0", max_size=4))
+
+    max_in_flight_per_key = 3
+    async_launcher = AsyncFlowLauncher(
+        **LAUNCHER_PARAMS,
+        wait_time_between_retries=0,
+        output_dir=str(tmp_path / "async"),
+        max_in_flight=16,
+        max_in_flight_per_key=max_in_flight_per_key,
+    )
+    num_flows_per_key = async_launcher.get_num_flows_per_key(num_keys=2)
+    tracker = ConcurrencyTracker()
+    key2flow_pool = {key: get_flow_pool(api_base, key, num_flows_per_key, tracker) for key in ["key_1", "key_2"]}
+    async_launcher.predict_dataloader(_get_samples(), key2flow_pool)
+
+    threaded_predictions = read_predictions(str(tmp_path / "threaded"))
+    async_predictions = read_predictions(str(tmp_path / "async"))
+    assert len(async_predictions) == NUM_PROBLEMS
+    assert async_predictions == threaded_predictions
+    assert all(error is None for _, error in async_predictions.values())
+
+    stats = server.state.get_stats()
+    assert stats["num_rate_limited"] == {}
+    # the requests of each key did overlap, without exceeding the limit
+    assert max(tracker.max_in_flight.values()) > 1
+    for key in ["key_1", "key_2"]:
+        assert stats["num_requests"][key] > 0
+        assert tracker.max_in_flight[key] <= max_in_flight_per_key
+        assert len(key2flow_pool[key]) <= max_in_flight_per_key
@@ -0,0 +1,145 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.utils.evaluation_sharding import ShardMergeError, filter_to_shard, get_shard_index, merge_shards, write_shard
+from src.utils.general_helpers import read_jsonlines, write_jsonlines
+
+NUM_SHARDS = 4
+
+# run by each shard's process: evaluates (here, reads) its problems and writes them as a shard
+SHARD_SCRIPT = """
+import sys
+from src.utils.evaluation_sharding import filter_to_shard, write_shard
+from src.utils.general_helpers import read_jsonlines
+
+path_to_evaluation_output, shards_dir, shard_index, num_shards, compression = sys.argv[1:]
+shard_index, num_shards = int(shard_index), int(num_shards)
+evaluation_output = filter_to_shard(read_jsonlines(path_to_evaluation_output), shard_index, num_shards)
+assigned_ids = [item["id"] for item in evaluation_output]
+write_shard(shards_dir, shard_index, num_shards, assigned_ids, evaluation_output, compression=compression or None)
+"""
+
+
+def _get_evaluation_output(num_problems=200):
+    return [
+        {
+            "id": f"cf_{1000 + idx}{'AB'[idx % 2]}",
+            "local_evaluator": [
+                {
+                    "compilation_status": True,
+                    "timeout_error": False,
+                    "hidden_tests_results": [
+                        {"status": bool((idx + test_idx) % 3), "error_message": None} for test_idx in range(1 + idx % 4)
+                    ],
+                    "public_tests_results": [{"status": True, "error_message": None}],
+                }
+            ],
+        }
+        for idx in range(num_problems)
+    ]
+
+
+def _run_shards(tmp_path, shard_indices, compression=None):
+    path_to_evaluation_output = str(tmp_path / "evaluation_output.jsonl")
+    write_jsonlines(path_to_evaluation_output, _get_evaluation_output())
+    shards_dir = str(tmp_path / "shards")
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                SHARD_SCRIPT,
+                path_to_evaluation_output,
+                shards_dir,
+                str(shard_index),
+                str(NUM_SHARDS),
+                compression or "",
+            ],
+            env=env,
+        )
+        for shard_index in shard_indices
+    ]
+    assert all(process.wait(timeout=120) == 0 for process in processes)
+    return shards_dir
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_merged_shards_equal_the_unsharded_evaluation_output(tmp_path, compression):
+    shards_dir = _run_shards(tmp_path, range(NUM_SHARDS), compression)
+
+    unsharded_evaluation_output = sorted(_get_evaluation_output(), key=lambda item: item["id"])
+    expected_ids = [item["id"] for item in unsharded_evaluation_output]
+    assert merge_shards(shards_dir, NUM_SHARDS, expected_ids=expected_ids) == unsharded_evaluation_output
+
+
+def test_the_shards_partition_the_problems():
+    evaluation_output = _get_evaluation_output()
+    shards = [filter_to_shard(evaluation_output, shard_index, NUM_SHARDS) for shard_index in range(NUM_SHARDS)]
+
+    assert sorted(item["id"] for shard in shards for item in shard) == sorted(item["id"] for item in evaluation_output)
+    assert all(len(shard) > 0 for shard in shards)
+
+
+def test_merge_fails_on_a_missing_manifest(tmp_path):
+    shards_dir = _run_shards(tmp_path, [0, 1, 3])
+
+    with pytest.raises(ShardMergeError, match=r"not \(yet\) complete.*\[2\]"):
+        merge_shards(shards_dir, NUM_SHARDS)
+
+
+def _write_shards(shards_dir, shard2evaluation_output):
+    for shard_index in range(NUM_SHARDS):
+        evaluation_output = shard2evaluation_output[shard_index]
+        assigned_ids = sorted({item["id"] for item in evaluation_output})
+        write_shard(shards_dir, shard_index, NUM_SHARDS, assigned_ids, evaluation_output)
+
+
+def _get_shards():
+    evaluation_output = _get_evaluation_output()
+    return {
+        shard_index: filter_to_shard(evaluation_output, shard_index, NUM_SHARDS) for shard_index in range(NUM_SHARDS)
+    }
+
+
+def test_merge_fails_on_a_duplicated_id(tmp_path):
+    shard2evaluation_output = _get_shards()
+    shard2evaluation_output[1].append(shard2evaluation_output[1][0])
+    _write_shards(str(tmp_path), shard2evaluation_output)
+
+    with pytest.raises(ShardMergeError, match=r"\[shard 1/4\] duplicated ids"):
+        merge_shards(str(tmp_path), NUM_SHARDS)
+
+
+def test_merge_fails_on_an_id_of_another_shard(tmp_path):
+    shard2evaluation_output = _get_shards()
+    # e.g., a shard run with a different number of shards
+    item = shard2evaluation_output[0].pop()
+    shard2evaluation_output[2].append(item)
+    assert get_shard_index(item["id"], NUM_SHARDS) == 0
+    _write_shards(str(tmp_path), shard2evaluation_output)
+
+    with pytest.raises(ShardMergeError, match=rf"\[shard 2/4\] ids of other shards: \['{item['id']}'\]"):
+        merge_shards(str(tmp_path), NUM_SHARDS)
+
+
+def test_merge_fails_on_an_id_missing_from_its_shard(tmp_path):
+    shards_dir = _run_shards(tmp_path, range(NUM_SHARDS))
+    # the problem is assigned to (the manifest of) its shard, but its evaluation output was lost
+    path_to_shard = os.path.join(shards_dir, "evaluation_output.shard-00003-of-00004.jsonl")
+    evaluation_output = read_jsonlines(path_to_shard)
+    write_jsonlines(path_to_shard, evaluation_output[1:])
+
+    with pytest.raises(ShardMergeError, match=rf"\[shard 3/4\] missing ids: \['{evaluation_output[0]['id']}'\]"):
+        merge_shards(shards_dir, NUM_SHARDS)
+
+
+def test_merge_fails_on_an_unexpected_missing_id(tmp_path):
+    shards_dir = _run_shards(tmp_path, range(NUM_SHARDS))
+
+    with pytest.raises(ShardMergeError, match="ids are in none of the shards: \\['cf_9999A'\\]"):
+        merge_shards(shards_dir, NUM_SHARDS, expected_ids=["cf_1000A", "cf_9999A"])
@@ -0,0 +1,42 @@
+from src.evaluation import CodeforcesLocalEvaluator
+from src.evaluation.failure_ordering import FailureStats, get_test_key, get_test_order
+from src.evaluation.testing_utils_codeforces import NOT_RUN_ERROR_MESSAGE
+
+PROBLEM_ID = "problem_0"
+HIDDEN_TESTS_IO = [[["1"], "2"], [["2"], "4"], [["100"], "200"]]
+# passes the first two hidden tests, and fails the last one
+CANDIDATE_SOLUTION = "n = int(input())\nprint(2 * n if n < 100 else 0)"
+
+
+def test_the_tests_are_ordered_by_failure_rate_and_input_size():
+    tests = [[["1 2 3"], "6"], [["1"], "1"], [["4 5"], "9"]]
+    key2counts = {get_test_key(tests[2]): (3, 3), get_test_key(tests[1]): (3, 0)}
+
+    assert get_test_order(tests, key2counts) == [2, 1, 0]
+    assert get_test_order(tests, {}) == [1, 2, 0]
+
+
+def test_the_early_stopped_results_keep_their_original_indices(tmp_path):
+    path_to_test_stats = str(tmp_path / "test_stats.sqlite")
+    test_stats = FailureStats(path_to_test_stats)
+    # the last test failed before, so it is run first (and the evaluation stops on it)
+    test_stats.update(PROBLEM_ID, {get_test_key(HIDDEN_TESTS_IO[2]): (3, 3)})
+
+    evaluator = CodeforcesLocalEvaluator(
+        eval_helper_params={"timeout": 10, "stop_on_first_failure": True}, path_to_test_stats=path_to_test_stats
+    )
+    problem_data = {"id": PROBLEM_ID, "hidden_tests_io": HIDDEN_TESTS_IO, "public_tests_io": []}
+    pred_data = {"id": PROBLEM_ID, "candidate_solutions": [CANDIDATE_SOLUTION]}
+    (evaluation_results,) = evaluator.evaluate_problem(problem_data, pred_data)["local_evaluator"]
+
+    hidden_tests_results = evaluation_results["hidden_tests_results"]
+    assert [result["input"] for result in hidden_tests_results] == [test[0] for test in HIDDEN_TESTS_IO]
+    assert [result["expected_output"] for result in hidden_tests_results] == [test[1] for test in HIDDEN_TESTS_IO]
+    for result in hidden_tests_results[:2]:
+        assert result["not_run"] and not result["status"]
+        assert result["error_message"] == NOT_RUN_ERROR_MESSAGE
+    assert "not_run" not in hidden_tests_results[2]
+    assert not hidden_tests_results[2]["status"] and hidden_tests_results[2]["generated_output"] == "0"
+
+    # only the test that was run is counted
+    assert test_stats.load(PROBLEM_ID) == {get_test_key(HIDDEN_TESTS_IO[2]): (4, 4)}
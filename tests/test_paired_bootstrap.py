@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from src.utils.evaluation_helpers import get_paired_bootstrap_comparison, get_paired_bootstrap_scores
+
+NAN = float("nan")
+# run "a" solves 3 of the 4 problems, run "b" none of the 3 problems it was scored on (it skipped the last one), and
+# run "c" solves 3 of the 4 problems, as "a", but not the same ones
+RUN_IDS = ["a", "b", "c"]
+RUN_PROBLEM_SCORES = [[1.0, 1.0, 1.0, 0.0], [0.0, 0.0, 0.0, NAN], [1.0, 0.0, 1.0, 1.0]]
+
+
+def test_the_resample_indices_are_shared_by_the_runs():
+    n_samples, seed = 500, 1
+    bootstrap_scores = get_paired_bootstrap_scores(RUN_PROBLEM_SCORES, n_samples, seed, chunk_size=7)
+
+    # a single (n_samples, num_problems) draw, whatever the chunk size
+    indices = np.random.RandomState(seed).choice(4, (n_samples, 4), replace=True)
+    for sample_scores, sample_indices in zip(bootstrap_scores, indices):
+        for run_scores, run_sample_score in zip(RUN_PROBLEM_SCORES, sample_scores):
+            drawn_scores = [run_scores[index] for index in sample_indices if not np.isnan(run_scores[index])]
+            if drawn_scores:
+                assert run_sample_score == pytest.approx(np.mean(drawn_scores))
+            else:
+                assert np.isnan(run_sample_score)
+
+    # the resamples that draw only the skipped problem have no score for run "b"
+    only_skipped_problem_drawn = (indices == 3).all(axis=1)
+    assert only_skipped_problem_drawn.any()
+    assert np.array_equal(np.isnan(bootstrap_scores[:, 1]), only_skipped_problem_drawn)
+    assert not np.isnan(bootstrap_scores[:, [0, 2]]).any()
+
+
+def test_the_difference_ignores_the_unscored_resamples():
+    comparison = get_paired_bootstrap_comparison(
+        RUN_IDS, RUN_PROBLEM_SCORES, confidence_level=0.95, n_samples=2000, seed=1
+    )
+
+    assert comparison["runs"]["a"]["score"] == 0.75
+    assert comparison["runs"]["b"] == {"score": 0.0, "ci": [0.0, 0.0, 0.0]}
+
+    # run "a" is better than run "b" on every resample on which "b" is scored: "a" scores 0 only on the resamples that
+    # draw only the last problem, on which "b" isn't scored
+    a_b_difference = comparison["differences"]["a - b"]
+    assert a_b_difference["difference"] == 0.75
+    # the CI is (lower bound, mean, upper bound) of the differences
+    assert 0.0 <= a_b_difference["ci"][0] < a_b_difference["ci"][1] < a_b_difference["ci"][2] <= 1.0
+    assert a_b_difference["ci"][1] == pytest.approx(0.75, abs=0.05)
+    assert a_b_difference["p_value"] == 0.0
+
+    # run "c" is run "a" with the scores of problems 1 and 3 swapped, so their differences are symmetric around 0
+    a_c_difference = comparison["differences"]["a - c"]
+    assert a_c_difference["difference"] == 0.0
+    assert a_c_difference["ci"][0] < 0.0 < a_c_difference["ci"][2]
+    assert a_c_difference["p_value"] > 0.5
+
+    # the comparison in the other direction mirrors it
+    b_a_difference = get_paired_bootstrap_comparison(
+        ["b", "a"], RUN_PROBLEM_SCORES[1::-1], confidence_level=0.95, n_samples=2000, seed=1
+    )["differences"]["b - a"]
+    assert b_a_difference["difference"] == -0.75
+    assert b_a_difference["ci"] == pytest.approx([-value for value in a_b_difference["ci"][::-1]])
+    assert b_a_difference["p_value"] == a_b_difference["p_value"]
+
+
+def test_a_run_without_scored_problems_cannot_be_compared():
+    with pytest.raises(ValueError, match=r"\['b'\]"):
+        get_paired_bootstrap_comparison(
+            ["a", "b"], [[1.0, 0.0], [NAN, NAN]], confidence_level=0.95, n_samples=10, seed=1
+        )
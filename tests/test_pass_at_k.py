@@ -0,0 +1,79 @@
+import pytest
+
+from src.evaluation import CodeforcesLocalEvaluator
+from src.launchers.sample_budgeting import SampleBudgetPolicy
+from src.metrics import FilteredPassAtK, PassAtK
+from src.utils.evaluation_helpers import EvaluationOutput
+from src.utils.inference_helpers import SAMPLE_BUDGET_KEY
+
+METRIC_PARAMS = {
+    "code_evaluator_id": "local_evaluator",
+    "hidden_test_cases": True,
+    "bucketing_id": None,
+    "evaluation_buckets_dir": None,
+    "k": 5,
+}
+PUBLIC_TESTS_IO = [[["1"], "2"]]
+HIDDEN_TESTS_IO = [[["3"], "6"], [["5"], "10"]]
+CORRECT_SOLUTION = "print(2 * int(input()))"
+WRONG_SOLUTION = "print(int(input()))"
+
+
+def _get_budgeted_evaluation_output(candidate_solutions):
+    """Samples the candidates with the policy, and evaluates them as `run_evaluation.py` would."""
+    policy = SampleBudgetPolicy(stop_on=["public_tests_passed"], eval_helper_params={"timeout": 10})
+    problem_data = {"id": "problem_0", "public_tests_io": PUBLIC_TESTS_IO, "hidden_tests_io": HIDDEN_TESTS_IO}
+
+    record = policy.new_record()
+    for num_samples in range(1, len(candidate_solutions) + 1):
+        human_readable_outputs = [{"code": candidate} for candidate in candidate_solutions[:num_samples]]
+        if policy.update(record, problem_data, human_readable_outputs) is not None:
+            break
+
+    pred_data = {
+        "id": "problem_0",
+        "candidate_solutions": candidate_solutions[: record["num_samples"]],
+        SAMPLE_BUDGET_KEY: record,
+    }
+    evaluator = CodeforcesLocalEvaluator(eval_helper_params={"timeout": 10})
+    return EvaluationOutput(data=[evaluator.evaluate_problem(problem_data, pred_data)])
+
+
+def test_the_policy_is_carried_over_to_the_evaluation_output():
+    evaluation_output = _get_budgeted_evaluation_output([WRONG_SOLUTION, CORRECT_SOLUTION, WRONG_SOLUTION])
+
+    sample_budget = evaluation_output.data[0][SAMPLE_BUDGET_KEY]
+    assert sample_budget["policy"] == {"stop_on": ["public_tests_passed"], "min_samples": 1}
+    assert sample_budget["public_tests_passed"] == [False, True]
+    assert sample_budget["stop_reason"] == "public_tests_passed"
+    assert len(evaluation_output.data[0]["local_evaluator"]) == 2
+
+
+def test_pass_at_k_refuses_budgeted_runs():
+    # with k=5, the sampling stopped after a single (correct) candidate: pass@5 on the shortened n would be 1.0
+    evaluation_output = _get_budgeted_evaluation_output([CORRECT_SOLUTION] * 5)
+
+    with pytest.raises(ValueError, match="filtered_pass_at_k"):
+        PassAtK(**METRIC_PARAMS).compute(evaluation_output)
+    assert FilteredPassAtK(**METRIC_PARAMS).compute(evaluation_output) == 1.0
+
+
+def test_pass_at_k_accepts_budgeted_runs_that_were_not_stopped():
+    evaluation_output = _get_budgeted_evaluation_output([WRONG_SOLUTION] * 5)
+    assert evaluation_output.data[0][SAMPLE_BUDGET_KEY]["stop_reason"] is None
+
+    assert PassAtK(**METRIC_PARAMS).compute(evaluation_output) == 0.0
+    assert FilteredPassAtK(**METRIC_PARAMS).compute(evaluation_output) == 0.0
+
+
+def test_filtered_pass_at_k_refuses_other_stop_reasons():
+    evaluation_output = _get_budgeted_evaluation_output([WRONG_SOLUTION] * 2)
+    evaluation_output.data[0][SAMPLE_BUDGET_KEY]["stop_reason"] = "duplicate_candidate"
+
+    with pytest.raises(ValueError, match="biases"):
+        FilteredPassAtK(**METRIC_PARAMS).compute(evaluation_output)
+
+
+def test_unknown_stop_conditions_are_rejected():
+    with pytest.raises(AssertionError, match="duplicate_candidate"):
+        SampleBudgetPolicy(stop_on=["duplicate_candidate"])
@@ -0,0 +1,38 @@
+import pytest
+
+from src.launchers import ResumableFlowLauncher
+from tests.mock_flows import get_flow_pool, read_predictions
+
+pytestmark = pytest.mark.usefixtures("flow_cache_dir")
+
+
+def test_streamed_samples_are_run_in_chunks(tmp_path, mock_llm_server):
+    server, api_base = mock_llm_server(latency=0.01, seed=0)
+    num_problems, chunk_size = 25, 8
+
+    launcher = ResumableFlowLauncher(
+        n_independent_samples=1,
+        fault_tolerant_mode=False,
+        n_batch_retries=1,
+        wait_time_between_retries=0,
+        output_dir=str(tmp_path),
+        n_workers=4,
+        streaming_chunk_size=chunk_size,
+    )
+    state = {"num_read": 0, "num_predicted": 0, "max_num_pending": 0}
+
+    def _on_prediction(sample):
+        state["num_predicted"] += 1
+
+    def _get_samples():
+        for idx in range(num_problems):
+            state["num_read"] += 1
+            state["max_num_pending"] = max(state["max_num_pending"], state["num_read"] - state["num_predicted"])
+            yield {"id": f"problem_{idx}"}
+
+    launcher.prediction_callbacks.append(_on_prediction)
+    launcher.predict_dataloader(_get_samples(), get_flow_pool(api_base, "key_0", max_size=4))
+
+    assert len(read_predictions(str(tmp_path))) == num_problems
+    # the generator is never consumed more than a chunk ahead of the predictions
+    assert state["max_num_pending"] <= chunk_size
@@ -0,0 +1,60 @@
+import pytest
+
+from src.evaluation.testing_utils_codeforces import (
+    NOT_RUN_PUBLIC_TESTS_FAILED_ERROR_MESSAGE,
+    evaluate_solution_for_problem,
+)
+
+PUBLIC_TESTS_IO = [[["1"], "2"]]
+HIDDEN_TESTS_IO = [[["3"], "6"], [["5"], "10"], [["100"], "200"]]
+CORRECT_SOLUTION = "print(2 * int(input()))"
+# fails the public test (but passes the last hidden one)
+WRONG_SOLUTION = "n = int(input())\nprint(2 * n if n >= 100 else 0)"
+UNCOMPILABLE_SOLUTION = "def solve(:\n    pass"
+
+
+def _evaluate(candidate_solution, staged_evaluation):
+    return evaluate_solution_for_problem(
+        candidate_solution,
+        hidden_tests_io=HIDDEN_TESTS_IO,
+        public_tests_io=PUBLIC_TESTS_IO,
+        timeout=10,
+        staged_evaluation=staged_evaluation,
+    )
+
+
+def test_the_hidden_tests_are_run_once_the_public_tests_pass():
+    evaluation_results = _evaluate(CORRECT_SOLUTION, staged_evaluation=True)
+
+    assert evaluation_results["compilation_status"]
+    assert all(result["status"] for result in evaluation_results["public_tests_results"])
+    assert all(result["status"] for result in evaluation_results["hidden_tests_results"])
+    assert not any(result.get("not_run", False) for result in evaluation_results["hidden_tests_results"])
+    assert evaluation_results == _evaluate(CORRECT_SOLUTION, staged_evaluation=False)
+
+
+def test_the_hidden_tests_are_not_run_once_a_public_test_fails():
+    evaluation_results = _evaluate(WRONG_SOLUTION, staged_evaluation=True)
+
+    assert evaluation_results["compilation_status"]
+    (public_test_result,) = evaluation_results["public_tests_results"]
+    assert not public_test_result["status"] and "not_run" not in public_test_result
+
+    hidden_tests_results = evaluation_results["hidden_tests_results"]
+    assert len(hidden_tests_results) == len(HIDDEN_TESTS_IO)
+    for result, (test_input, expected_output) in zip(hidden_tests_results, HIDDEN_TESTS_IO):
+        assert result["not_run"] and not result["status"]
+        assert result["error_message"] == NOT_RUN_PUBLIC_TESTS_FAILED_ERROR_MESSAGE
+        assert result["input"] == test_input and result["expected_output"] == expected_output
+
+    # the solution passes a hidden test when it is run
+    assert _evaluate(WRONG_SOLUTION, staged_evaluation=False)["hidden_tests_results"][2]["status"]
+
+
+@pytest.mark.parametrize("candidate_solution", [UNCOMPILABLE_SOLUTION, None])
+def test_a_solution_that_does_not_compile_is_evaluated_as_without_staging(candidate_solution):
+    evaluation_results = _evaluate(candidate_solution, staged_evaluation=True)
+
+    assert not evaluation_results["compilation_status"]
+    assert not any(result.get("not_run", False) for result in evaluation_results["hidden_tests_results"])
+    assert evaluation_results == _evaluate(candidate_solution, staged_evaluation=False)
@@ -0,0 +1,80 @@
+import time
+
+from src.evaluation import CodeforcesLocalEvaluator, time_limits
+from src.evaluation.time_limits import AdaptiveTimeLimits
+
+MAX_TIME_LIMIT = 10
+REFERENCE_SOLUTION = "print(2 * int(input()))"
+PROBLEM_DATA = {
+    "id": "problem_0",
+    "working_solution": REFERENCE_SOLUTION,
+    "public_tests_io": [[["1"], "2"]],
+    "hidden_tests_io": [[["3"], "6"], [["5"], "10"]],
+}
+
+
+def _get_time_limits(path_to_cache):
+    return AdaptiveTimeLimits(path_to_cache=path_to_cache, multiplier=3.0, slack=0.5, max_time_limit=MAX_TIME_LIMIT)
+
+
+def test_a_looping_candidate_fails_within_the_calibrated_limit(tmp_path):
+    evaluator = CodeforcesLocalEvaluator(
+        eval_helper_params={"timeout": MAX_TIME_LIMIT},
+        time_limits={"enabled": True, "path_to_cache": str(tmp_path / "reference_runtimes.sqlite"), "slack": 0.5},
+    )
+    pred_data = {"id": PROBLEM_DATA["id"], "candidate_solutions": ["while True:\n    pass"]}
+
+    # the runtimes of the reference solution are measured on the first evaluation
+    evaluator.evaluate_problem(PROBLEM_DATA, {**pred_data, "candidate_solutions": [REFERENCE_SOLUTION]})
+    hidden_tests_time_limits = evaluator.time_limits.get_time_limits(PROBLEM_DATA, PROBLEM_DATA["hidden_tests_io"])
+    assert all(time_limit < 1 for time_limit in hidden_tests_time_limits)
+
+    start_time = time.perf_counter()
+    (evaluation_results,) = evaluator.evaluate_problem(PROBLEM_DATA, pred_data)["local_evaluator"]
+    elapsed_time = time.perf_counter() - start_time
+
+    # each of the 3 tests times out after its (calibrated) limit, well before the `timeout` of a single test
+    assert elapsed_time < MAX_TIME_LIMIT / 2
+    assert evaluation_results["compilation_status"] and not evaluation_results["timeout_error"]
+    for result in evaluation_results["hidden_tests_results"] + evaluation_results["public_tests_results"]:
+        assert not result["status"]
+        assert result["error_message"] == "TimeoutException()"
+
+
+def test_a_test_the_reference_solution_fails_gets_the_max_time_limit(tmp_path):
+    tests = [[["3"], "6"], [["3"], "7"]]
+
+    time_limit, failed_test_time_limit = _get_time_limits(str(tmp_path / "cache.sqlite")).get_time_limits(
+        PROBLEM_DATA, tests
+    )
+
+    assert 0.5 <= time_limit < MAX_TIME_LIMIT
+    assert failed_test_time_limit == MAX_TIME_LIMIT
+    # as do the tests of a problem without a reference solution
+    problem_data = {key: value for key, value in PROBLEM_DATA.items() if key != "working_solution"}
+    assert _get_time_limits(str(tmp_path / "cache.sqlite")).get_time_limits(problem_data, tests) == [MAX_TIME_LIMIT] * 2
+
+
+def test_the_reference_runtimes_are_reused_from_the_cache(tmp_path, monkeypatch):
+    measured_tests = []
+
+    def _measure_test_runtimes(solution, tests, *args, **kwargs):
+        measured_tests.extend(tests)
+        return measure_test_runtimes(solution, tests, *args, **kwargs)
+
+    measure_test_runtimes = time_limits.measure_test_runtimes
+    monkeypatch.setattr(time_limits, "measure_test_runtimes", _measure_test_runtimes)
+    path_to_cache = str(tmp_path / "cache.sqlite")
+    tests = PROBLEM_DATA["hidden_tests_io"]
+
+    first_time_limits = _get_time_limits(path_to_cache).get_time_limits(PROBLEM_DATA, tests)
+    assert measured_tests == tests
+
+    # a new evaluation (with a new instance) doesn't run the reference solution again
+    assert _get_time_limits(path_to_cache).get_time_limits(PROBLEM_DATA, tests) == first_time_limits
+    assert measured_tests == tests
+
+    # only the new tests are measured
+    new_test = [["7"], "14"]
+    _get_time_limits(path_to_cache).get_time_limits(PROBLEM_DATA, tests + [new_test])
+    assert measured_tests == tests + [new_test]